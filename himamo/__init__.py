@@ -4,6 +4,9 @@ Himamo module.
 
 """
 
-from himamo import GenericHMM
+from himamo import (BandedTransitions, EncodedObservations,
+                    FixedLagSmoother, ForwardFilter, GenericHMM,
+                    SparseTransitions)
 
-__all__ = ['GenericHMM']
+__all__ = ['BandedTransitions', 'EncodedObservations', 'FixedLagSmoother',
+           'ForwardFilter', 'GenericHMM', 'SparseTransitions']
@@ -7,315 +7,4482 @@ Copyright (c) 2014 Maciej Żok <maciek.zok@gmail.com>
 MIT License (http://opensource.org/licenses/MIT)
 
 """
+import collections
+import copy
 import decimal
+import heapq
+import itertools
+import multiprocessing
+import operator
+import os
+import tempfile
 
 import numpy as np
 
 
+NUMERIC_TYPES = ('decimal', 'float64')
+ENGINES = ('log', 'scaled')
+LATTICE_CHUNK_ELEMENTS = 1 << 20
+
+Expectations = collections.namedtuple('Expectations', [
+    'log_likelihood',      # log P(O|lambda)
+    'log_initial_states',  # gamma_1 (i)
+    'log_transitions',     # sum_{t=1}^{T-1} eta_t (i, j)
+    'log_emissions',       # sum_{t: O_t = v_k} gamma_t (i)
+    'log_gamma_sum',       # sum_{t=1}^T gamma_t (i)
+])
+
+Semiring = collections.namedtuple('Semiring', [
+    'zero',    # identity of plus (no path)
+    'one',     # identity of times (empty path)
+    'plus',    # binary ufunc combining alternative paths
+    'times',   # binary ufunc extending a path
+    'reduce',  # (arr, axis) -> plus over axis
+    'select',  # (arr, axis) -> (reduced, indices of selected), None if
+               # plus does not select one of its arguments
+    'lift',    # logarithms of probabilities -> semiring values, None if
+               # semiring values are the logarithms
+    'dtype',   # dtype of semiring values
+])
+
+
+def _logsumexp(arr, axis):
+    """
+    Logarithm of sum of exponentials of float64 array elements.
+
+    Arguments:
+        arr (array): Logarithms (-inf as logarithm of zero).
+        axis (int): Axis along which the sum is computed.
+
+    Returns:
+        An array with logarithms of sums (-inf if all elements are -inf).
+
+    """
+    arr_max = np.max(arr, axis=axis, keepdims=True)
+    arr_max[~np.isfinite(arr_max)] = 0
+    with np.errstate(divide='ignore'):
+        result = np.log(np.sum(np.exp(arr - arr_max), axis=axis))
+    return result + np.squeeze(arr_max, axis=axis)
+
+
+def _grouped_reduce(ufunc, arr, indices, size, identity):
+    """
+    Reduce columns of array grouped by indices.
+
+    Columns are sorted by group once and every group is reduced with a
+    single ufunc.reduceat call, so there is no loop over groups.
+
+    Arguments:
+        ufunc (ufunc): Binary universal function (e.g. np.add).
+        arr (array): An array (N x T).
+        indices (array): Group index of every column (T).
+        size (int): Number of groups M.
+        identity: Value of groups without columns.
+
+    Returns:
+        An array with reduced columns of each group (N x M).
+
+    """
+    result = np.empty((arr.shape[0], size), dtype=arr.dtype)
+    result.fill(identity)
+    if indices.size == 0:
+        return result
+    order = np.argsort(indices, kind='mergesort')
+    sorted_indices = indices[order]
+    starts = np.flatnonzero(np.r_[True, sorted_indices[1:] !=
+                                  sorted_indices[:-1]])
+    result[:, sorted_indices[starts]] = ufunc.reduceat(
+        arr[:, order], starts, axis=1)
+    return result
+
+
+def _group_starts(keys):
+    """
+    Find starts of runs of equal sorted keys.
+
+    Arguments:
+        keys (array): Sorted keys.
+
+    Returns:
+        Tuple (starts, groups) with index of first element of every run and
+        key of the run.
+
+    """
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return starts, keys[starts]
+
+
+def _inverse_cdf_table(rows, targets, probabilities, size):
+    """
+    Build table for vectorized inverse-CDF sampling from rows of a
+    stochastic matrix.
+
+    Cumulative probabilities of row i are shifted by i, so bounds of all
+    rows form one sorted array searched once for any mix of rows.
+
+    Arguments:
+        rows (array): Row indices of probabilities in any order (e.g.
+            diagonal by diagonal for BandedTransitions).
+        targets (array): Column indices of probabilities.
+        probabilities (array): Probabilities, zeros are never sampled.
+        size (int): Number of rows.
+
+    Returns:
+        Tuple (bounds, targets, last) with shifted cumulative probabilities
+        and column indices of entries and index of last entry of every row.
+
+    """
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    nonzero = probabilities > 0
+    rows = np.asarray(rows, dtype=np.intp)[nonzero]
+    order = np.argsort(rows, kind='mergesort')
+    rows = rows[order]
+    targets = np.asarray(targets)[nonzero][order]
+    cumulative = np.cumsum(probabilities[nonzero][order])
+    starts = np.searchsorted(rows, np.arange(size + 1))
+    counts = np.diff(starts)
+    before = np.r_[0., cumulative][starts[:-1]]
+    cumulative -= np.repeat(before, counts)
+    totals = np.r_[0., cumulative][starts[1:]]
+    # rows end exactly at i + 1
+    cumulative /= np.repeat(totals, counts)
+    return rows + cumulative, targets, starts[1:] - 1
+
+
+def _inverse_cdf_sample(table, rows, uniform):
+    """
+    Sample columns of a stochastic matrix by inverse CDF.
+
+    Arguments:
+        table (tuple): Table built by _inverse_cdf_table.
+        rows (array): Row of every sample.
+        uniform (array): Uniform random numbers from [0, 1) (shaped like
+            rows).
+
+    Returns:
+        An array with sampled columns.
+
+    """
+    bounds, targets, last = table
+    found = np.searchsorted(bounds, rows + uniform, side='right')
+    return targets[np.minimum(found, last[rows])]
+
+
+class EncodedObservations(np.ndarray):
+    """
+    Indices of observed symbols in model symbols (integer array).
+
+    Only arrays of this type are taken as indices by models, any other
+    sequence (including plain integer arrays) is a sequence of symbols, so
+    integer symbols are never mistaken for indices. Instances are returned
+    by GenericHMM.encode and GenericHMM.sample.
+
+    """
+
+
+class SparseTransitions(object):
+    """
+    Sparse transition probabilities a_ij in coordinate format.
+
+    Only nonzero transitions are stored, so recursions over transitions
+    cost O(nnz) instead of O(N^2) per time step. Transitions are kept
+    sorted by source state (CSR order) together with a permutation sorting
+    them by target state (CSC order).
+
+    Arguments:
+        rows (array): Source states i of transitions (nnz).
+        cols (array): Target states j of transitions (nnz).
+        values (array): Values of transitions, probabilities or their
+            logarithms (nnz).
+        size (int): Number of states N.
+
+    Reises:
+        ValueError if sizes mismatch, transitions are empty, duplicated or
+        state index is out of range.
+
+    """
+    ndim = 2
+
+    def __init__(self, rows, cols, values, size):
+        rows = np.asarray(rows, dtype=np.intp)
+        cols = np.asarray(cols, dtype=np.intp)
+        values = np.asarray(values)
+        if rows.ndim != 1 or rows.shape != cols.shape or \
+                rows.shape != values.shape:
+            raise ValueError('sizes of rows, cols and values mismatch')
+        if rows.size == 0:
+            raise ValueError('transitions cannot be empty')
+        if (np.any(rows < 0) or np.any(rows >= size) or np.any(cols < 0) or
+                np.any(cols >= size)):
+            raise ValueError('state index out of range')
+
+        order = np.lexsort((cols, rows))
+        rows, cols = rows[order], cols[order]
+        if np.any((rows[1:] == rows[:-1]) & (cols[1:] == cols[:-1])):
+            raise ValueError('transitions cannot be duplicated')
+
+        self.rows = rows
+        self.cols = cols
+        self.values = values[order]
+        self.size = size
+        self._by_source = None
+        self._source_starts, self._sources = _group_starts(rows)
+        self._by_target = np.lexsort((rows, cols))
+        self._target_starts, self._targets = _group_starts(
+            cols[self._by_target])
+
+    @classmethod
+    def from_dense(cls, matrix):
+        """
+        Create sparse transitions from nonzero elements of a matrix.
+
+        Arguments:
+            matrix (array): Transition probabilities (N x N).
+
+        Returns:
+            SparseTransitions instance.
+
+        """
+        rows, cols = np.nonzero(matrix != 0)
+        return cls(rows, cols, matrix[rows, cols], matrix.shape[0])
+
+    @property
+    def shape(self):
+        """
+        Shape of the dense matrix (N x N).
+
+        """
+        return (self.size, self.size)
+
+    @property
+    def nnz(self):
+        """
+        Number of stored transitions.
+
+        """
+        return self.values.size
+
+    def with_values(self, values):
+        """
+        Create transitions with the same structure and new values.
+
+        Arguments:
+            values (array): Values in order of the values attribute (nnz).
+
+        Returns:
+            SparseTransitions instance.
+
+        """
+        result = object.__new__(type(self))
+        result.__dict__.update(self.__dict__)
+        result.values = values
+        return result
+
+    def of_sources(self, sources):
+        """
+        Select outgoing transitions of some source states.
+
+        Transitions are found by binary search in CSR order, so the cost
+        depends on the number of selected transitions only, not on nnz.
+
+        Arguments:
+            sources (array): Sorted distinct source states.
+
+        Returns:
+            SparseTransitions instance with transitions of sources, None if
+            sources have no outgoing transitions.
+
+        """
+        if self._by_source is None:
+            rows = self.rows
+        else:
+            rows = self.rows[self._by_source]
+        starts = np.searchsorted(rows, sources)
+        counts = np.searchsorted(rows, sources, side='right') - starts
+        total = counts.sum()
+        if total == 0:
+            return None
+        # positions starts[k], ..., starts[k] + counts[k] - 1 of all sources
+        entries = (np.repeat(starts - np.cumsum(counts) + counts, counts) +
+                   np.arange(total))
+        if self._by_source is not None:
+            entries = self._by_source[entries]
+        return SparseTransitions(self.rows[entries], self.cols[entries],
+                                 self.values[entries], self.size)
+
+    def positions(self, rows, cols):
+        """
+        Find positions of transitions in order of values attribute.
+
+        Arguments:
+            rows (array): Source states of stored transitions.
+            cols (array): Target states of stored transitions.
+
+        Returns:
+            An array with positions of transitions.
+
+        """
+        if self._by_source is None:
+            by_source = np.arange(self.nnz)
+        else:
+            by_source = self._by_source
+        keys = self.rows[by_source] * self.size + self.cols[by_source]
+        return by_source[np.searchsorted(
+            keys, np.asarray(rows) * self.size + cols)]
+
+    def todense(self, fill=0):
+        """
+        Convert to a dense matrix.
+
+        Arguments:
+            fill: Value of missing transitions (e.g. logarithm of zero).
+
+        Returns:
+            An array (N x N).
+
+        """
+        matrix = np.empty(self.shape, dtype=self.values.dtype)
+        matrix.fill(fill)
+        matrix[self.rows, self.cols] = self.values
+        return matrix
+
+    def reduce_sources(self, ufunc, arr, identity):
+        """
+        Reduce per transition values for every source state.
+
+        Arguments:
+            ufunc (ufunc): Binary universal function (e.g. np.add).
+            arr (array): Values of transitions in order of values attribute
+                (... x nnz).
+            identity: Result of states without outgoing transitions.
+
+        Returns:
+            An array (... x N).
+
+        """
+        result = np.empty(arr.shape[:-1] + (self.size,), dtype=arr.dtype)
+        result.fill(identity)
+        result[..., self._sources] = ufunc.reduceat(
+            arr, self._source_starts, axis=-1)
+        return result
+
+    def reduce_targets(self, ufunc, arr, identity):
+        """
+        Reduce per transition values for every target state.
+
+        Arguments:
+            ufunc (ufunc): Binary universal function (e.g. np.add).
+            arr (array): Values of transitions in order of values attribute
+                (... x nnz).
+            identity: Result of states without incoming transitions.
+
+        Returns:
+            An array (... x N).
+
+        """
+        result = np.empty(arr.shape[:-1] + (self.size,), dtype=arr.dtype)
+        result.fill(identity)
+        result[..., self._targets] = ufunc.reduceat(
+            arr[..., self._by_target], self._target_starts, axis=-1)
+        return result
+
+    def argmax_targets(self, arr, maxima):
+        """
+        Find source state of the first maximal transition of every target
+        state.
+
+        Arguments:
+            arr (array): Values of transitions in order of values attribute
+                (... x nnz).
+            maxima (array): Maxima of values for target states (... x N).
+
+        Returns:
+            An array with source states (... x N), 0 for states without
+            incoming transitions.
+
+        """
+        nnz = self.nnz
+        by_target = self._by_target
+        is_max = arr[..., by_target] == maxima[..., self.cols[by_target]]
+        candidates = np.where(is_max, np.arange(nnz), nnz)
+        first = np.minimum.reduceat(candidates, self._target_starts, axis=-1)
+        first = np.where(first == nnz, self._target_starts, first)
+        result = np.zeros(arr.shape[:-1] + (self.size,), dtype=np.intp)
+        result[..., self._targets] = self.rows[by_target][first]
+        return result
+
+
+class BandedTransitions(SparseTransitions):
+    """
+    Banded transition probabilities a_ij with j - i in a fixed set of
+    offsets (e.g. offsets 0, 1, 2 for left-to-right models with band width
+    3).
+
+    Values are stored diagonal by diagonal, so recursions over transitions
+    are shifted vector operations over the band only, without gathering
+    transitions by target state.
+
+    Arguments:
+        offsets (sequence): Offsets d of allowed transitions i -> i + d
+            (-N < d < N).
+        values (array): Values of transitions, diagonal after diagonal in
+            order of sorted offsets and source states (nnz).
+        size (int): Number of states N.
+
+    Reises:
+        ValueError if offsets are empty, duplicated, out of range or size of
+        values mismatch.
+
+    """
+    def __init__(self, offsets, values, size):
+        offsets = np.asarray(offsets, dtype=np.intp)
+        values = np.asarray(values)
+        if offsets.ndim != 1 or offsets.size == 0:
+            raise ValueError('offsets cannot be empty')
+        if np.any(np.abs(offsets) >= size):
+            raise ValueError('offset out of range')
+        offsets = np.sort(offsets)
+        if np.any(offsets[1:] == offsets[:-1]):
+            raise ValueError('offsets cannot be duplicated')
+
+        diagonals = []
+        rows = []
+        end = 0
+        for d in offsets:
+            low, high = max(0, -d), min(size, size - d)
+            diagonals.append((d, low, high, end, end + high - low))
+            rows.append(np.arange(low, high))
+            end += high - low
+        if values.shape != (end,):
+            raise ValueError('size of values mismatch offsets')
+
+        self.offsets = offsets
+        self.rows = np.concatenate(rows)
+        self.cols = self.rows + np.repeat(
+            offsets, [high - low for _, low, high, _, _ in diagonals])
+        self.values = values
+        self.size = size
+        self._diagonals = diagonals
+        # diagonal order to CSR order (see of_sources)
+        self._by_source = np.lexsort((self.cols, self.rows))
+
+    @classmethod
+    def from_dense(cls, matrix, offsets=None):
+        """
+        Create banded transitions from diagonals of a matrix.
+
+        Arguments:
+            matrix (array): Transition probabilities (N x N).
+            offsets (sequence): Offsets of allowed transitions, offsets of
+                diagonals with nonzero elements if None.
+
+        Returns:
+            BandedTransitions instance.
+
+        Reises:
+            ValueError if matrix has nonzero elements outside the band.
+
+        """
+        N = matrix.shape[0]
+        rows, cols = np.nonzero(matrix != 0)
+        if offsets is None:
+            offsets = np.unique(cols - rows)
+        elif not np.all(np.in1d(cols - rows, offsets)):
+            raise ValueError('transitions outside of the band')
+        offsets = np.sort(np.asarray(offsets, dtype=np.intp))
+        values = [np.diagonal(matrix, d) for d in offsets]
+        return cls(offsets, np.concatenate(values), N)
+
+    def reduce_sources(self, ufunc, arr, identity):
+        """
+        Reduce per transition values for every source state.
+
+        Arguments:
+            ufunc (ufunc): Binary universal function (e.g. np.add).
+            arr (array): Values of transitions in order of values attribute
+                (... x nnz).
+            identity: Result of states without outgoing transitions.
+
+        Returns:
+            An array (... x N).
+
+        """
+        result = np.empty(arr.shape[:-1] + (self.size,), dtype=arr.dtype)
+        result.fill(identity)
+        for _, low, high, start, end in self._diagonals:
+            result[..., low:high] = ufunc(result[..., low:high],
+                                          arr[..., start:end])
+        return result
+
+    def reduce_targets(self, ufunc, arr, identity):
+        """
+        Reduce per transition values for every target state.
+
+        Arguments:
+            ufunc (ufunc): Binary universal function (e.g. np.add).
+            arr (array): Values of transitions in order of values attribute
+                (... x nnz).
+            identity: Result of states without incoming transitions.
+
+        Returns:
+            An array (... x N).
+
+        """
+        result = np.empty(arr.shape[:-1] + (self.size,), dtype=arr.dtype)
+        result.fill(identity)
+        for d, low, high, start, end in self._diagonals:
+            result[..., low+d:high+d] = ufunc(result[..., low+d:high+d],
+                                              arr[..., start:end])
+        return result
+
+    def argmax_targets(self, arr, maxima):
+        """
+        Find source state of the first maximal transition of every target
+        state.
+
+        Arguments:
+            arr (array): Values of transitions in order of values attribute
+                (... x nnz).
+            maxima (array): Maxima of values for target states (... x N).
+
+        Returns:
+            An array with source states (... x N), 0 for states without
+            incoming transitions.
+
+        """
+        result = np.zeros(arr.shape[:-1] + (self.size,), dtype=np.intp)
+        found = np.zeros(result.shape, dtype=bool)
+        # greater offsets come from smaller source states
+        for d, low, high, start, end in reversed(self._diagonals):
+            targets = slice(low + d, high + d)
+            is_first = ((arr[..., start:end] == maxima[..., targets]) &
+                        ~found[..., targets])
+            np.copyto(result[..., targets], self.rows[start:end],
+                      where=is_first)
+            found[..., targets] |= is_first
+        return result
+
+
+_worker_sequences = None
+
+
+def _init_worker(sequences):
+    """
+    Keep training sequences in pool worker process.
+
+    Sequences are passed once per worker instead of with every task.
+
+    Arguments:
+        sequences (list): Observed sequences.
+
+    """
+    global _worker_sequences
+    _worker_sequences = sequences
+
+
+def _shard_expectations(args):
+    """
+    Run E-step on shard of sequences in pool worker process.
+
+    Arguments:
+        args (tuple): Model, indices of sequences in the shard and
+            checkpoint flag of E-step.
+
+    Returns:
+        Expectations tuple summed over sequences of the shard.
+
+    """
+    model, shard, checkpoint = args
+    return model._sequences_expectations(
+        [_worker_sequences[k] for k in shard], checkpoint)
+
+
+_worker_model = None
+
+
+def _init_scoring_worker(model):
+    """
+    Keep scored model in pool worker process.
+
+    Model parameters are passed once per worker instead of with every task.
+
+    Arguments:
+        model (GenericHMM): Model with parameters set.
+
+    """
+    global _worker_model
+    _worker_model = model
+
+
+def _score_chunk(chunk):
+    """
+    Score chunk of sequences in pool worker process.
+
+    Arguments:
+        chunk (list): Observed sequences.
+
+    Returns:
+        List with log-likelihoods of sequences.
+
+    """
+    return [_worker_model.score(observations) for observations in chunk]
+
+
+def _time_chunk_transfer(args):
+    """
+    Compute transfer matrix of a time chunk in pool worker process.
+
+    Arguments:
+        args (tuple): Model, logarithms of start rows and indices of
+            observed symbols of the chunk.
+
+    Returns:
+        Logarithms of transfer matrix rows (see _compute_transfer).
+
+    """
+    model, log_start, indices = args
+    return model._compute_transfer(log_start, indices)
+
+
+def _time_chunk_lattices(args):
+    """
+    Fill forward and backward variables of a time chunk in pool worker
+    process.
+
+    Arguments:
+        args (tuple): Model, forward variable before the chunk, backward
+            variable at the end of the chunk and indices of observed symbols
+            of the chunk.
+
+    Returns:
+        Tuple (log_alpha, log_beta) of the chunk.
+
+    """
+    model, log_alpha_prev, log_beta_end, indices = args
+    return model._compute_chunk_lattices(log_alpha_prev, log_beta_end,
+                                         indices)
+
+
+def _time_chunk_expectations(args):
+    """
+    Compute expected counts of a time chunk in pool worker process.
+
+    Arguments:
+        args (tuple): Model, forward variable before the chunk, backward
+            variable at the end of the chunk, log-likelihood of the whole
+            sequence and indices of observed symbols of the chunk.
+
+    Returns:
+        Expectations tuple of the chunk.
+
+    """
+    model, log_alpha_prev, log_beta_end, log_likelihood, indices = args
+    return model._compute_chunk_expectations(log_alpha_prev, log_beta_end,
+                                             log_likelihood, indices)
+
+
 class GenericHMM(object):
     """
     Generic class for Hidden Markov Models.
 
-    """
-    def __init__(self, states, symbols):
-        self._log_alpha = None
-        self._log_beta = None
-        self._log_gamma = None
-        self._log_eta = None
+    Arguments:
+        states (sequence): Hidden states.
+        symbols (sequence): Observable symbols.
+        numeric (str): Numeric backend: 'decimal' (arbitrary precision,
+            Decimal('NaN') as logarithm of zero) or 'float64' (native floats,
+            -inf as logarithm of zero).
+        engine (str): Forward-backward engine: 'log' (log space recursions)
+            or 'scaled' (Rabiner scaled probabilities with matrix-vector
+            products, float64 backend only).
+        lattice_dir (str): Directory for memory-mapped alpha, beta and
+            gamma lattices (.npy files, time steps stored contiguously),
+            float64 backend and log engine only. Lattices are kept in memory
+            if None.
+        topology (int or sequence): Allowed transitions i -> i + d, band
+            width k of left-to-right model (offsets 0, ..., k-1) or sequence
+            of offsets d. Transition matrices are stored as
+            BandedTransitions. Any transitions are allowed if None.
+
+    """
+    def __init__(self, states, symbols, numeric='decimal', engine='log',
+                 lattice_dir=None, topology=None):
+        if numeric not in NUMERIC_TYPES:
+            raise ValueError(
+                'numeric must be one of: {0}'.format(', '.join(NUMERIC_TYPES)))
+        if engine not in ENGINES:
+            raise ValueError(
+                'engine must be one of: {0}'.format(', '.join(ENGINES)))
+        if engine == 'scaled' and numeric != 'float64':
+            raise ValueError('scaled engine requires float64 numeric')
+        if lattice_dir is not None and (numeric != 'float64' or
+                                        engine != 'log'):
+            raise ValueError(
+                'lattice_dir requires float64 numeric and log engine')
+        if isinstance(topology, (int, long)):
+            if topology < 1:
+                raise ValueError('band width must be positive')
+            topology = range(topology)
+        if topology is not None:
+            topology = tuple(sorted(set(topology)))
+            if not topology:
+                raise ValueError('topology cannot be empty')
+
+        self.numeric = numeric
+        self.engine = engine
+        self.lattice_dir = lattice_dir
+        self.topology = topology
+        self._dtype = object if numeric == 'decimal' else np.float64
+        self._semirings = {}
+
+        self._log_scales = None
+        self._log_pruned = None
+        self._log_alpha = None
+        self._log_beta = None
+        self._log_gamma = None
+        self._log_eta = None
+
+        self._initial_states = None
+        self._transition_matrix = None
+        self._emission_matrix = None
+        self._log_initial_states = None
+        self._log_transition_matrix = None
+        self._log_emission_matrix = None
+
+        self.states = states
+        self.symbols = symbols
+
+    def __getstate__(self):
+        """
+        Drop cached semirings (functions of semirings cannot be pickled),
+        they are created again when needed.
+
+        """
+        state = self.__dict__.copy()
+        state['_semirings'] = {}
+        return state
+
+    @property
+    def symbols(self):
+        """
+        Observable symbols v_1, ..., v_M.
+
+        """
+        return self._symbols
+
+    @symbols.setter
+    def symbols(self, value):
+        self._symbols = value
+        self._symbol_index = dict(
+            (symbol, k) for k, symbol in enumerate(value))
+
+    @property
+    def initial_states(self):
+        """
+        Initial states probabilities pi_i (read-only array with N elements).
+
+        """
+        return self._initial_states
+
+    @initial_states.setter
+    def initial_states(self, value):
+        self._check_parameter(value, 1)
+        self._initial_states, self._log_initial_states = \
+            self._parameter_with_log(value)
+        self._invalidate_lattices()
+
+    @property
+    def transition_matrix(self):
+        """
+        Transition probabilities a_ij (read-only N x N array or
+        SparseTransitions).
+
+        """
+        return self._transition_matrix
+
+    @transition_matrix.setter
+    def transition_matrix(self, value):
+        if self.topology is not None and not (
+                isinstance(value, BandedTransitions) and
+                tuple(value.offsets) == self.topology):
+            if isinstance(value, SparseTransitions):
+                value = value.todense(
+                    decimal.Decimal(0) if self.numeric == 'decimal' else 0.)
+            self._check_parameter(value, 2)
+            if value.shape[0] != value.shape[1]:
+                raise ValueError('transition matrix must be square')
+            value = BandedTransitions.from_dense(value, self.topology)
+        if isinstance(value, SparseTransitions):
+            self._check_parameter(value.values, 1)
+            parameter, log_parameter = self._parameter_with_log(value.values)
+            self._transition_matrix = value.with_values(parameter)
+            self._log_transition_matrix = value.with_values(log_parameter)
+            self._invalidate_lattices()
+            return
+        self._check_parameter(value, 2)
+        if value.shape[0] != value.shape[1]:
+            raise ValueError('transition matrix must be square')
+        self._transition_matrix, self._log_transition_matrix = \
+            self._parameter_with_log(value)
+        self._invalidate_lattices()
+
+    @property
+    def log_pruned(self):
+        """
+        Logarithms of fractions of mass pruned at every time step by the
+        last beam-pruned recursion (read-only T array, logarithm of zero
+        where nothing was pruned), None if no recursion was pruned.
+
+        """
+        return self._log_pruned
+
+    @property
+    def emission_matrix(self):
+        """
+        Emission probabilities b_i (v_k) (read-only N x M array with column
+        per model symbol).
+
+        """
+        return self._emission_matrix
+
+    @emission_matrix.setter
+    def emission_matrix(self, value):
+        self._check_parameter(value, 2)
+        self._emission_matrix, self._log_emission_matrix = \
+            self._parameter_with_log(value)
+        self._invalidate_lattices()
+
+    def encode(self, observations):
+        """
+        Map observed symbols to their indices in model symbols.
+
+        Encoded sequences can be passed instead of symbols to decode, fit
+        and fit_sequences, so the mapping is done only once. Only
+        EncodedObservations are taken as indices, integer arrays of other
+        types are mapped as symbols.
+
+        Arguments:
+            observations (sequence): Observed symbols O_1, ..., O_T, or
+                EncodedObservations (returned as is).
+
+        Returns:
+            EncodedObservations with indices of symbols (T).
+
+        Reises:
+            ValueError if observation is not a model symbol or index is out
+            of range.
+
+        """
+        if isinstance(observations, EncodedObservations):
+            M = len(self.symbols)
+            if observations.ndim != 1:
+                raise ValueError('encoded observations must be 1-dimensional')
+            if np.any(observations < 0) or np.any(observations >= M):
+                raise ValueError('symbol index out of range')
+            return observations
+
+        index = self._symbol_index
+        try:
+            indices = np.array([index[o] for o in observations],
+                               dtype=np.intp)
+        except KeyError as e:
+            raise ValueError('unknown symbol: {0!r}'.format(e.args[0]))
+        return indices.view(EncodedObservations)
+
+    @classmethod
+    def _check_parameter(cls, value, ndim):
+        """
+        Check model parameter before assignment.
+
+        Arguments:
+            value (array): Probabilities.
+            ndim (int): Expected number of dimensions.
+
+        Reises:
+            ValueError if value is None, empty or has invalid size.
+            TypeError if value is not an array.
+
+        """
+        if value is None:
+            raise ValueError('parameter cannot be None')
+        if not isinstance(value, np.ndarray):
+            raise TypeError('parameter must be an array')
+        if value.ndim != ndim:
+            raise ValueError(
+                'parameter must have {0} dimension(s)'.format(ndim))
+        if value.size == 0:
+            raise ValueError('parameter cannot be empty')
+
+    def _parameter_with_log(self, value):
+        """
+        Prepare model parameter and its logarithm.
+
+        Logarithms are computed once here, so recursions never take
+        logarithm of parameters.
+
+        Arguments:
+            value (array): Probabilities.
+
+        Returns:
+            Tuple (parameter, log_parameter) with read-only arrays.
+
+        Reises:
+            ValueError if value has negative elements.
+
+        """
+        if self.numeric == 'float64':
+            parameter = np.array(value, dtype=np.float64)
+            if np.any(parameter < 0):
+                raise ValueError('probabilities cannot be negative')
+            with np.errstate(divide='ignore'):
+                log_parameter = np.log(parameter)
+        else:
+            parameter = np.array(value, dtype=object)
+            log_parameter = np.empty_like(parameter)
+            for index, x in np.ndenumerate(parameter):
+                log_parameter[index] = self._eln(x)
+
+        parameter.flags.writeable = False
+        log_parameter.flags.writeable = False
+        return parameter, log_parameter
+
+    def _log_parameter_with_exp(self, log_value):
+        """
+        Prepare model parameter from its logarithm.
+
+        Arguments:
+            log_value (array): Logarithms of probabilities (array or
+                SparseTransitions).
+
+        Returns:
+            Tuple (parameter, log_parameter) with read-only arrays, or
+            SparseTransitions with read-only values.
+
+        """
+        if isinstance(log_value, SparseTransitions):
+            parameter, log_parameter = self._log_parameter_with_exp(
+                log_value.values)
+            return (log_value.with_values(parameter),
+                    log_value.with_values(log_parameter))
+
+        log_parameter = np.array(log_value, dtype=self._dtype)
+        if self.numeric == 'float64':
+            parameter = np.exp(log_parameter)
+        else:
+            parameter = np.frompyfunc(self._eexp, 1, 1)(log_parameter)
+            parameter = np.asarray(parameter, dtype=object)
+
+        parameter.flags.writeable = False
+        log_parameter.flags.writeable = False
+        return parameter, log_parameter
+
+    def _set_log_parameters(self, log_pi, log_a, log_b):
+        """
+        Replace model parameters with re-estimated logarithms.
+
+        Arguments:
+            log_pi (array): Logarithms of initial states probabilities (N).
+            log_a (array): Logarithms of transition probabilities (N x N).
+            log_b (array): Logarithms of emission probabilities (N x M).
+
+        """
+        self._initial_states, self._log_initial_states = \
+            self._log_parameter_with_exp(log_pi)
+        self._transition_matrix, self._log_transition_matrix = \
+            self._log_parameter_with_exp(log_a)
+        self._emission_matrix, self._log_emission_matrix = \
+            self._log_parameter_with_exp(log_b)
+        self._invalidate_lattices()
+
+    def _invalidate_lattices(self):
+        """
+        Forget lattices computed with previous model parameters.
+
+        """
+        self._log_scales = None
+        self._log_pruned = None
+        self._log_alpha = None
+        self._log_beta = None
+        self._log_gamma = None
+        self._log_eta = None
+
+    @classmethod
+    def _check_lattice(cls, arr, ndim):
+        """
+        Check array passed to recursions.
+
+        Arguments:
+            arr (array): An array with logarithms.
+            ndim (int): Expected number of dimensions.
+
+        Reises:
+            TypeError if arr is None.
+            ValueError if arr is empty, has missing elements or invalid size.
+
+        """
+        if arr is None:
+            raise TypeError('array cannot be None')
+        arr = np.asarray(arr)
+        if arr.ndim != ndim:
+            raise ValueError('array must have {0} dimension(s)'.format(ndim))
+        if arr.size == 0:
+            raise ValueError('array cannot be empty')
+        if arr.dtype == object and any(x is None for x in arr.flat):
+            raise ValueError('array cannot have missing elements')
+
+    @classmethod
+    def _check_decimals(cls, *args):
+        """
+        Check that all arguments are Decimal numbers.
+
+        Reises:
+            TypeError if any argument is not a Decimal.
+
+        """
+        for x in args:
+            if not isinstance(x, decimal.Decimal):
+                raise TypeError('arguments must be Decimals')
+
+    def _numeric_primitives(self):
+        """
+        Select log space primitives of the numeric backend.
+
+        Returns:
+            Tuple (logzero, logone, elnsum, elnproduct) with logarithms of
+            zero and one and extended logarithm sum and product functions.
+
+        """
+        if self.numeric == 'float64':
+            return -np.inf, 0.0, np.logaddexp, operator.add
+        else:
+            return (decimal.Decimal('NaN'), decimal.Decimal(0),
+                    self._elnsum, self._elnproduct)
+
+    def _elnsum_ufunc(self):
+        """
+        Select elementwise extended logarithm sum for numeric backend.
+
+        Returns:
+            Universal function (eln_x, eln_y) -> array with logarithms of sums.
+
+        """
+        if self.numeric == 'float64':
+            return np.logaddexp
+        else:
+            return np.frompyfunc(self._elnsum, 2, 1)
+
+    def _elnsum_reducer(self):
+        """
+        Select extended logarithm sum along array axis for numeric backend.
+
+        Decimal backend reduces with _elnsum, so results are identical to
+        pairwise summation.
+
+        Returns:
+            Function (arr, axis) -> array with logarithms of sums.
+
+        """
+        if self.numeric == 'float64':
+            return _logsumexp
+        else:
+            elnsum = self._elnsum_ufunc()
+            return lambda arr, axis: elnsum.reduce(arr, axis=axis)
+
+    def _elnmax_reducer(self):
+        """
+        Select extended logarithm maximum along array axis for numeric
+        backend.
+
+        Returns:
+            Function (arr, axis) -> tuple (maxima, indices of maxima).
+
+        """
+        if self.numeric == 'float64':
+            return lambda arr, axis: (np.max(arr, axis=axis),
+                                      np.argmax(arr, axis=axis))
+        else:
+            elnmax = np.frompyfunc(self._elnmax, 2, 1)
+
+            def reduce(arr, axis):
+                maxima = elnmax.reduce(arr, axis=axis)
+                is_max = arr == np.expand_dims(maxima, axis)
+                return maxima, np.argmax(is_max, axis=axis)
+            return reduce
+
+    def _elnmax_ufunc(self):
+        """
+        Select elementwise extended logarithm maximum for numeric backend.
+
+        Returns:
+            Universal function (eln_x, eln_y) -> array with greater
+            logarithms.
+
+        """
+        if self.numeric == 'float64':
+            return np.maximum
+        else:
+            return np.frompyfunc(self._elnmax, 2, 1)
+
+    def _check_transitions(self, log_a):
+        """
+        Check logarithms of transition probabilities passed to recursions.
+
+        Arguments:
+            log_a (array): Logarithms of transition probabilities (N x N
+                array or SparseTransitions).
+
+        Reises:
+            TypeError if log_a is None.
+            ValueError if log_a is empty or has invalid size.
+
+        """
+        if isinstance(log_a, SparseTransitions):
+            self._check_lattice(log_a.values, 1)
+        else:
+            self._check_lattice(log_a, 2)
+
+    def _semiring(self, name):
+        """
+        Select semiring of lattice recursions for numeric backend.
+
+            'sum': log-sum-product (forward variable, likelihood)
+            'max': max-product (Viterbi's delta, with selected predecessors)
+            'count': numbers of paths with nonzero probability (exact
+                integers)
+
+        Arguments:
+            name (str): Name of the semiring.
+
+        Semirings are created once per model, recursions ask for them on
+        every time step.
+
+        Returns:
+            Semiring tuple.
+
+        Reises:
+            ValueError if name is unknown.
+
+        """
+        try:
+            return self._semirings[name]
+        except KeyError:
+            pass
+        logzero, logone, _, _ = self._numeric_primitives()
+        if name == 'sum':
+            semiring = Semiring(logzero, logone, self._elnsum_ufunc(), np.add,
+                                self._elnsum_reducer(), None, None,
+                                self._dtype)
+        elif name == 'max':
+            plus = self._elnmax_ufunc()
+            semiring = Semiring(
+                logzero, logone, plus, np.add,
+                lambda arr, axis: plus.reduce(arr, axis=axis),
+                self._elnmax_reducer(), None, self._dtype)
+        elif name == 'count':
+            semiring = Semiring(
+                0, 1, np.add, np.multiply,
+                lambda arr, axis: np.add.reduce(arr, axis=axis),
+                None, self._nonzero_counts, object)
+        else:
+            raise ValueError('unknown semiring: {0!r}'.format(name))
+        self._semirings[name] = semiring
+        return semiring
+
+    def _nonzero_counts(self, log_x):
+        """
+        Map logarithms of probabilities to path counts of counting semiring.
+
+        Arguments:
+            log_x (array): Logarithms of probabilities.
+
+        Returns:
+            An array with integers 1 (nonzero probability) or 0.
+
+        """
+        if self.numeric == 'float64':
+            nonzero = np.isfinite(log_x)
+        else:
+            nonzero = np.frompyfunc(lambda x: not x.is_nan(), 1, 1)(log_x)
+        return np.asarray(nonzero, dtype=bool).astype(np.intp).astype(object)
+
+    def _lift_transitions(self, semiring, log_a):
+        """
+        Map logarithms of transition probabilities to semiring values.
+
+        Arguments:
+            semiring (Semiring): Semiring of the recursion.
+            log_a (array): Logarithms of transition probabilities (N x N
+                array or SparseTransitions).
+
+        Returns:
+            Semiring values in the same structure.
+
+        """
+        if semiring.lift is None:
+            return log_a
+        if isinstance(log_a, SparseTransitions):
+            return log_a.with_values(semiring.lift(log_a.values))
+        return semiring.lift(log_a)
+
+    def _semiring_predecessors(self, semiring, x, a, sources=None):
+        """
+        Combine over predecessors in a semiring.
+
+            plus_{i=1}^N x (i) a_ij
+
+        Arguments:
+            semiring (Semiring): Semiring of the recursion.
+            x (array): State values (... x N).
+            a (array): Transition values (N x N array or
+                SparseTransitions).
+            sources (array): Sorted indices of the only predecessors with
+                nonzero values (e.g. states surviving beam pruning), all
+                states if None. Only their rows of transitions are used.
+
+        Returns:
+            An array with combined values for every state j (... x N).
+
+        """
+        if isinstance(a, SparseTransitions):
+            if sources is not None:
+                a = a.of_sources(sources)
+                if a is None:
+                    return np.full(x.shape, semiring.zero, dtype=x.dtype)
+            return a.reduce_targets(
+                semiring.plus, semiring.times(x[..., a.rows], a.values),
+                semiring.zero)
+        if sources is not None:
+            return semiring.reduce(semiring.times(
+                x[..., sources, np.newaxis], a[sources]), -2)
+        return semiring.reduce(
+            semiring.times(x[..., :, np.newaxis], a), -2)
+
+    def _semiring_successors(self, semiring, a, x):
+        """
+        Combine over successors in a semiring.
+
+            plus_{j=1}^N a_ij x (j)
+
+        Arguments:
+            semiring (Semiring): Semiring of the recursion.
+            a (array): Transition values (N x N array or
+                SparseTransitions).
+            x (array): State values (... x N).
+
+        Returns:
+            An array with combined values for every state i (... x N).
+
+        """
+        if isinstance(a, SparseTransitions):
+            return a.reduce_sources(
+                semiring.plus, semiring.times(a.values, x[..., a.cols]),
+                semiring.zero)
+        return semiring.reduce(
+            semiring.times(a, x[..., np.newaxis, :]), -1)
+
+    def _semiring_select_predecessors(self, semiring, x, a, sources=None):
+        """
+        Combine over predecessors in a selecting semiring (e.g. max) and
+        find the selected predecessors.
+
+        Arguments:
+            semiring (Semiring): Semiring with select.
+            x (array): State values (N).
+            a (array): Transition values (N x N array or
+                SparseTransitions).
+            sources (array): Sorted indices of the only predecessors with
+                nonzero values, all states if None.
+
+        Returns:
+            Tuple (values, predecessors) for every state j (N).
+
+        """
+        if isinstance(a, SparseTransitions):
+            if sources is not None:
+                a = a.of_sources(sources)
+                if a is None:
+                    return (np.full(x.shape, semiring.zero, dtype=x.dtype),
+                            np.zeros(x.shape, dtype=np.intp))
+            terms = semiring.times(x[a.rows], a.values)
+            values = a.reduce_targets(semiring.plus, terms, semiring.zero)
+            return values, a.argmax_targets(terms, values)
+        if sources is not None:
+            values, selected = semiring.select(
+                semiring.times(x[sources, np.newaxis], a[sources]), 0)
+            return values, sources[selected]
+        return semiring.select(semiring.times(x[:, np.newaxis], a), 0)
+
+    def _prune(self, semiring, x, beam, max_states):
+        """
+        Prune states of a time step by score (float64 log semirings).
+
+        Arguments:
+            semiring (Semiring): Semiring of the recursion.
+            x (array): State values (N).
+            beam (float): Keep states with values not lower than the best
+                value minus beam, no limit if None.
+            max_states (int): Keep at most max_states best states, no limit
+                if None.
+
+        Returns:
+            Tuple (x, sources, log_pruned) with values of pruned states
+            replaced by zero of the semiring, indices of surviving states and
+            logarithm of pruned fraction of the semiring sum of values.
+
+        """
+        keep = np.ones(x.shape, dtype=bool)
+        if beam is not None:
+            keep &= x >= np.max(x) - beam
+        if max_states is not None and np.count_nonzero(keep) > max_states:
+            best = np.zeros(x.shape, dtype=bool)
+            best[np.argpartition(-x, max_states - 1)[:max_states]] = True
+            keep &= best
+        if keep.all():
+            return x, None, semiring.zero
+
+        with np.errstate(invalid='ignore'):
+            log_pruned = semiring.reduce(x[~keep], 0) - semiring.reduce(x, 0)
+        if np.isnan(log_pruned):
+            log_pruned = semiring.zero
+        return np.where(keep, x, semiring.zero), np.flatnonzero(keep), \
+            log_pruned
+
+    def _log_pruned_buffer(self, T):
+        """
+        Allocate array for logarithms of pruned fractions of time steps.
+
+        Arguments:
+            T (int): Number of time steps.
+
+        Returns:
+            An array (T) filled with logarithm of zero.
+
+        """
+        log_pruned = np.empty(T, dtype=np.float64)
+        log_pruned.fill(-np.inf)
+        return log_pruned
+
+    def _elnsum_predecessors(self, log_alpha, log_a):
+        """
+        Sum over predecessors in log space.
+
+            sum_{i=1}^N alpha (i) a_ij
+
+        Arguments:
+            log_alpha (array): Logarithms of state values (... x N).
+            log_a (array): Logarithms of transition probabilities (N x N
+                array or SparseTransitions).
+
+        Returns:
+            An array with logarithms of sums for every state j (... x N).
+
+        """
+        return self._semiring_predecessors(self._semiring('sum'), log_alpha,
+                                           log_a)
+
+    def _elnsum_successors(self, log_a, log_x):
+        """
+        Sum over successors in log space.
+
+            sum_{j=1}^N a_ij x (j)
+
+        Arguments:
+            log_a (array): Logarithms of transition probabilities (N x N
+                array or SparseTransitions).
+            log_x (array): Logarithms of state values (... x N).
+
+        Returns:
+            An array with logarithms of sums for every state i (... x N).
+
+        """
+        return self._semiring_successors(self._semiring('sum'), log_a, log_x)
+
+    def _transition_terms(self, log_alpha, log_a, log_x):
+        """
+        Combine state values over every transition in log space.
+
+            alpha (i) a_ij x (j)
+
+        Arguments:
+            log_alpha (array): Logarithms of source state values (N).
+            log_a (array): Logarithms of transition probabilities (N x N
+                array or SparseTransitions).
+            log_x (array): Logarithms of target state values (N).
+
+        Returns:
+            An array with logarithms of products (N x N, or nnz in order of
+            sparse transitions).
+
+        """
+        if isinstance(log_a, SparseTransitions):
+            return (log_alpha[log_a.rows] + log_a.values +
+                    log_x[log_a.cols])
+        return log_alpha[:, np.newaxis] + log_a + log_x
+
+    def _transition_zeros(self, log_a):
+        """
+        Create logarithms of zero for every transition.
+
+        Arguments:
+            log_a (array): Transitions (N x N array or SparseTransitions).
+
+        Returns:
+            An array shaped like result of _transition_terms.
+
+        """
+        logzero, _, _, _ = self._numeric_primitives()
+        if isinstance(log_a, SparseTransitions):
+            shape = (log_a.nnz,)
+        else:
+            shape = log_a.shape
+        return np.full(shape, logzero, dtype=self._dtype)
+
+    def _transitions_like(self, log_a, log_values):
+        """
+        Wrap per transition values in the structure of transitions.
+
+        Arguments:
+            log_a (array): Transitions (N x N array or SparseTransitions).
+            log_values (array): Values returned by _transition_terms.
+
+        Returns:
+            An array (N x N) or SparseTransitions.
+
+        """
+        if isinstance(log_a, SparseTransitions):
+            return log_a.with_values(log_values)
+        return log_values
+
+    def _exp_transitions(self, log_a):
+        """
+        Exponentiate logarithms of transition probabilities (float64).
+
+        Arguments:
+            log_a (array): Logarithms of transition probabilities (N x N
+                array or SparseTransitions).
+
+        Returns:
+            Transition probabilities in the same structure.
+
+        """
+        if isinstance(log_a, SparseTransitions):
+            return log_a.with_values(np.exp(log_a.values))
+        return np.exp(log_a)
+
+    def _dot_predecessors(self, alpha, a):
+        """
+        Sum over predecessors of probabilities (float64).
+
+            sum_{i=1}^N alpha (i) a_ij
+
+        Arguments:
+            alpha (array): State values (... x N).
+            a (array): Transition probabilities (N x N array or
+                SparseTransitions).
+
+        Returns:
+            An array with sums for every state j (... x N).
+
+        """
+        if isinstance(a, SparseTransitions):
+            return a.reduce_targets(np.add, alpha[..., a.rows] * a.values, 0.)
+        return alpha.dot(a)
+
+    def _dot_successors(self, a, x):
+        """
+        Sum over successors of probabilities (float64).
+
+            sum_{j=1}^N a_ij x (j)
+
+        Arguments:
+            a (array): Transition probabilities (N x N array or
+                SparseTransitions).
+            x (array): State values (... x N).
+
+        Returns:
+            An array with sums for every state i (... x N).
+
+        """
+        if isinstance(a, SparseTransitions):
+            return a.reduce_sources(np.add, a.values * x[..., a.cols], 0.)
+        return x.dot(a.T)
+
+    def _prepare_log_parameters(self, log_pi, log_a, log_b):
+        """
+        Check logarithms of model parameters passed to recursions.
+
+        Arguments:
+            log_pi (array): Logarithms of initial states probabilities (N).
+            log_a (array): Logarithms of transition probabilities (N x N).
+            log_b (array): Logarithms of emission probabilities (N x T).
+
+        Returns:
+            Tuple (log_pi, log_a, log_b) converted to numeric backend.
+
+        Reises:
+            TypeError if any argument is None.
+            ValueError if any argument is empty or sizes mismatch.
+
+        """
+        self._check_lattice(log_pi, 1)
+        self._check_transitions(log_a)
+        self._check_lattice(log_b, 2)
+        log_pi = self._as_numeric(log_pi)
+        log_a = self._as_numeric(log_a)
+        log_b = self._as_numeric(log_b)
+        N = log_b.shape[0]
+        if log_pi.shape != (N,) or log_a.shape != (N, N):
+            raise ValueError('sizes of model parameters mismatch')
+        return log_pi, log_a, log_b
+
+    def _encoded_log_parameters_of(self, observations):
+        """
+        Select logarithms of model parameters and encode observed symbols.
+
+        Emissions are not gathered for time steps, recursions read columns
+        of the emission table for observed symbols (see indices argument of
+        _compute_lattice).
+
+        Arguments:
+            observations (sequence): Observed symbols O_1, ..., O_T.
+
+        Returns:
+            Tuple (log_pi, log_a, log_emission_matrix, indices) with
+            logarithms of initial states (N), transition (N x N) and
+            emission (N x M) probabilities and indices of observed symbols
+            (T).
+
+        Reises:
+            ValueError if model parameters are not set, emission matrix does
+            not match model symbols or observation is not a model symbol.
+
+        """
+        log_parameters = (self._log_initial_states,
+                          self._log_transition_matrix,
+                          self._log_emission_matrix)
+        if any(x is None for x in log_parameters):
+            raise ValueError('model parameters are not set')
+        log_pi, log_a, log_emission_matrix = log_parameters
+        if log_emission_matrix.shape[1] != len(self.symbols):
+            raise ValueError('emission matrix must have column per symbol')
+        return log_pi, log_a, log_emission_matrix, self.encode(observations)
+
+    def _log_parameters_of(self, observations):
+        """
+        Gather logarithms of model parameters for observed symbols.
+
+        Emissions of all time steps are gathered into one array, so this is
+        meant for short sequences (e.g. checking recursions on explicit
+        lattices), public methods use _encoded_log_parameters_of.
+
+        Arguments:
+            observations (sequence): Observed symbols O_1, ..., O_T.
+
+        Returns:
+            Tuple (log_pi, log_a, log_b) with logarithms of initial states
+            (N), transition (N x N) and emission b_i (O_t) (N x T)
+            probabilities.
+
+        Reises:
+            ValueError if model parameters are not set, emission matrix does
+            not match model symbols or observation is not a model symbol.
+
+        """
+        log_pi, log_a, log_emission_matrix, indices = \
+            self._encoded_log_parameters_of(observations)
+        return log_pi, log_a, log_emission_matrix[:, indices]
+
+    def _batch_log_parameters_of(self, sequences):
+        """
+        Gather logarithms of model parameters for a batch of sequences.
+
+        Emissions of sequences shorter than the longest one are padded with
+        logarithm of zero.
+
+        Arguments:
+            sequences (sequence): B observed sequences.
+
+        Returns:
+            Tuple (log_pi, log_a, log_b, lengths) with logarithms of initial
+            states (N), transition (N x N) and emission b_i (O_t)
+            (B x T_max x N) probabilities and lengths of sequences (B).
+
+        Reises:
+            ValueError if sequences are empty, any sequence is empty, model
+            parameters are not set or observation is not a model symbol.
+
+        """
+        sequences = list(sequences)
+        if not sequences:
+            raise ValueError('sequences cannot be empty')
+        log_pi, log_a, _, _ = self._encoded_log_parameters_of([])
+        log_emission_matrix = self._log_emission_matrix
+        lengths = np.array([len(o) for o in sequences], dtype=np.intp)
+        if np.any(lengths == 0):
+            raise ValueError('sequences cannot be empty')
+
+        indices = np.zeros((len(sequences), lengths.max()), dtype=np.intp)
+        for k, observations in enumerate(sequences):
+            indices[k, :lengths[k]] = self.encode(observations)
+        log_b = log_emission_matrix.T[indices]
+        logzero, _, _, _ = self._numeric_primitives()
+        log_b[np.arange(indices.shape[1]) >= lengths[:, np.newaxis]] = logzero
+        return log_pi, log_a, log_b, lengths
+
+    def _observation_indices(self, observations, T=None):
+        """
+        Map observed symbols of a sequence of known length to indices.
+
+        Arguments:
+            observations (sequence): Observed symbols O_1, ..., O_T.
+            T (int): Expected length of observations, any length but zero
+                if None.
+
+        Returns:
+            An array with indices of symbols (T).
+
+        Reises:
+            TypeError if observations is None.
+            ValueError if length of observations is not T (is zero) or
+            observation is not a model symbol.
+
+        """
+        if observations is None:
+            raise TypeError('observations cannot be None')
+        indices = self.encode(observations)
+        if T is None:
+            if len(indices) == 0:
+                raise ValueError('observations cannot be empty')
+        elif indices.shape != (T,):
+            raise ValueError('sizes of observations and emissions mismatch')
+        return indices
+
+    def _as_numeric(self, arr):
+        """
+        Convert array to the dtype of the numeric backend.
+
+        Arguments:
+            arr (array): An array.
+
+        Returns:
+            Array with object (Decimal) or float64 elements.
+
+        """
+        if isinstance(arr, SparseTransitions):
+            return arr.with_values(np.asarray(arr.values, dtype=self._dtype))
+        return np.asarray(arr, dtype=self._dtype)
+
+    def _elnquotient(self, log_x, log_y):
+        """
+        Extended logarithm quotient x / y elementwise.
+
+        Arguments:
+            log_x (array): Logarithms of dividends.
+            log_y (array): Logarithms of divisors (broadcastable to log_x).
+
+        Returns:
+            An array with logarithms of quotients (logarithm of zero where
+            x is zero).
+
+        """
+        if self.numeric == 'float64':
+            with np.errstate(invalid='ignore'):
+                return np.where(np.isneginf(log_x), -np.inf, log_x - log_y)
+        else:
+            return log_x - log_y
+
+    def _lattice_buffer(self, out, shape, name=None):
+        """
+        Select array for lattice of the given shape.
+
+        Named lattices of a model with lattice_dir are memory-mapped .npy
+        files in Fortran order, so every time step (column) is contiguous on
+        disk. Every call creates a new file, the path is in the filename
+        attribute of the result.
+
+        Arguments:
+            out (array): Preallocated buffer or None.
+            shape (tuple): Shape of the lattice.
+            name (str): Name of the lattice (file name prefix).
+
+        Returns:
+            The buffer if it matches shape and dtype of numeric backend,
+            a new array (or memory-mapped array) otherwise.
+
+        """
+        if (out is not None and out.shape == shape and
+                out.dtype == np.dtype(self._dtype)):
+            return out
+        if self.lattice_dir is not None and name is not None:
+            fd, path = tempfile.mkstemp(suffix='.npy', prefix=name + '-',
+                                        dir=self.lattice_dir)
+            os.close(fd)
+            return np.lib.format.open_memmap(
+                path, mode='w+', dtype=self._dtype, shape=shape,
+                fortran_order=True)
+        return np.empty(shape, dtype=self._dtype)
+
+    @classmethod
+    def _time_chunks(cls, T, N):
+        """
+        Split time steps into chunks of about LATTICE_CHUNK_ELEMENTS lattice
+        elements.
+
+        Recursions read and write lattices chunk by chunk, so memory-mapped
+        lattices are accessed sequentially in large blocks.
+
+        Arguments:
+            T (int): Number of time steps.
+            N (int): Number of states.
+
+        Returns:
+            List of tuples (start, end) with time ranges.
+
+        """
+        size = max(LATTICE_CHUNK_ELEMENTS // N, 1)
+        return [(start, min(start + size, T)) for start in xrange(0, T, size)]
+
+    def _release_lattice(self, arr):
+        """
+        Remove file of a memory-mapped intermediate lattice that is not
+        returned to the caller.
+
+        The model forgets the lattice, memory-mapped data stays readable
+        until the last reference is dropped.
+
+        Arguments:
+            arr (array): A lattice.
+
+        """
+        for name in ('_log_alpha', '_log_beta', '_log_gamma'):
+            if getattr(self, name) is arr:
+                setattr(self, name, None)
+        if isinstance(arr, np.memmap) and arr.filename is not None:
+            os.remove(arr.filename)
+
+    @classmethod
+    def _flush_lattice(cls, arr):
+        """
+        Write memory-mapped lattice to disk.
+
+        Arguments:
+            arr (array): A lattice.
+
+        """
+        if isinstance(arr, np.memmap):
+            arr.flush()
+
+    @classmethod
+    def _eexp(cls, x):
+        """
+        Extended exponential function.
+
+        Arguments:
+            x (Decimal): A number.
+
+        Returns:
+            e**x or Decimal('NaN') (if x is not a number).
+
+        Reises:
+            TypeError if x is not a Decimal.
+
+        """
+        cls._check_decimals(x)
+        if x.is_nan():
+            return decimal.Decimal(0)
+        else:
+            return x.exp()
+
+    @classmethod
+    def _eln(cls, x):
+        """
+        Extended logarithm.
+
+        Arguments:
+            x (Decimal): A number.
+
+        Returns:
+            A logarithm x or Decimal('NaN') (if x is not a number).
+
+        Reises:
+            TypeError if x is not a Decimal.
+            ValueError if x < 0.
+
+        """
+        cls._check_decimals(x)
+        if x == 0:
+            return decimal.Decimal('NaN')
+        elif x > 0:
+            return x.ln()
+        else:
+            raise ValueError
+
+    @classmethod
+    def _elnsum(cls, eln_x, eln_y):
+        """
+        Extended logarithm sum.
+
+        Arguments:
+            eln_x (Decimal): Natural logarithm from x.
+            eln_y (Decimal): Natural logarithm from y.
+
+        Returns:
+            Sum of logarithms or Decimal('NaN') (if eln_x and eln_y is
+            not a number).
+
+        Reises:
+            TypeError if eln_x or eln_y is not a Decimal.
+
+        """
+        cls._check_decimals(eln_x, eln_y)
+        if not (eln_x.is_nan() or eln_y.is_nan()):
+            dec_1 = decimal.Decimal(1)
+            if eln_x > eln_y:
+                return eln_x + cls._eln(dec_1 + (eln_y - eln_x).exp())
+            else:
+                return eln_y + cls._eln(dec_1 + (eln_x - eln_y).exp())
+        elif not eln_x.is_nan():
+            return eln_x
+        elif not eln_y.is_nan():
+            return eln_y
+        else:
+            return decimal.Decimal('NaN')
+
+    @classmethod
+    def _elnproduct(cls, eln_x, eln_y):
+        """
+        Extended logarithm product.
+
+        Arguments:
+            eln_x (Decimal): Natural logarithm from x.
+            eln_y (Decimal): Natural logarithm from y.
+
+        Returns:
+            Product of logaritms or Decimal('NaN') (if eln_x and eln_y is
+            not a number)
+
+        Reises:
+            TypeError if eln_x or eln_y is not a Decimal.
+
+        """
+        cls._check_decimals(eln_x, eln_y)
+        if not (eln_x.is_nan() and eln_y.is_nan()):
+            return eln_x + eln_y
+        else:
+            return decimal.Decimal('NaN')
+
+    @classmethod
+    def _elnmax(cls, eln_x, eln_y):
+        """
+        Extended logarithm maximum.
+
+        Arguments:
+            eln_x (Decimal): Natural logarithm from x.
+            eln_y (Decimal): Natural logarithm from y.
+
+        Returns:
+            Greater logarithm or Decimal('NaN') (if eln_x and eln_y is
+            not a number).
+
+        Reises:
+            TypeError if eln_x or eln_y is not a Decimal.
+
+        """
+        cls._check_decimals(eln_x, eln_y)
+        if eln_x.is_nan():
+            return eln_y
+        elif eln_y.is_nan():
+            return eln_x
+        else:
+            return max(eln_x, eln_y)
+
+    def _compute_scaled_alpha(self, log_pi, log_a, log_b):
+        """
+        Compute scaled forward variable (Rabiner scaling).
+
+            hat alpha_1 (i) = pi_i b_i (O_1) / c_1
+            hat alpha_{t+1} (j) = b_j (O_{t+1})
+                                  sum_{i=1}^N hat alpha_t (i) a_{ij} / c_{t+1}
+
+            c_t = sum_{i=1}^N (hat alpha_t (i) before scaling)
+            log P(O|lambda) = sum_{t=1}^T log c_t
+
+        Every step is a matrix-vector product of probabilities.
+
+        Arguments:
+            log_pi (array): Logarithms of initial states probabilities (N).
+            log_a (array): Logarithms of transition probabilities (N x N).
+            log_b (array): Logarithms of emission probabilities (N x T).
+
+        Returns:
+            Tuple (scaled_alpha, log_scales) with hat alpha_t (i) elements
+            (N x T) and logarithms of scaling coefficients c_t (T).
+
+        """
+        a = self._exp_transitions(log_a)
+        emissions = np.ascontiguousarray(np.exp(log_b).T)
+        T, N = emissions.shape
+        scaled_alpha = np.empty((T, N))
+        scales = np.empty(T)
+
+        alpha = np.exp(log_pi) * emissions[0]
+        for t in xrange(0, T):
+            if t > 0:
+                alpha = self._dot_predecessors(alpha, a) * emissions[t]
+            scale = alpha.sum()
+            if scale > 0:
+                alpha /= scale
+            scales[t] = scale
+            scaled_alpha[t] = alpha
+
+        with np.errstate(divide='ignore'):
+            log_scales = np.log(scales)
+        return scaled_alpha.T, log_scales
+
+    def _compute_scaled_beta(self, log_a, log_b, log_scales=None):
+        """
+        Compute scaled backward variable (Rabiner scaling).
+
+            hat beta_T (i) = 1
+            hat beta_t (i) = sum_{j=1}^N a_{ij} b_j (O_{t+1})
+                             hat beta_{t+1} (j) / c_{t+1}
+
+        Arguments:
+            log_a (array): Logarithms of transition probabilities (N x N).
+            log_b (array): Logarithms of emission probabilities (N x T).
+            log_scales (array): Logarithms of scaling coefficients c_t (T)
+                of forward variable. If None, every hat beta_t is scaled by
+                its own sum.
+
+        Returns:
+            Tuple (scaled_beta, log_scales) with hat beta_t (i) elements
+            (N x T) and logarithms of used scaling coefficients (T).
+
+        """
+        a = self._exp_transitions(log_a)
+        emissions = np.ascontiguousarray(np.exp(log_b).T)
+        T, N = emissions.shape
+        scaled_beta = np.empty((T, N))
+        if log_scales is None:
+            scales = np.ones(T)
+        else:
+            scales = np.exp(log_scales)
+
+        beta = np.ones(N)
+        scaled_beta[T-1] = beta
+        for t in xrange(T - 2, -1, -1):
+            beta = self._dot_successors(a, emissions[t+1] * beta)
+            if log_scales is None:
+                scales[t+1] = beta.sum()
+            if scales[t+1] > 0:
+                beta /= scales[t+1]
+            scaled_beta[t] = beta
+
+        if log_scales is None:
+            with np.errstate(divide='ignore'):
+                log_scales = np.log(scales)
+        return scaled_beta.T, log_scales
+
+    def _compute_scaled_expectations(self, log_pi, log_a, log_b, indices):
+        """
+        Compute expected counts of Baum-Welch E-step with scaled engine.
+
+            gamma_t (i) = hat alpha_t (i) hat beta_t (i)
+            sum_{t=1}^{T-1} eta_t (i, j) = a_{ij} sum_{t=1}^{T-1} hat alpha_t (i)
+                                   b_j (O_{t+1}) hat beta_{t+1} (j) / c_{t+1}
+
+        The sum of eta over time is one matrix product.
+
+        Arguments:
+            log_pi (array): Logarithms of initial states probabilities (N).
+            log_a (array): Logarithms of transition probabilities (N x N).
+            log_b (array): Logarithms of emission probabilities (N x T).
+            indices (array): Indices of observed symbols (T).
+
+        Returns:
+            Expectations tuple with logarithms of likelihood and expected
+            counts.
+
+        """
+        scaled_alpha, log_scales = self._compute_scaled_alpha(
+            log_pi, log_a, log_b)
+        scaled_beta, _ = self._compute_scaled_beta(log_a, log_b, log_scales)
+        gamma = scaled_alpha * scaled_beta
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weighted_beta = (np.exp(log_b[:, 1:]) * scaled_beta[:, 1:] /
+                             np.exp(log_scales[1:]))
+            if isinstance(log_a, SparseTransitions):
+                # sum over time for stored transitions only
+                correlations = np.zeros(log_a.nnz)
+                for start, end in self._time_chunks(
+                        weighted_beta.shape[1], log_a.nnz):
+                    correlations += np.einsum(
+                        'et,et->e', scaled_alpha[log_a.rows, start:end],
+                        weighted_beta[log_a.cols, start:end])
+                log_transitions = log_a.with_values(
+                    log_a.values + np.log(correlations))
+            else:
+                log_transitions = np.log(
+                    np.exp(log_a) * scaled_alpha[:, :-1].dot(weighted_beta.T))
+            emissions = _grouped_reduce(np.add, gamma, indices,
+                                        len(self.symbols), 0.)
+
+            return Expectations(
+                log_likelihood=np.sum(log_scales),
+                log_initial_states=np.log(gamma[:, 0]),
+                log_transitions=log_transitions,
+                log_emissions=np.log(emissions),
+                log_gamma_sum=np.log(emissions.sum(1)))
+
+    def _compute_lattice(self, semiring, log_pi, log_a, log_b, indices=None,
+                         out=None, name=None, lattice=True,
+                         backpointers=None, beam=None, max_states=None,
+                         log_pruned=None, resume=False):
+        """
+        Run forward lattice recursion in a semiring.
+
+            x_1 (i) = pi_i b_i (O_1)
+            x_{t+1} (j) = plus_{i=1}^N (x_t (i) a_ij) b_j (O_{t+1})
+
+        All forward recursions share this loop: log-sum-product gives
+        forward variable alpha, max-product gives Viterbi's delta. Emissions
+        are read and lattice is written chunk by chunk (see _time_chunks).
+
+        Arguments:
+            semiring (Semiring): Semiring of the recursion.
+            log_pi (array): Logarithms of initial values (N, or R x N rows
+                advanced independently if lattice is False).
+            log_a (array): Logarithms of transition probabilities (N x N
+                array or SparseTransitions).
+            log_b (array): Logarithms of emission probabilities (N x T), or
+                of emission table (N x M) if indices are given.
+            indices (array): Indices of observed symbols (T). Emissions are
+                gathered from the table chunk by chunk if given.
+            out (array): Optional buffer (N x T) reused for the lattice.
+            name (str): Name of the lattice (see _lattice_buffer).
+            lattice (bool): Return the whole lattice (N x T), or only values
+                of the last time step.
+            backpointers (array): Optional array (T x N) filled with
+                selected predecessors (semirings with select only).
+            beam (float): Beam pruning, after every time step only states
+                with values not lower than the best value minus beam are
+                kept and expanded (approximation, float64 log semirings
+                with N values only).
+            max_states (int): Keep and expand at most max_states best
+                states after every time step (same restrictions as beam).
+            log_pruned (array): Optional array (T) filled with logarithms of
+                pruned fractions of semiring sums of values.
+            resume (bool): Continue a recursion, log_pi holds values of the
+                time step preceding the first emissions rather than initial
+                values.
+
+        Returns:
+            An array with the lattice (N x T) or values of the last time
+            step (N or R x N).
+
+        Reises:
+            ValueError if pruning is requested for decimal backend or
+            semiring values that are not logarithms, or max_states is not
+            positive.
+
+        """
+        prune = beam is not None or max_states is not None
+        if prune and (self.numeric != 'float64' or
+                      semiring.lift is not None):
+            raise ValueError('beam pruning requires float64 numeric and '
+                             'log semiring')
+        if max_states is not None and max_states < 1:
+            raise ValueError('max_states must be positive')
+        sources = None
+
+        lift = semiring.lift or (lambda x: x)
+        times = semiring.times
+        x = lift(log_pi)
+        a = self._lift_transitions(semiring, log_a)
+        N = log_b.shape[0]
+        T = log_b.shape[1] if indices is None else len(indices)
+        if lattice:
+            if np.dtype(semiring.dtype) == np.dtype(self._dtype):
+                result = self._lattice_buffer(out, (N, T), name)
+            else:
+                result = np.empty((N, T), dtype=semiring.dtype)
+
+        for start, end in self._time_chunks(T, N):
+            if indices is None:
+                b_chunk = log_b[:, start:end]
+            else:
+                b_chunk = log_b[:, indices[start:end]]
+            # emissions of a time step are contiguous
+            b_chunk = np.ascontiguousarray(lift(b_chunk).T)
+            if lattice:
+                chunk = np.empty((N, end - start), dtype=semiring.dtype)
+            for t in xrange(start, end):
+                if t == 0 and not resume:
+                    x = times(x, b_chunk[0])
+                elif backpointers is not None:
+                    x, backpointers[t] = self._semiring_select_predecessors(
+                        semiring, x, a, sources)
+                    x = times(x, b_chunk[t-start])
+                else:
+                    x = times(
+                        self._semiring_predecessors(semiring, x, a, sources),
+                        b_chunk[t-start])
+                if prune:
+                    x, sources, log_pruned_t = self._prune(
+                        semiring, x, beam, max_states)
+                    if log_pruned is not None:
+                        log_pruned[t] = log_pruned_t
+                if lattice:
+                    chunk[:, t-start] = x
+            if lattice:
+                result[:, start:end] = chunk
+
+        if not lattice:
+            return x
+        self._flush_lattice(result)
+        return result
+
+    def _compute_logalpha(self, log_pi, log_a, log_b, out=None, beam=None,
+                          max_states=None, indices=None):
+        """
+        Compute forward variable alpha_t (i) in log space.
+
+            alpha_t (i) = P(O_1, O_2, ..., O_{t-1}, q_t = S_i|lambda)
+
+            alpha_1 (i) = pi_i b_i (O_1)
+            alpha_{t+1} (i) = b_i (O_{t+1}) sum_{i=1}^N alpha_t (i) a_{ij}
+
+        Arguments:
+            log_pi (array): Logarithms of initial states probabilities (N).
+            log_a (array): Logarithms of transition probabilities (N x N).
+            log_b (array): Logarithms of emission probabilities (N x T), or
+                of emission table (N x M) if indices are given.
+            out (array): Optional buffer (N x T) reused for the result.
+            beam (float): Optional log-score beam (see _compute_lattice),
+                pruned recursion always runs in log space.
+            max_states (int): Optional number of kept states per time step.
+            indices (array): Indices of observed symbols (T). Emissions are
+                gathered from the table chunk by chunk, so no N x T array
+                of emissions is held in memory (log engine).
+
+        Returns:
+            An array with logarithm alpha_t (i) elements (N x T).
+
+        Reises:
+            TypeError if any argument is None.
+            ValueError if any argument is empty or sizes mismatch.
+
+        """
+        log_pi, log_a, log_b = self._prepare_log_parameters(
+            log_pi, log_a, log_b)
+        N, T = self._emissions_shape(log_b, indices)
+
+        if beam is not None or max_states is not None:
+            log_pruned = self._log_pruned_buffer(T)
+            log_alpha = self._compute_lattice(
+                self._semiring('sum'), log_pi, log_a, log_b, indices=indices,
+                out=out, name='log_alpha', beam=beam, max_states=max_states,
+                log_pruned=log_pruned)
+            self._log_pruned = log_pruned
+            self._log_alpha = log_alpha
+            return log_alpha
+
+        if self.engine == 'scaled':
+            if indices is not None:
+                log_b = log_b[:, indices]
+            scaled_alpha, log_scales = self._compute_scaled_alpha(
+                log_pi, log_a, log_b)
+            log_alpha = self._lattice_buffer(out, (N, T))
+            with np.errstate(divide='ignore'):
+                np.log(scaled_alpha, out=log_alpha)
+            log_alpha += np.cumsum(log_scales)
+            self._log_scales = log_scales
+            self._log_alpha = log_alpha
+            return log_alpha
+
+        log_alpha = self._compute_lattice(
+            self._semiring('sum'), log_pi, log_a, log_b, indices=indices,
+            out=out, name='log_alpha')
+        self._log_alpha = log_alpha
+        return log_alpha
+
+    @classmethod
+    def _emissions_shape(cls, log_b, indices):
+        """
+        Find numbers of states and time steps of emissions passed to
+        recursions.
+
+        Arguments:
+            log_b (array): Logarithms of emission probabilities (N x T), or
+                of emission table (N x M) if indices are given.
+            indices (array): Indices of observed symbols (T) or None.
+
+        Returns:
+            Tuple (N, T).
+
+        Reises:
+            ValueError if indices are empty.
+
+        """
+        if indices is None:
+            return log_b.shape
+        if len(indices) == 0:
+            raise ValueError('observations cannot be empty')
+        return log_b.shape[0], len(indices)
+
+    def _compute_logbeta(self, log_a, log_b, log_scales=None, indices=None):
+        """
+        Compute backward variable beta_t (i) in log space.
+
+            beta_t (i) = P(O_{t+1}, O_{t+2}, ..., O_T, q_t = S_i|lambda)
+
+            beta_T (i) = 1
+            beta_{t+1} (i) = sum_{j=1}^N a_{ij} b_j (O_{t+1}) beta_{t+1} (j)
+
+        Arguments:
+            log_a (array): Logarithms of transition probabilities (N x N).
+            log_b (array): Logarithms of emission probabilities (N x T), or
+                of emission table (N x M) if indices are given.
+            log_scales (array): Logarithms of scaling coefficients of
+                forward variable computed for the same log_b (scaled engine
+                only, T). If None, every step is scaled by its own sum.
+            indices (array): Indices of observed symbols (T). Emissions are
+                gathered from the table chunk by chunk (see
+                _compute_logalpha).
+
+        Returns:
+            An array with logarithm beta_t (i) elements (N x T).
+
+        Reises:
+            TypeError if any argument is None.
+            ValueError if any argument is empty or sizes mismatch.
+
+        """
+        self._check_transitions(log_a)
+        self._check_lattice(log_b, 2)
+        log_a = self._as_numeric(log_a)
+        log_b = self._as_numeric(log_b)
+        N, T = self._emissions_shape(log_b, indices)
+        if log_a.shape != (N, N):
+            raise ValueError('sizes of model parameters mismatch')
+
+        if self.engine == 'scaled':
+            if log_scales is not None and np.shape(log_scales) != (T,):
+                raise ValueError('sizes of scales and emissions mismatch')
+            if indices is not None:
+                log_b = log_b[:, indices]
+            scaled_beta, log_scales = self._compute_scaled_beta(
+                log_a, log_b, log_scales)
+            # beta_t (i) = hat beta_t (i) prod_{s>t} c_s
+            log_later_scales = np.append(
+                np.cumsum(log_scales[:0:-1])[::-1], 0.)
+            with np.errstate(divide='ignore'):
+                log_beta = np.log(scaled_beta) + log_later_scales
+            self._log_beta = log_beta
+            return log_beta
+
+        _, logone, _, _ = self._numeric_primitives()
+        log_beta = self._lattice_buffer(None, (N, T), 'log_beta')
+
+        log_beta_t = np.empty(N, dtype=self._dtype)
+        log_beta_t.fill(logone)
+        log_b_next = None
+        for start, end in reversed(self._time_chunks(T, N)):
+            if indices is None:
+                log_b_chunk = np.array(log_b[:, start:end])
+            else:
+                log_b_chunk = log_b[:, indices[start:end]]
+            chunk = np.empty((N, end - start), dtype=self._dtype)
+            for t in xrange(end - 1, start - 1, -1):
+                if t < T - 1:
+                    # sum over successors j of a_ij b_j (O_{t+1}) beta_{t+1}
+                    log_beta_t = self._elnsum_successors(
+                        log_a, log_b_next + log_beta_t)
+                chunk[:, t-start] = log_beta_t
+                log_b_next = log_b_chunk[:, t-start]
+            log_beta[:, start:end] = chunk
+        self._flush_lattice(log_beta)
+
+        self._log_beta = log_beta
+        return log_beta
+
+    def _prepare_batch(self, log_a, log_b, lengths):
+        """
+        Check batch of padded emissions passed to batched recursions.
+
+        Arguments:
+            log_a (array): Logarithms of transition probabilities (N x N).
+            log_b (array): Logarithms of emission probabilities
+                (B x T_max x N).
+            lengths (array): Lengths of sequences (B).
+
+        Returns:
+            Tuple (log_a, log_b, lengths, order, active) with arrays
+            converted to numeric backend, indices of sequences sorted by
+            decreasing length and number of sequences longer than t for
+            every time step t (T_max + 1).
+
+        Reises:
+            TypeError if any argument is None.
+            ValueError if any argument is empty or sizes mismatch.
+
+        """
+        self._check_transitions(log_a)
+        self._check_lattice(log_b, 3)
+        self._check_lattice(lengths, 1)
+        log_a = self._as_numeric(log_a)
+        log_b = self._as_numeric(log_b)
+        lengths = np.asarray(lengths, dtype=np.intp)
+        B, T, N = log_b.shape
+        if log_a.shape != (N, N):
+            raise ValueError('sizes of model parameters mismatch')
+        if lengths.shape != (B,):
+            raise ValueError('sizes of emissions and lengths mismatch')
+        if np.any(lengths < 1) or np.any(lengths > T):
+            raise ValueError('lengths must be between 1 and T_max')
+
+        # sequences sorted by decreasing length are active at time t
+        # as a contiguous prefix, so no masking is needed
+        order = np.argsort(-lengths, kind='mergesort')
+        active = np.searchsorted(-lengths[order], -np.arange(T + 1),
+                                 side='left')
+        return log_a, log_b[order], lengths, order, active
+
+    def _compute_batch_logalpha(self, log_pi, log_a, log_b, lengths):
+        """
+        Compute forward variable for a batch of sequences of different
+        lengths in log space.
+
+        All sequences still active at time t advance in one vectorized
+        step, so Python overhead is paid once per time step rather than
+        once per sequence and time step.
+
+            alpha_1 (b, i) = pi_i b_i (O^b_1)
+            alpha_{t+1} (b, j) = b_j (O^b_{t+1})
+                                 sum_{i=1}^N alpha_t (b, i) a_{ij}
+            log P(O^b|lambda) = log sum_{i=1}^N alpha_{T_b} (b, i)
+
+        Arguments:
+            log_pi (array): Logarithms of initial states probabilities (N).
+            log_a (array): Logarithms of transition probabilities (N x N).
+            log_b (array): Logarithms of emission probabilities
+                (B x T_max x N) padded after end of every sequence.
+            lengths (array): Lengths of sequences T_b (B).
+
+        Returns:
+            Tuple (log_alpha, log_likelihoods) with logarithm alpha_t (b, i)
+            elements (B x T_max x N, logarithm of zero after end of every
+            sequence) and logarithms of likelihoods of sequences (B).
+
+        Reises:
+            TypeError if any argument is None.
+            ValueError if any argument is empty or sizes mismatch.
+
+        """
+        self._check_lattice(log_pi, 1)
+        log_pi = self._as_numeric(log_pi)
+        log_a, log_b, lengths, order, active = self._prepare_batch(
+            log_a, log_b, lengths)
+        B, T, N = log_b.shape
+        if log_pi.shape != (N,):
+            raise ValueError('sizes of model parameters mismatch')
+
+        logzero, _, _, _ = self._numeric_primitives()
+        log_alpha = np.empty((B, T, N), dtype=self._dtype)
+        log_alpha.fill(logzero)
+
+        if self.engine == 'scaled':
+            a = self._exp_transitions(log_a)
+            alpha = np.exp(log_pi + log_b[:, 0])
+            log_scale_sum = np.zeros(B)
+            for t in xrange(0, T):
+                k = active[t]
+                if t > 0:
+                    alpha = self._dot_predecessors(alpha[:k], a) * \
+                        np.exp(log_b[:k, t])
+                    log_scale_sum = log_scale_sum[:k]
+                scales = alpha.sum(1)
+                alpha /= np.where(scales > 0, scales, 1.)[:, np.newaxis]
+                with np.errstate(divide='ignore'):
+                    log_scale_sum += np.log(scales)
+                    log_alpha[:k, t] = (np.log(alpha) +
+                                        log_scale_sum[:, np.newaxis])
+        else:
+            log_alpha[:, 0] = log_pi + log_b[:, 0]
+            for t in xrange(1, T):
+                k = active[t]
+                log_alpha[:k, t] = self._elnsum_predecessors(
+                    log_alpha[:k, t-1], log_a) + log_b[:k, t]
+
+        log_likelihoods = np.empty(B, dtype=self._dtype)
+        log_likelihoods[order] = self._elnsum_reducer()(
+            log_alpha[np.arange(B), lengths[order] - 1], 1)
+        unsorted = np.empty_like(log_alpha)
+        unsorted[order] = log_alpha
+        return unsorted, log_likelihoods
+
+    def _compute_batch_logbeta(self, log_a, log_b, lengths):
+        """
+        Compute backward variable for a batch of sequences of different
+        lengths in log space.
+
+            beta_{T_b} (b, i) = 1
+            beta_t (b, i) = sum_{j=1}^N a_{ij} b_j (O^b_{t+1})
+                            beta_{t+1} (b, j)
+
+        Arguments:
+            log_a (array): Logarithms of transition probabilities (N x N).
+            log_b (array): Logarithms of emission probabilities
+                (B x T_max x N) padded after end of every sequence.
+            lengths (array): Lengths of sequences T_b (B).
+
+        Returns:
+            An array with logarithm beta_t (b, i) elements (B x T_max x N,
+            logarithm of zero after end of every sequence).
+
+        Reises:
+            TypeError if any argument is None.
+            ValueError if any argument is empty or sizes mismatch.
+
+        """
+        log_a, log_b, lengths, order, active = self._prepare_batch(
+            log_a, log_b, lengths)
+        B, T, N = log_b.shape
+
+        logzero, logone, _, _ = self._numeric_primitives()
+        log_beta = np.empty((B, T, N), dtype=self._dtype)
+        log_beta.fill(logzero)
+
+        if self.engine == 'scaled':
+            a = self._exp_transitions(log_a)
+            beta = np.ones((0, N))
+            log_scale_sum = np.zeros(0)
+            for t in xrange(T - 1, -1, -1):
+                k, k_next = active[t], active[t+1]
+                # sequences ending at time t start with beta = 1
+                beta = np.concatenate([
+                    self._dot_successors(
+                        a, np.exp(log_b[:k_next, t+1]) * beta)
+                    if t < T - 1 else beta, np.ones((k - k_next, N))])
+                log_scale_sum = np.append(log_scale_sum, np.zeros(k - k_next))
+                scales = beta.sum(1)
+                beta /= np.where(scales > 0, scales, 1.)[:, np.newaxis]
+                with np.errstate(divide='ignore'):
+                    log_scale_sum += np.log(scales)
+                    log_beta[:k, t] = np.log(beta) + \
+                        log_scale_sum[:, np.newaxis]
+        else:
+            for t in xrange(T - 1, -1, -1):
+                k, k_next = active[t], active[t+1]
+                if k_next > 0:
+                    log_beta[:k_next, t] = self._elnsum_successors(
+                        log_a, log_b[:k_next, t+1] + log_beta[:k_next, t+1])
+                log_beta[k_next:k, t] = logone
+
+        unsorted = np.empty_like(log_beta)
+        unsorted[order] = log_beta
+        return unsorted
+
+    def _compute_loggamma(self, log_alpha, log_beta):
+        """
+        Compute gamma_t (i) variable in log space.
+
+            gamma_t (i) = P(q_t = S_i|O, lambda)
+
+                                alpha_t (i) beta_t (i))
+            gamma_t (i) = ------------------------------------
+                           sum_{j=1}^N alpha_t (j) beta_t (j)
+
+            sum_{i=1}^N gamma_t (i) = 1
+
+        Arguments:
+            log_alpha (array): Logarithms of forward variable (N x T).
+            log_beta (array): Logarithms of backward variable (N x T).
+
+        Returns:
+            An array with logarithm gamma_t (i) elements (N x T).
+
+        Reises:
+            TypeError if any argument is None.
+            ValueError if any argument is empty or sizes mismatch.
+
+        """
+        self._check_lattice(log_alpha, 2)
+        self._check_lattice(log_beta, 2)
+        log_alpha = self._as_numeric(log_alpha)
+        log_beta = self._as_numeric(log_beta)
+        if log_alpha.shape != log_beta.shape:
+            raise ValueError('sizes of alpha and beta mismatch')
+        N, T = log_alpha.shape
+
+        if self.engine == 'scaled':
+            log_gamma = log_alpha + log_beta
+            gamma = np.exp(log_gamma - np.max(log_gamma, axis=0))
+            with np.errstate(divide='ignore'):
+                log_gamma = np.log(gamma / np.sum(gamma, axis=0))
+            self._log_gamma = log_gamma
+            return log_gamma
+
+        elnsum_reduce = self._elnsum_reducer()
+        log_gamma = self._lattice_buffer(None, (N, T), 'log_gamma')
+
+        for start, end in self._time_chunks(T, N):
+            chunk = log_alpha[:, start:end] + log_beta[:, start:end]
+            log_gamma[:, start:end] = self._elnquotient(
+                chunk, elnsum_reduce(chunk, 0))
+        self._flush_lattice(log_gamma)
+
+        self._log_gamma = log_gamma
+        return log_gamma
+
+    def _compute_posterior_states(self, log_alpha, log_beta):
+        """
+        Find the most likely state of every time step and its posterior
+        probability without storing gamma.
+
+            q_t = argmax_i gamma_t (i) = argmax_i alpha_t (i) beta_t (i)
+
+        Maxima and normalizers of alpha_t (i) beta_t (i) are reduced over
+        states for blocks of time steps at once.
+
+        Arguments:
+            log_alpha (array): Logarithms of forward variable (N x T).
+            log_beta (array): Logarithms of backward variable (N x T).
+
+        Returns:
+            Tuple (states, log_posteriors) with arrays of states indices and
+            logarithms of their gamma_t (q_t) (T).
+
+        Reises:
+            TypeError if any argument is None.
+            ValueError if any argument is empty or sizes mismatch.
+
+        """
+        self._check_lattice(log_alpha, 2)
+        self._check_lattice(log_beta, 2)
+        log_alpha = self._as_numeric(log_alpha)
+        log_beta = self._as_numeric(log_beta)
+        if log_alpha.shape != log_beta.shape:
+            raise ValueError('sizes of alpha and beta mismatch')
+        N, T = log_alpha.shape
+
+        elnsum_reduce = self._elnsum_reducer()
+        elnmax_reduce = self._elnmax_reducer()
+        states = np.empty(T, dtype=np.min_scalar_type(N - 1))
+        log_posteriors = np.empty(T, dtype=self._dtype)
+
+        for start, end in self._time_chunks(T, N):
+            chunk = log_alpha[:, start:end] + log_beta[:, start:end]
+            maxima, states[start:end] = elnmax_reduce(chunk, 0)
+            log_posteriors[start:end] = self._elnquotient(
+                maxima, elnsum_reduce(chunk, 0))
+
+        return states, log_posteriors
+
+    def _compute_logdelta(self, log_pi, log_a, log_b, beam=None,
+                          max_states=None, indices=None):
+        """
+        Compute Viterbi's variable delta_t (i) in log space.
+
+            delta_t (i) = max_{q_{i<t}} P(q_1, ..., q_{t-1}, q_t = i, O|lambda)
+
+            delta_1 (i) = pi_i b_i (O_1)
+            delta_t+1 (j) = max_i (delta_{t-1} (i) a_ij) b_j (O_t)
+
+        Arguments:
+            log_pi (array): Logarithms of initial states probabilities (N).
+            log_a (array): Logarithms of transition probabilities (N x N).
+            log_b (array): Logarithms of emission probabilities (N x T), or
+                of emission table (N x M) if indices are given.
+            beam (float): Optional log-score beam (see _compute_lattice).
+            max_states (int): Optional number of kept states per time step.
+            indices (array): Indices of observed symbols (T), emissions are
+                gathered from the table chunk by chunk.
+
+        Returns:
+            An array with logarithm delta_t (i) elements (N x T).
+
+        Reises:
+            TypeError if any argument is None.
+            ValueError if any argument is empty or sizes mismatch.
+
+        """
+        log_pi, log_a, log_b = self._prepare_log_parameters(
+            log_pi, log_a, log_b)
+        if beam is None and max_states is None:
+            return self._compute_lattice(self._semiring('max'), log_pi,
+                                         log_a, log_b, indices=indices)
+
+        _, T = self._emissions_shape(log_b, indices)
+        log_pruned = self._log_pruned_buffer(T)
+        log_delta = self._compute_lattice(
+            self._semiring('max'), log_pi, log_a, log_b, indices=indices,
+            beam=beam, max_states=max_states, log_pruned=log_pruned)
+        self._log_pruned = log_pruned
+        return log_delta
+
+    def _compute_logeta(self, log_a, log_b, log_alpha, log_beta):
+        """
+        Compute eta_t (i, j) variable in log space.
+
+            eta_t (i, j) = P(q_t = S_i, q_{t+1} = S_j|O, lambda)
+
+                        alpha_t (i) a_{ij} b_j (O_{t+1}) beta_{t+1} (j)
+              = ---------------------------------------------------------------
+                 sum_{i,j=1}^N alpha_t (i) a_{ij} b_j (O_{t+1}) beta_{t+1} (j)
+
+            gamma_t (i) = sum_{j=1}^N eta_t (i, j)
+
+        Arguments:
+            log_a (array): Logarithms of transition probabilities (N x N).
+            log_b (array): Logarithms of emission probabilities (N x T).
+            log_alpha (array): Logarithms of forward variable (N x T).
+            log_beta (array): Logarithms of backward variable (N x T).
+
+        Returns:
+            An array with logarithm eta_t (i, j) elements (N x N x T).
+
+        Reises:
+            TypeError if any argument is None.
+            ValueError if any argument is empty or sizes mismatch.
+
+        """
+        self._check_transitions(log_a)
+        self._check_lattice(log_b, 2)
+        self._check_lattice(log_alpha, 2)
+        self._check_lattice(log_beta, 2)
+        log_a = self._as_numeric(log_a)
+        log_b = self._as_numeric(log_b)
+        log_alpha = self._as_numeric(log_alpha)
+        log_beta = self._as_numeric(log_beta)
+        N, T = log_b.shape
+        if (log_a.shape != (N, N) or log_alpha.shape != (N, T) or
+                log_beta.shape != (N, T)):
+            raise ValueError('sizes of model parameters and lattices mismatch')
+
+        logzero, _, _, _ = self._numeric_primitives()
+        if isinstance(log_a, SparseTransitions):
+            # eta lattice is dense anyway
+            log_a = log_a.todense(logzero)
+        elnsum_reduce = self._elnsum_reducer()
+        log_eta = np.zeros((N, N, T), dtype=self._dtype)
+
+        for t in xrange(0, T-1):
+            log_eta_t = self._transition_terms(
+                log_alpha[:, t], log_a, log_b[:, t+1] + log_beta[:, t+1])
+            log_eta[:, :, t] = log_eta_t - elnsum_reduce(log_eta_t.ravel(), 0)
+
+        self._log_eta = log_eta
+        return log_eta
+
+    def _compute_logalpha_checkpoints(self, log_pi, log_a, log_b,
+                                      indices=None):
+        """
+        Compute forward variable in log space storing only every K-th time
+        step, K = ceil(sqrt(T)).
+
+        Arguments:
+            log_pi (array): Logarithms of initial states probabilities (N).
+            log_a (array): Logarithms of transition probabilities (N x N).
+            log_b (array): Logarithms of emission probabilities (N x T), or
+                of emission table (N x M) if indices are given.
+            indices (array): Indices of observed symbols (T), emissions are
+                gathered from the table chunk by chunk.
+
+        Returns:
+            Tuple (checkpoints, step, log_likelihood) with logarithms of
+            alpha_t (i) for t = 0, K, 2K, ... (N x ceil(T / K)), K and
+            logarithm of likelihood log P(O|lambda).
+
+        Reises:
+            TypeError if any argument is None.
+            ValueError if any argument is empty or sizes mismatch.
+
+        """
+        log_pi, log_a, log_b = self._prepare_log_parameters(
+            log_pi, log_a, log_b)
+        N, T = self._emissions_shape(log_b, indices)
+        step = int(np.ceil(np.sqrt(T)))
+        # emission column of every time step
+        columns = np.arange(T) if indices is None else indices
+
+        semiring = self._semiring('sum')
+        checkpoints = np.empty((N, (T + step - 1) // step), dtype=self._dtype)
+        log_alpha = self._compute_lattice(semiring, log_pi, log_a, log_b,
+                                          indices=columns[:1], lattice=False)
+        checkpoints[:, 0] = log_alpha
+        # segments end at checkpoints, t = 1, ..., K, K+1, ..., 2K, ...
+        for start in xrange(1, T, step):
+            end = min(start + step, T)
+            log_alpha = self._compute_lattice(
+                semiring, log_alpha, log_a, log_b,
+                indices=columns[start:end], lattice=False, resume=True)
+            if (end - 1) % step == 0:
+                checkpoints[:, (end - 1) // step] = log_alpha
+
+        return checkpoints, step, semiring.reduce(log_alpha, 0)
+
+    def _iter_reversed_logalpha(self, checkpoints, step, log_a, log_b,
+                                indices=None):
+        """
+        Iterate forward variable backward in time.
+
+        Forward variable between two checkpoints is recomputed into a block
+        of K columns, so memory is O(sqrt(T) N) and forward recursion runs
+        twice in total.
+
+        Arguments:
+            checkpoints (array): Checkpoints of forward variable.
+            step (int): Distance K between checkpoints.
+            log_a (array): Logarithms of transition probabilities (N x N).
+            log_b (array): Logarithms of emission probabilities (N x T), or
+                of emission table (N x M) if indices are given.
+            indices (array): Indices of observed symbols (T), emissions of
+                a block are gathered from the table.
+
+        Yields:
+            Tuples (t, log_alpha) for t = T-1, ..., 0. The log_alpha array
+            (N) is overwritten later, so it must be used before the next
+            iteration.
+
+        """
+        N, T = self._emissions_shape(log_b, indices)
+        columns = np.arange(T) if indices is None else indices
+        semiring = self._semiring('sum')
+        block = np.empty((N, step), dtype=self._dtype)
+
+        for c in xrange(checkpoints.shape[1] - 1, -1, -1):
+            start = c * step
+            end = min(start + step, T)
+            block[:, 0] = checkpoints[:, c]
+            if end - start > 1:
+                self._compute_lattice(
+                    semiring, block[:, 0], log_a, log_b,
+                    indices=columns[start+1:end], out=block[:, 1:end-start],
+                    resume=True)
+            for t in xrange(end - 1, start - 1, -1):
+                yield t, block[:, t-start]
+
+    def _compute_checkpointed_loggamma(self, log_pi, log_a, log_b, out=None,
+                                       indices=None):
+        """
+        Compute gamma_t (i) variable in log space with checkpointed forward
+        variable.
+
+        Neither forward nor backward variable is stored for all time steps:
+        backward variable is swept once and forward variable is recomputed
+        between checkpoints (see _iter_reversed_logalpha). With emissions
+        gathered from the table, besides the result and indices only
+        O(sqrt(T) N) memory is used.
+
+        Arguments:
+            log_pi (array): Logarithms of initial states probabilities (N).
+            log_a (array): Logarithms of transition probabilities (N x N).
+            log_b (array): Logarithms of emission probabilities (N x T), or
+                of emission table (N x M) if indices are given.
+            out (array): Optional buffer (N x T) reused for the result.
+            indices (array): Indices of observed symbols (T).
+
+        Returns:
+            An array with logarithm gamma_t (i) elements (N x T).
+
+        Reises:
+            TypeError if any argument is None.
+            ValueError if any argument is empty or sizes mismatch.
+
+        """
+        checkpoints, step, _ = self._compute_logalpha_checkpoints(
+            log_pi, log_a, log_b, indices=indices)
+        log_a = self._as_numeric(log_a)
+        log_b = self._as_numeric(log_b)
+        N, T = self._emissions_shape(log_b, indices)
+        columns = np.arange(T) if indices is None else indices
+
+        _, logone, _, _ = self._numeric_primitives()
+        elnsum_reduce = self._elnsum_reducer()
+        log_gamma = self._lattice_buffer(out, (N, T), 'log_gamma')
+        log_beta = np.empty(N, dtype=self._dtype)
+        log_beta.fill(logone)
+
+        for t, log_alpha in self._iter_reversed_logalpha(
+                checkpoints, step, log_a, log_b, indices=indices):
+            if t < T - 1:
+                log_beta = self._elnsum_successors(
+                    log_a, log_b[:, columns[t+1]] + log_beta)
+            log_gamma_t = log_alpha + log_beta
+            log_gamma[:, t] = self._elnquotient(
+                log_gamma_t, elnsum_reduce(log_gamma_t, 0))
+        self._flush_lattice(log_gamma)
+
+        return log_gamma
+
+    def _compute_checkpointed_expectations(self, log_pi, log_a, log_b,
+                                           observations, gather=False):
+        """
+        Compute expected counts of Baum-Welch E-step in log space with
+        checkpointed forward variable.
+
+            eta_t (i, j) = alpha_t (i) a_{ij} b_j (O_{t+1}) beta_{t+1} (j)
+                           / P(O|lambda)
+
+        Forward variable is stored only at checkpoints and recomputed
+        between them during backward sweep (see _iter_reversed_logalpha).
+        With gather, emissions are read from the table block by block, so
+        besides the T indices of observed symbols memory is O(sqrt(T) N)
+        for about twice the forward work (an N x T emissions array alone
+        would be O(T N)).
+
+        Arguments:
+            log_pi (array): Logarithms of initial states probabilities (N).
+            log_a (array): Logarithms of transition probabilities (N x N).
+            log_b (array): Logarithms of emission probabilities (N x T), or
+                of emission table (N x M) if gather is True.
+            observations (sequence): Observed symbols O_1, ..., O_T.
+            gather (bool): Read emissions of observed symbols from the
+                table.
+
+        Returns:
+            Expectations tuple with logarithms of likelihood and expected
+            counts.
+
+        Reises:
+            TypeError if any argument is None.
+            ValueError if any argument is empty, sizes mismatch or
+            observation is not a model symbol.
+
+        """
+        log_pi, log_a, log_b = self._prepare_log_parameters(
+            log_pi, log_a, log_b)
+        if gather:
+            indices = self._observation_indices(observations)
+            # emission column of every time step
+            columns = indices
+        else:
+            indices = self._observation_indices(observations,
+                                                log_b.shape[1])
+            columns = np.arange(len(indices))
+        N, T = log_b.shape[0], len(indices)
+        checkpoints, step, log_likelihood = \
+            self._compute_logalpha_checkpoints(log_pi, log_a, log_b,
+                                               indices=columns)
+
+        logzero, logone, _, _ = self._numeric_primitives()
+        elnsum = self._elnsum_ufunc()
+        elnsum_reduce = self._elnsum_reducer()
+        log_transitions = self._transition_zeros(log_a)
+        log_emissions = np.full((N, len(self.symbols)), logzero,
+                                dtype=self._dtype)
+        log_beta = np.full(N, logone, dtype=self._dtype)
+
+        for t, log_alpha in self._iter_reversed_logalpha(
+                checkpoints, step, log_a, log_b, indices=columns):
+            if t < T - 1:
+                log_b_beta = log_b[:, columns[t+1]] + log_beta
+                log_transitions = elnsum(
+                    log_transitions,
+                    self._transition_terms(log_alpha, log_a,
+                                           log_b_beta - log_likelihood))
+                log_beta = self._elnsum_successors(log_a, log_b_beta)
+            log_gamma = log_alpha + log_beta - log_likelihood
+            k = indices[t]
+            log_emissions[:, k] = elnsum(log_emissions[:, k], log_gamma)
+
+        return Expectations(
+            log_likelihood=log_likelihood,
+            log_initial_states=log_gamma,
+            log_transitions=self._transitions_like(log_a, log_transitions),
+            log_emissions=log_emissions,
+            log_gamma_sum=elnsum_reduce(log_emissions, 1))
+
+    def _compute_expectations(self, log_pi, log_a, log_b, observations,
+                              out=None, checkpoint=False, gather=False):
+        """
+        Compute expected counts of Baum-Welch E-step in log space.
+
+        Forward and backward pass run once. Counts are accumulated during
+        backward sweep, so beta, gamma and eta are never stored for all time
+        steps and memory is O(T N) instead of O(T N^2).
+
+            sum_{t=1}^{T-1} eta_t (i, j)
+            sum_{t: O_t = v_k} gamma_t (i)
+            sum_{t=1}^T gamma_t (i)
+
+        Arguments:
+            log_pi (array): Logarithms of initial states probabilities (N).
+            log_a (array): Logarithms of transition probabilities (N x N).
+            log_b (array): Logarithms of emission probabilities (N x T), or
+                of emission table (N x M) if gather is True.
+            observations (sequence): Observed symbols O_1, ..., O_T.
+            out (array): Optional buffer (N x T) reused for forward variable
+                (log engine only, scaled engine keeps no log lattice).
+            checkpoint (bool): Store forward variable only at checkpoints
+                (see _compute_checkpointed_expectations).
+            gather (bool): Read emissions of observed symbols from the
+                table, no N x T array of emissions is built (log engine or
+                checkpoint).
+
+        Returns:
+            Expectations tuple with logarithms of likelihood and expected
+            counts.
+
+        Reises:
+            TypeError if any argument is None.
+            ValueError if any argument is empty, sizes mismatch or
+            observation is not a model symbol.
+
+        """
+        if checkpoint:
+            return self._compute_checkpointed_expectations(
+                log_pi, log_a, log_b, observations, gather=gather)
+
+        log_pi, log_a, log_b = self._prepare_log_parameters(
+            log_pi, log_a, log_b)
+        if gather:
+            indices = self._observation_indices(observations)
+            # emission column of every time step
+            columns = indices
+        else:
+            indices = self._observation_indices(observations,
+                                                log_b.shape[1])
+            columns = np.arange(len(indices))
+        N, T = log_b.shape[0], len(indices)
+
+        if self.engine == 'scaled':
+            # scaled lattices are N x T anyway
+            return self._compute_scaled_expectations(
+                log_pi, log_a, log_b[:, columns], indices)
+
+        log_alpha = self._compute_logalpha(log_pi, log_a, log_b, out=out,
+                                           indices=columns)
+
+        logzero, logone, _, _ = self._numeric_primitives()
+        elnsum = self._elnsum_ufunc()
+        elnsum_reduce = self._elnsum_reducer()
+        log_likelihood = elnsum_reduce(log_alpha[:, T-1], 0)
+        log_transitions = self._transition_zeros(log_a)
+        log_emissions = np.full((N, len(self.symbols)), logzero,
+                                dtype=self._dtype)
+        log_beta = np.full(N, logone, dtype=self._dtype)
+
+        for t in xrange(T - 1, -1, -1):
+            log_gamma = log_alpha[:, t] + log_beta - log_likelihood
+            k = indices[t]
+            log_emissions[:, k] = elnsum(log_emissions[:, k], log_gamma)
+            if t > 0:
+                log_b_beta = log_b[:, columns[t]] + log_beta
+                log_transitions = elnsum(
+                    log_transitions,
+                    self._transition_terms(log_alpha[:, t-1], log_a,
+                                           log_b_beta - log_likelihood))
+                log_beta = self._elnsum_successors(log_a, log_b_beta)
+
+        return Expectations(
+            log_likelihood=log_likelihood,
+            log_initial_states=log_gamma,
+            log_transitions=self._transitions_like(log_a, log_transitions),
+            log_emissions=log_emissions,
+            log_gamma_sum=elnsum_reduce(log_emissions, 1))
+
+    def _merge_expectations(self, expectations):
+        """
+        Sum expected counts of independent sequences in log space.
+
+        Arguments:
+            expectations (sequence): Expectations tuples.
+
+        Returns:
+            Expectations tuple with logarithm of joint likelihood and sums of
+            expected counts.
+
+        """
+        elnsum = self._elnsum_ufunc()
+        merged = expectations[0]
+        for other in expectations[1:]:
+            merged = Expectations(
+                log_likelihood=merged.log_likelihood + other.log_likelihood,
+                log_initial_states=elnsum(merged.log_initial_states,
+                                          other.log_initial_states),
+                log_transitions=self._merge_transitions(
+                    merged.log_transitions, other.log_transitions),
+                log_emissions=elnsum(merged.log_emissions,
+                                     other.log_emissions),
+                log_gamma_sum=elnsum(merged.log_gamma_sum,
+                                     other.log_gamma_sum))
+        return merged
+
+    def _merge_transitions(self, log_x, log_y):
+        """
+        Sum expected transitions in log space.
+
+        Arguments:
+            log_x (array): Logarithms of transitions (N x N array or
+                SparseTransitions).
+            log_y (array): Logarithms of transitions of the same structure.
+
+        Returns:
+            Logarithms of sums in the same structure.
+
+        """
+        elnsum = self._elnsum_ufunc()
+        if isinstance(log_x, SparseTransitions):
+            return log_x.with_values(elnsum(log_x.values, log_y.values))
+        return elnsum(log_x, log_y)
+
+    def _normalize_transitions(self, log_transitions, log_sums=None):
+        """
+        Normalize expected transitions to probabilities in log space.
+
+            a_ij = transitions S_i -> S_j / sum_{k=1}^N transitions S_i -> S_k
+
+        Arguments:
+            log_transitions (array): Logarithms of transitions (N x N array
+                or SparseTransitions).
+            log_sums (array): Logarithms of expected departures from every
+                state (N), sums of transitions if None.
+
+        Returns:
+            Logarithms of transition probabilities in the same structure.
+
+        """
+        if isinstance(log_transitions, SparseTransitions):
+            if log_sums is None:
+                logzero, _, _, _ = self._numeric_primitives()
+                log_sums = log_transitions.reduce_sources(
+                    self._elnsum_ufunc(), log_transitions.values, logzero)
+            return log_transitions.with_values(self._elnquotient(
+                log_transitions.values, log_sums[log_transitions.rows]))
+        if log_sums is None:
+            log_sums = self._elnsum_reducer()(log_transitions, 1)
+        return self._elnquotient(log_transitions, log_sums[:, np.newaxis])
+
+    def _normalize_emissions(self, log_emissions, log_gamma_sum):
+        """
+        Normalize expected emissions to probabilities in log space.
+
+            b_i (v_k) = emissions of v_k in S_i / visits of S_i
+
+        Arguments:
+            log_emissions (array): Logarithms of emissions (N x M).
+            log_gamma_sum (array): Logarithms of expected visits of every
+                state (N).
+
+        Returns:
+            An array with logarithms of emission probabilities (N x M).
+
+        """
+        return self._elnquotient(log_emissions,
+                                 log_gamma_sum[:, np.newaxis])
+
+    def _sequences_expectations(self, sequences, checkpoint=False):
+        """
+        Compute expected counts summed over observed sequences.
+
+        Arguments:
+            sequences (sequence): Observed sequences.
+            checkpoint (bool): Use checkpointed E-step.
+
+        Returns:
+            Expectations tuple summed over sequences.
+
+        """
+        log_pi, log_a, log_emission_matrix, _ = \
+            self._encoded_log_parameters_of([])
+        return self._merge_expectations([
+            self._compute_expectations(
+                log_pi, log_a, log_emission_matrix, observations,
+                checkpoint=checkpoint, gather=True)
+            for observations in sequences])
+
+    def _maximize(self, expectations):
+        """
+        Replace model parameters with Baum-Welch re-estimation (M-step).
+
+            pi_i = expected number of sequences starting in S_i / K
+            a_ij = expected transitions S_i -> S_j / transitions from S_i
+            b_i (v_k) = expected emissions of v_k in S_i / visits of S_i
+
+        Arguments:
+            expectations (Expectations): Expected counts of K sequences.
+
+        """
+        elnsum_reduce = self._elnsum_reducer()
+        log_initial_states = expectations.log_initial_states
+        self._set_log_parameters(
+            self._elnquotient(log_initial_states,
+                              elnsum_reduce(log_initial_states, 0)),
+            self._normalize_transitions(expectations.log_transitions),
+            self._normalize_emissions(expectations.log_emissions,
+                                      expectations.log_gamma_sum))
+
+    @classmethod
+    def _shards(cls, sequences, number):
+        """
+        Split sequences into shards with balanced total length.
+
+        The longest sequences are assigned first, each to the shard with
+        the smallest total length.
+
+        Arguments:
+            sequences (list): Observed sequences.
+            number (int): Number of shards.
+
+        Returns:
+            List of non-empty lists with indices of sequences.
+
+        """
+        heap = [(0, k, []) for k in xrange(0, number)]
+        order = sorted(xrange(0, len(sequences)),
+                       key=lambda k: len(sequences[k]), reverse=True)
+        for k in order:
+            total, shard_number, shard = heapq.heappop(heap)
+            shard.append(k)
+            heapq.heappush(heap,
+                           (total + len(sequences[k]), shard_number, shard))
+        return [shard for _, _, shard in sorted(heap, key=lambda x: x[1])
+                if shard]
+
+    def _recompute_log_initial_states(self, log_gamma):
+        """
+        Re-estimate initial states probabilities in log space.
+
+            pi_i = gamma_1 (i)
+
+        Arguments:
+            log_gamma (array): Logarithms of gamma variable (N x T).
+
+        Returns:
+            An array with logarithms of initial states probabilities (N).
+
+        Reises:
+            TypeError if log_gamma is None.
+            ValueError if log_gamma is empty or has invalid size.
+
+        """
+        self._check_lattice(log_gamma, 2)
+        return np.array(self._as_numeric(log_gamma)[:, 0])
+
+    def _recompute_log_transitions(self, log_gamma, log_eta):
+        """
+        Re-estimate transition probabilities in log space.
+
+                      sum_{t=1}^{T-1} eta_t (i, j)
+            a_ij = ---------------------------
+                      sum_{t=1}^{T-1} gamma_t (i)
+
+        Arguments:
+            log_gamma (array): Logarithms of gamma variable (N x T).
+            log_eta (array): Logarithms of eta variable (N x N x T).
+
+        Returns:
+            An array with logarithms of transition probabilities (N x N),
+            logarithm of zero everywhere if T = 1.
+
+        Reises:
+            TypeError if any argument is None.
+            ValueError if any argument is empty or sizes mismatch.
+
+        """
+        self._check_lattice(log_gamma, 2)
+        self._check_lattice(log_eta, 3)
+        log_gamma = self._as_numeric(log_gamma)
+        log_eta = self._as_numeric(log_eta)
+        N, T = log_gamma.shape
+        if log_eta.shape != (N, N, T):
+            raise ValueError('sizes of gamma and eta mismatch')
+
+        logzero, _, _, _ = self._numeric_primitives()
+        if T == 1:
+            return np.full((N, N), logzero, dtype=self._dtype)
+
+        elnsum_reduce = self._elnsum_reducer()
+        log_eta_sum = elnsum_reduce(log_eta[:, :, :T-1], 2)
+        log_gamma_sum = elnsum_reduce(log_gamma[:, :T-1], 1)
+        return self._normalize_transitions(log_eta_sum, log_gamma_sum)
+
+    def _recompute_log_emissions(self, log_gamma, observed_states, symbols):
+        """
+        Re-estimate emission probabilities in log space.
+
+                         sum_{t: O_t = v_k} gamma_t (i)
+            b_i (v_k) = --------------------------------
+                            sum_{t=1}^T gamma_t (i)
+
+        Numerators of all symbols are grouped sums computed with one
+        reduction over time.
+
+        Arguments:
+            log_gamma (array): Logarithms of gamma variable (N x T).
+            observed_states (array): Observed symbols O_1, ..., O_T.
+            symbols (array): Symbols v_1, ..., v_M.
+
+        Returns:
+            An array with logarithms of emission probabilities (N x M).
+
+        Reises:
+            TypeError if any argument is None.
+            ValueError if any argument is empty or sizes mismatch.
+
+        """
+        self._check_lattice(log_gamma, 2)
+        self._check_lattice(observed_states, 1)
+        self._check_lattice(symbols, 1)
+        log_gamma = self._as_numeric(log_gamma)
+        N, T = log_gamma.shape
+        if len(observed_states) != T:
+            raise ValueError('sizes of gamma and observed states mismatch')
+
+        groups = {}
+        for symbol in symbols:
+            groups.setdefault(symbol, len(groups))
+        indices = np.array([groups.get(o, -1) for o in observed_states],
+                           dtype=np.intp)
+        observed = indices >= 0
+
+        logzero, _, _, _ = self._numeric_primitives()
+        log_emissions = _grouped_reduce(
+            self._elnsum_ufunc(), log_gamma[:, observed], indices[observed],
+            len(groups), logzero)
+        log_emissions = log_emissions[:, [groups[v] for v in symbols]]
+        return self._normalize_emissions(
+            log_emissions, self._elnsum_reducer()(log_gamma, 1))
+
+    def _compute_log_likelihood(self, log_pi, log_a, log_emission_matrix,
+                                indices, beam=None, max_states=None):
+        """
+        Compute log-likelihood with forward recursion over rolling vectors.
+
+            log P(O|lambda) = log sum_{i=1}^N alpha_T (i)
+
+        Only the forward variable of the current time step is kept and
+        emissions are gathered from the emission table in chunks of bounded
+        size, so memory does not depend on T. Scaled engine accumulates
+        logarithms of scaling coefficients instead.
+
+        Arguments:
+            log_pi (array): Logarithms of initial states probabilities (N).
+            log_a (array): Logarithms of transition probabilities (N x N).
+            log_emission_matrix (array): Logarithms of emission
+                probabilities (N x M).
+            indices (array): Indices of observed symbols (T).
+            beam (float): Optional log-score beam (see _compute_lattice),
+                pruned recursion always runs in log space.
+            max_states (int): Optional number of kept states per time step.
+
+        Returns:
+            Logarithm of observations probability.
+
+        Reises:
+            ValueError if indices are empty.
+
+        """
+        if len(indices) == 0:
+            raise ValueError('observations cannot be empty')
+
+        if beam is not None or max_states is not None:
+            log_pruned = self._log_pruned_buffer(len(indices))
+            log_alpha = self._compute_lattice(
+                self._semiring('sum'), log_pi, log_a, log_emission_matrix,
+                indices=indices, lattice=False, beam=beam,
+                max_states=max_states, log_pruned=log_pruned)
+            self._log_pruned = log_pruned
+            return self._elnsum_reducer()(log_alpha, 0)
+
+        if self.engine == 'scaled':
+            a = self._exp_transitions(log_a)
+            emissions = np.ascontiguousarray(np.exp(log_emission_matrix).T)
+            alpha = np.exp(log_pi) * emissions[indices[0]]
+            log_likelihood = 0.
+            for t in xrange(0, len(indices)):
+                if t > 0:
+                    alpha = (self._dot_predecessors(alpha, a) *
+                             emissions[indices[t]])
+                scale = alpha.sum()
+                if scale == 0:
+                    return -np.inf
+                alpha /= scale
+                log_likelihood += np.log(scale)
+            return log_likelihood
+
+        log_alpha = self._compute_lattice(
+            self._semiring('sum'), log_pi, log_a, log_emission_matrix,
+            indices=indices, lattice=False)
+        return self._elnsum_reducer()(log_alpha, 0)
+
+    def _parameters_copy(self):
+        """
+        Copy model without computed lattices, e.g. to send it to pool
+        workers.
+
+        Returns:
+            GenericHMM instance sharing parameters with the model.
+
+        """
+        model = copy.copy(self)
+        model._invalidate_lattices()
+        return model
+
+    def _compute_transfer(self, log_start, indices):
+        """
+        Compute log semiring transfer matrix of a time chunk.
+
+            X_1 = S diag(b (O_1))
+            X_t = X_{t-1} A diag(b (O_t))
+
+        Rows of start S are advanced over the chunk. Starting from rows of
+        A gives transfer matrix M with alpha_end = alpha_prev M and
+        beta_prev = M beta_end, so chunks are independent of each other.
+
+        Arguments:
+            log_start (array): Logarithms of start rows (R x N).
+            indices (array): Indices of observed symbols of the chunk.
+
+        Returns:
+            An array with logarithms of advanced rows (R x N).
+
+        """
+        return self._compute_lattice(
+            self._semiring('sum'), log_start, self._log_transition_matrix,
+            self._log_emission_matrix, indices=indices, lattice=False)
+
+    def _compute_chunk_logalpha(self, log_alpha_prev, indices):
+        """
+        Compute forward variable of a time chunk.
+
+        Arguments:
+            log_alpha_prev (array): Logarithms of forward variable before
+                the chunk (N), None for the first chunk.
+            indices (array): Indices of observed symbols of the chunk (L).
+
+        Returns:
+            An array with logarithms of forward variable (N x L).
+
+        """
+        log_a = self._log_transition_matrix
+        if log_alpha_prev is None:
+            log_pi = self._log_initial_states
+        else:
+            log_pi = self._elnsum_predecessors(log_alpha_prev, log_a)
+        return self._compute_lattice(self._semiring('sum'), log_pi, log_a,
+                                     self._log_emission_matrix,
+                                     indices=indices)
+
+    def _compute_chunk_lattices(self, log_alpha_prev, log_beta_end, indices):
+        """
+        Compute forward and backward variables of a time chunk.
+
+        Arguments:
+            log_alpha_prev (array): Logarithms of forward variable before
+                the chunk (N), None for the first chunk.
+            log_beta_end (array): Logarithms of backward variable at the
+                last time step of the chunk (N).
+            indices (array): Indices of observed symbols of the chunk (L).
+
+        Returns:
+            Tuple (log_alpha, log_beta) with arrays (N x L).
+
+        """
+        log_a = self._log_transition_matrix
+        log_emissions = np.ascontiguousarray(self._log_emission_matrix.T)
+        log_alpha = self._compute_chunk_logalpha(log_alpha_prev, indices)
+        log_beta = np.empty(log_alpha.shape, dtype=self._dtype)
+        log_beta[:, -1] = log_beta_end
+        for t in xrange(len(indices) - 1, 0, -1):
+            log_beta[:, t-1] = self._elnsum_successors(
+                log_a, log_emissions[indices[t]] + log_beta[:, t])
+        return log_alpha, log_beta
+
+    def _compute_chunk_expectations(self, log_alpha_prev, log_beta_end,
+                                    log_likelihood, indices):
+        """
+        Compute expected counts of a time chunk in log space.
+
+        Transitions into the first time step of the chunk belong to the
+        chunk. Initial states are counted by the first chunk only.
+
+        Arguments:
+            log_alpha_prev (array): Logarithms of forward variable before
+                the chunk (N), None for the first chunk.
+            log_beta_end (array): Logarithms of backward variable at the
+                last time step of the chunk (N).
+            log_likelihood: Log-likelihood of the whole sequence.
+            indices (array): Indices of observed symbols of the chunk (L).
+
+        Returns:
+            Expectations tuple of the chunk.
+
+        """
+        logzero, _, _, _ = self._numeric_primitives()
+        elnsum = self._elnsum_ufunc()
+        log_a = self._log_transition_matrix
+        log_emission_matrix = self._log_emission_matrix
+        log_alpha = self._compute_chunk_logalpha(log_alpha_prev, indices)
+        log_transitions = self._transition_zeros(log_a)
+        log_emissions = np.full(log_emission_matrix.shape, logzero,
+                                dtype=self._dtype)
+        log_beta = log_beta_end
+
+        for t in xrange(len(indices) - 1, -1, -1):
+            log_gamma = log_alpha[:, t] + log_beta - log_likelihood
+            k = indices[t]
+            log_emissions[:, k] = elnsum(log_emissions[:, k], log_gamma)
+            if t > 0 or log_alpha_prev is not None:
+                log_prev = log_alpha[:, t-1] if t > 0 else log_alpha_prev
+                log_b_beta = log_emission_matrix[:, k] + log_beta
+                log_transitions = elnsum(
+                    log_transitions,
+                    self._transition_terms(log_prev, log_a,
+                                           log_b_beta - log_likelihood))
+                log_beta = self._elnsum_successors(log_a, log_b_beta)
+
+        if log_alpha_prev is not None:
+            log_gamma = np.full(log_gamma.shape, logzero, dtype=self._dtype)
+        return Expectations(
+            log_likelihood=log_likelihood,
+            log_initial_states=log_gamma,
+            log_transitions=self._transitions_like(log_a, log_transitions),
+            log_emissions=log_emissions,
+            log_gamma_sum=self._elnsum_reducer()(log_emissions, 1))
+
+    def _time_parallel_scan(self, indices, chunks, pool=None):
+        """
+        Split observed sequence into time chunks and combine their transfer
+        matrices with a scan over chunk boundaries.
+
+        Transfer matrices are computed in parallel, the scan costs
+        O(chunks N^2) and runs in the calling process.
+
+        Arguments:
+            indices (array): Indices of observed symbols (T).
+            chunks (int): Number of time chunks.
+            pool (Pool): Pool of worker processes, chunks are computed in
+                the calling process if None.
+
+        Returns:
+            Tuple (model, parts, log_alpha_prevs, log_beta_ends,
+            log_likelihood) with model copy for workers, indices of chunks,
+            forward variables before every chunk (None for the first one),
+            backward variables at the end of every chunk and log-likelihood.
+
+        Reises:
+            ValueError if indices are empty.
+
+        """
+        if len(indices) == 0:
+            raise ValueError('observations cannot be empty')
+        logzero, logone, _, _ = self._numeric_primitives()
+        elnsum_reduce = self._elnsum_reducer()
+        log_pi, _, _, _ = self._encoded_log_parameters_of([])
+        N = log_pi.shape[0]
+        model = self._parameters_copy()
+        bounds = np.unique(np.linspace(0, len(indices), chunks + 1).astype(
+            np.intp))
+        parts = [indices[start:end]
+                 for start, end in zip(bounds[:-1], bounds[1:])]
+
+        log_a = self._log_transition_matrix
+        if isinstance(log_a, SparseTransitions):
+            log_a = log_a.todense(logzero)
+        tasks = [(model, log_pi[np.newaxis], parts[0])]
+        tasks.extend((model, log_a, part) for part in parts[1:])
+        transfers = (pool.map if pool is not None else map)(
+            _time_chunk_transfer, tasks)
+
+        log_alpha_ends = [transfers[0][0]]
+        for log_m in transfers[1:]:
+            log_alpha_ends.append(
+                elnsum_reduce(log_alpha_ends[-1][:, np.newaxis] + log_m, 0))
+        log_beta_ends = [np.full(N, logone, dtype=self._dtype)]
+        for log_m in transfers[:0:-1]:
+            log_beta_ends.insert(
+                0, elnsum_reduce(log_m + log_beta_ends[0][np.newaxis, :], 1))
+
+        return (model, parts, [None] + log_alpha_ends[:-1], log_beta_ends,
+                elnsum_reduce(log_alpha_ends[-1], 0))
+
+    def _compute_time_parallel_lattices(self, indices, chunks, pool=None):
+        """
+        Compute forward and backward variables with time chunks processed
+        in parallel.
+
+        Arguments:
+            indices (array): Indices of observed symbols (T).
+            chunks (int): Number of time chunks.
+            pool (Pool): Pool of worker processes, chunks are computed in
+                the calling process if None.
+
+        Returns:
+            Tuple (log_alpha, log_beta, log_likelihood) with arrays (N x T)
+            and log-likelihood.
+
+        """
+        model, parts, log_alpha_prevs, log_beta_ends, log_likelihood = \
+            self._time_parallel_scan(indices, chunks, pool)
+        lattices = (pool.map if pool is not None else map)(
+            _time_chunk_lattices,
+            [(model, log_alpha_prev, log_beta_end, part)
+             for log_alpha_prev, log_beta_end, part
+             in zip(log_alpha_prevs, log_beta_ends, parts)])
+        return (np.concatenate([alpha for alpha, _ in lattices], axis=1),
+                np.concatenate([beta for _, beta in lattices], axis=1),
+                log_likelihood)
+
+    def _compute_time_parallel_expectations(self, indices, chunks,
+                                            pool=None):
+        """
+        Compute expected counts of Baum-Welch E-step with time chunks
+        processed in parallel.
+
+        Arguments:
+            indices (array): Indices of observed symbols (T).
+            chunks (int): Number of time chunks.
+            pool (Pool): Pool of worker processes, chunks are computed in
+                the calling process if None.
+
+        Returns:
+            Expectations tuple summed over chunks.
+
+        """
+        model, parts, log_alpha_prevs, log_beta_ends, log_likelihood = \
+            self._time_parallel_scan(indices, chunks, pool)
+        expectations = (pool.map if pool is not None else map)(
+            _time_chunk_expectations,
+            [(model, log_alpha_prev, log_beta_end, log_likelihood, part)
+             for log_alpha_prev, log_beta_end, part
+             in zip(log_alpha_prevs, log_beta_ends, parts)])
+
+        elnsum = self._elnsum_ufunc()
+        log_transitions = expectations[0].log_transitions
+        log_emissions = expectations[0].log_emissions
+        log_gamma_sum = expectations[0].log_gamma_sum
+        for e in expectations[1:]:
+            log_transitions = self._merge_transitions(log_transitions,
+                                                      e.log_transitions)
+            log_emissions = elnsum(log_emissions, e.log_emissions)
+            log_gamma_sum = elnsum(log_gamma_sum, e.log_gamma_sum)
+        return Expectations(
+            log_likelihood=log_likelihood,
+            log_initial_states=expectations[0].log_initial_states,
+            log_transitions=log_transitions,
+            log_emissions=log_emissions,
+            log_gamma_sum=log_gamma_sum)
+
+    def _compute_viterbi(self, log_pi, log_a, log_b, beam=None,
+                         max_states=None, indices=None):
+        """
+        Compute the most likely states path with Viterbi algorithm in
+        log space.
+
+            psi_t (j) = argmax_i (delta_{t-1} (i) a_ij)
+
+            q_T = argmax_i delta_T (i)
+            q_t = psi_{t+1} (q_{t+1})
+
+        Only the current delta_t column and backpointers psi_t are stored.
+        Backpointers use the smallest unsigned integer type that fits N.
 
-        N = len(states)   # number of states
-        M = len(symbols)  # number of symbols
+        Arguments:
+            log_pi (array): Logarithms of initial states probabilities (N).
+            log_a (array): Logarithms of transition probabilities (N x N).
+            log_b (array): Logarithms of emission probabilities (N x T), or
+                of emission table (N x M) if indices are given.
+            beam (float): Optional log-score beam (see _compute_lattice).
+            max_states (int): Optional number of kept states per time step.
+            indices (array): Indices of observed symbols (T), emissions are
+                gathered from the table chunk by chunk.
 
-        self.states = states
-        self.symbols = symbols
-        self.initial_states = np.empty((N), dtype=object)
-        self.transition_matrix = np.empty((N, N), dtype=object)
-        self.emission_matrix = np.empty((N, M), dtype=object)
+        Returns:
+            Tuple (path, log_probability) with array of states indices and
+            logarithm of path probability.
+
+        Reises:
+            TypeError if any argument is None.
+            ValueError if any argument is empty or sizes mismatch.
 
-    @classmethod
-    def _eexp(cls, x):
         """
-        Extended exponential function.
+        log_pi, log_a, log_b = self._prepare_log_parameters(
+            log_pi, log_a, log_b)
+        N, T = self._emissions_shape(log_b, indices)
+
+        semiring = self._semiring('max')
+        index_type = np.min_scalar_type(N - 1)
+        backpointers = np.empty((T, N), dtype=index_type)
+        log_pruned = None
+        if beam is not None or max_states is not None:
+            log_pruned = self._log_pruned_buffer(T)
+        log_delta = self._compute_lattice(semiring, log_pi, log_a, log_b,
+                                          indices=indices, lattice=False,
+                                          backpointers=backpointers,
+                                          beam=beam, max_states=max_states,
+                                          log_pruned=log_pruned)
+        if log_pruned is not None:
+            self._log_pruned = log_pruned
+
+        log_probability, last_state = semiring.select(log_delta, 0)
+        path = np.empty(T, dtype=index_type)
+        path[T-1] = last_state
+        for t in xrange(T - 1, 0, -1):
+            path[t-1] = backpointers[t, path[t]]
+
+        return path, log_probability
+
+    def _compute_nbest_viterbi(self, log_pi, log_a, log_b, k, indices=None):
+        """
+        Compute the k most likely states paths with list Viterbi algorithm
+        in log space.
+
+            delta_t (j, r) = r-th largest of delta_{t-1} (i, s) a_ij b_j (O_t)
+                over predecessors i and their ranks s
+
+        Top k partial scores delta_t (j, 1..k) in decreasing order and their
+        predecessors (state, rank) are kept for every state j and time step
+        t. Candidates of every predecessor i are already sorted by rank, so
+        the k best candidates of all states are found by k vectorized merge
+        steps over N x N arrays (O(T N^2 k) work, O(T N k) memory for
+        backpointers). Sparse transitions are merged over stored
+        transitions only (O(T nnz k) work).
 
         Arguments:
-            x (Decimal): A number.
+            log_pi (array): Logarithms of initial states probabilities (N).
+            log_a (array): Logarithms of transition probabilities (N x N
+                array or SparseTransitions).
+            log_b (array): Logarithms of emission probabilities (N x T), or
+                of emission table (N x M) if indices are given.
+            k (int): Number of paths.
+            indices (array): Indices of observed symbols (T), emissions of a
+                time step are read from the table.
 
         Returns:
-            e**x or Decimal('NaN') (if x is not a number).
+            Tuple (paths, log_probabilities) with array of states indices of
+            paths (K x T) and logarithms of their probabilities (K) in
+            decreasing order. K is less than k if there are less than k
+            possible paths (only the best path is returned if there is no
+            possible path at all).
+
+        Reises:
+            TypeError if any argument is None.
+            ValueError if any argument is empty, sizes mismatch, k is not
+            positive or numeric is not float64.
 
         """
-        if x.is_nan():
-            return decimal.Decimal(0)
+        if self.numeric != 'float64':
+            raise ValueError('n-best decoding requires float64 numeric')
+        if k < 1:
+            raise ValueError('k must be positive')
+        log_pi, log_a, log_b = self._prepare_log_parameters(
+            log_pi, log_a, log_b)
+        sparse = isinstance(log_a, SparseTransitions)
+        N, T = self._emissions_shape(log_b, indices)
+        # emission column of every time step
+        columns = np.arange(T) if indices is None else indices
+
+        # delta_t (j, r) for ranks r (rows) and states j (columns), missing
+        # ranks and the extra last row hold logarithm of zero
+        log_delta = np.empty((k + 1, N))
+        log_delta.fill(-np.inf)
+        log_delta[0] = log_pi + log_b[:, columns[0]]
+        state_type = np.min_scalar_type(N - 1)
+        state_pointers = np.empty((T, k, N), dtype=state_type)
+        rank_pointers = np.empty((T, k, N),
+                                 dtype=np.min_scalar_type(k - 1))
+        states = np.arange(N)
+        if sparse:
+            targets = np.unique(log_a.cols)
         else:
-            return x.exp()
+            log_a_targets = np.ascontiguousarray(log_a.T)
 
-    @classmethod
-    def _eln(cls, x):
+        for t in xrange(1, T):
+            next_log_delta = np.empty_like(log_delta)
+            next_log_delta[k] = -np.inf
+            if sparse:
+                # next unused rank of the source of every transition, states
+                # without incoming transitions keep logarithm of zero
+                ranks = np.zeros(log_a.nnz, dtype=np.intp)
+                state_pointers[t] = 0
+                rank_pointers[t] = 0
+            else:
+                # next unused rank of every predecessor i (columns) for
+                # every state j (rows)
+                ranks = np.zeros((N, N), dtype=np.intp)
+            for r in xrange(0, k):
+                if sparse:
+                    candidates = log_a.values + log_delta[ranks, log_a.rows]
+                    next_log_delta[r] = log_a.reduce_targets(
+                        np.maximum, candidates, -np.inf)
+                    selected = log_a.argmax_targets(
+                        candidates, next_log_delta[r])[targets]
+                    positions = log_a.positions(selected, targets)
+                    state_pointers[t, r, targets] = selected
+                    rank_pointers[t, r, targets] = np.minimum(
+                        ranks[positions], k - 1)
+                    ranks[positions] += 1
+                else:
+                    candidates = log_a_targets + log_delta[ranks, states]
+                    selected = candidates.argmax(1)
+                    state_pointers[t, r] = selected
+                    rank_pointers[t, r] = np.minimum(
+                        ranks[states, selected], k - 1)
+                    next_log_delta[r] = candidates[states, selected]
+                    # exhausted predecessors point to the extra row
+                    ranks[states, selected] += 1
+            next_log_delta[:k] += log_b[:, columns[t]]
+            log_delta = next_log_delta
+
+        order = np.argsort(-log_delta[:k].ravel(), kind='mergesort')[:k]
+        log_probabilities = log_delta[:k].ravel()[order]
+        possible = np.isfinite(log_probabilities)
+        possible[0] = True
+        order = order[possible]
+        log_probabilities = log_probabilities[possible]
+
+        paths = np.empty((len(order), T), dtype=state_type)
+        ranks, last_states = np.divmod(order, N)
+        paths[:, T-1] = last_states
+        for t in xrange(T - 1, 0, -1):
+            paths[:, t-1] = state_pointers[t, ranks, paths[:, t]]
+            ranks = rank_pointers[t, ranks, paths[:, t]]
+
+        return paths, log_probabilities
+
+    def score(self, observations, processes=1, beam=None, max_states=None):
         """
-        Extended logarithm.
+        Compute log-likelihood of observations.
+
+            log P(O|lambda)
+
+        No lattice is allocated or kept, memory does not depend on length
+        of observations.
 
         Arguments:
-            x (Decimal): A number.
+            observations (sequence): Observed symbols O_1, ..., O_T or their
+                indices (see encode).
+            processes (int): Number of worker processes. If greater than 1,
+                the sequence is split into time chunks whose N x N transfer
+                matrices are computed in parallel (O(N^3) instead of O(N^2)
+                work per time step, worth it for long sequences and small
+                models).
+            beam (float): Keep only states whose forward log-score is within
+                beam of the best one at every time step (approximation for
+                large state spaces, float64 numeric only).
+            max_states (int): Keep at most max_states best states at every
+                time step (same restrictions as beam). Pruned recursions run
+                in a single process, pruned fractions are in log_pruned.
 
         Returns:
-            A logarithm x or Decimal('NaN') (if x is not a number).
+            Logarithm of observations probability (lower bound if pruned).
 
         Reises:
-            ValueError if x < 0.
+            ValueError if model parameters are not set, observations are
+            empty, observation is not a model symbol or pruning is requested
+            for decimal numeric.
 
         """
-        if x == 0:
-            return decimal.Decimal('NaN')
-        elif x > 0:
-            return x.ln()
-        else:
-            raise ValueError
+        indices = self.encode(observations)
+        log_pi, log_a, _, _ = self._encoded_log_parameters_of([])
+        if (processes == 1 or len(indices) < 2 or beam is not None or
+                max_states is not None):
+            return self._compute_log_likelihood(
+                log_pi, log_a, self._log_emission_matrix, indices, beam=beam,
+                max_states=max_states)
 
-    @classmethod
-    def _elnsum(cls, eln_x, eln_y):
+        pool = multiprocessing.Pool(processes)
+        try:
+            return self._time_parallel_scan(indices, processes, pool)[-1]
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def score_many(self, sequences, workers=None, chunksize=64):
         """
-        Extended logarithm sum.
+        Compute log-likelihoods of many observed sequences.
+
+        Sequences are read lazily in chunks and scored by a pool of worker
+        processes, each of which receives model parameters once. At most
+        two chunks per worker are in flight, so sequences may come from an
+        unbounded generator.
 
         Arguments:
-            eln_x (Decimal): Natural logarithm from x.
-            eln_y (Decimal): Natural logarithm from y.
+            sequences (iterable): Observed sequences of symbols or their
+                indices (see encode).
+            workers (int): Number of worker processes (number of CPUs if
+                None, no pool if 1).
+            chunksize (int): Number of sequences sent to a worker at once.
 
         Returns:
-            Sum of logarithms or Decimal('NaN') (if eln_x and eln_y is
-            not a number).
+            Iterator over log-likelihoods of sequences in input order.
+
+        Reises:
+            ValueError if model parameters are not set, workers or chunksize
+            is not positive. Errors of scoring (e.g. unknown symbol) are
+            raised while iterating.
 
         """
-        if not (eln_x.is_nan() or eln_y.is_nan()):
-            dec_1 = decimal.Decimal(1)
-            if eln_x > eln_y:
-                return eln_x + cls._eln(dec_1 + (eln_y - eln_x).exp())
-            else:
-                return eln_y + cls._eln(dec_1 + (eln_x - eln_y).exp())
-        elif not eln_x.is_nan():
-            return eln_x
-        elif not eln_y.is_nan():
-            return eln_y
-        else:
-            return decimal.Decimal('NaN')
+        self._encoded_log_parameters_of([])
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        if workers < 1:
+            raise ValueError('workers must be positive')
+        if chunksize < 1:
+            raise ValueError('chunksize must be positive')
 
-    @classmethod
-    def _elnproduct(cls, eln_x, eln_y):
+        if workers == 1:
+            return itertools.imap(self.score, sequences)
+        return self._iter_pool_scores(iter(sequences), workers, chunksize)
+
+    def _iter_pool_scores(self, sequences, workers, chunksize):
         """
-        Extended logarithm product.
+        Score sequences in a pool of worker processes.
 
         Arguments:
-            eln_x (Decimal): Natural logarithm from x.
-            eln_y (Decimal): Natural logarithm from y.
+            sequences (iterator): Observed sequences.
+            workers (int): Number of worker processes.
+            chunksize (int): Number of sequences sent to a worker at once.
+
+        Yields:
+            Log-likelihoods of sequences in input order.
+
+        """
+        pool = multiprocessing.Pool(workers, initializer=_init_scoring_worker,
+                                    initargs=(self._parameters_copy(),))
+        try:
+            pending = collections.deque()
+            exhausted = False
+            while True:
+                while not exhausted and len(pending) < 2 * workers:
+                    chunk = list(itertools.islice(sequences, chunksize))
+                    if not chunk:
+                        exhausted = True
+                    else:
+                        pending.append(pool.apply_async(_score_chunk,
+                                                        (chunk,)))
+                if not pending:
+                    break
+                for log_likelihood in pending.popleft().get():
+                    yield log_likelihood
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def decode(self, observations, beam=None, max_states=None):
+        """
+        Find the most likely sequence of hidden states (Viterbi path).
+
+        Arguments:
+            observations (sequence): Observed symbols O_1, ..., O_T or their
+                indices (see encode).
+            beam (float): Expand only states whose log-score is within beam
+                of the best one at every time step (approximation for large
+                state spaces, float64 numeric only).
+            max_states (int): Expand at most max_states best states at every
+                time step (same restrictions as beam). Pruned fractions of
+                max-scores are in log_pruned.
 
         Returns:
-            Product of logaritms or Decimal('NaN') (if eln_x and eln_y is
-            not a number)
+            Tuple (path, log_probability) with array of states indices and
+            logarithm of path probability.
+
+        Reises:
+            ValueError if model parameters are not set, observation is not
+            a model symbol or pruning is requested for decimal numeric.
 
         """
-        if not (eln_x.is_nan() and eln_y.is_nan()):
-            return eln_x + eln_y
-        else:
-            return decimal.Decimal('NaN')
+        log_pi, log_a, log_emission_matrix, indices = \
+            self._encoded_log_parameters_of(observations)
+        return self._compute_viterbi(log_pi, log_a, log_emission_matrix,
+                                     beam=beam, max_states=max_states,
+                                     indices=indices)
 
-    def _compute_logalpha(self):
+    def nbest_decode(self, observations, k):
         """
-        Compute forward variable alpha_t (i) in log space.
+        Find the k most likely sequences of hidden states (list Viterbi).
 
-            alpha_t (i) = P(O_1, O_2, ..., O_{t-1}, q_t = S_i|lambda)
+        Arguments:
+            observations (sequence): Observed symbols O_1, ..., O_T or their
+                indices (see encode).
+            k (int): Number of paths.
 
-            alpha_1 (i) = pi_i b_i (O_1)
-            alpha_{t+1} (i) = b_i (O_{t+1}) sum_{i=1}^N alpha_t (i) a_{ij}
+        Returns:
+            Tuple (paths, log_probabilities) with array of states indices of
+            at most k paths (K x T) and logarithms of their probabilities (K)
+            in decreasing order.
+
+        Reises:
+            ValueError if model parameters are not set, observation is not
+            a model symbol, k is not positive or numeric is not float64.
+
+        """
+        log_pi, log_a, log_emission_matrix, indices = \
+            self._encoded_log_parameters_of(observations)
+        return self._compute_nbest_viterbi(log_pi, log_a, log_emission_matrix,
+                                           k, indices=indices)
+
+    def posterior_decode(self, observations, gamma=False, processes=1):
+        """
+        Find the most likely hidden state of every time step (posterior
+        decoding).
+
+            q_t = argmax_i P(q_t = S_i|O, lambda)
+
+        Unlike Viterbi path, the sequence of states may be impossible as a
+        whole, but every state has the highest posterior probability.
+
+        Arguments:
+            observations (sequence): Observed symbols O_1, ..., O_T or their
+                indices (see encode).
+            gamma (bool): Also return logarithms of all posterior
+                probabilities gamma_t (i), otherwise gamma is never stored.
+            processes (int): Number of worker processes. If greater than 1,
+                forward and backward variables are computed in parallel over
+                time chunks (see score).
 
         Returns:
-            An array with logarithm alpha_t (i) elements.
+            Tuple (states, log_posteriors) with arrays of states indices and
+            logarithms of their posterior probabilities (T), or tuple
+            (states, log_posteriors, log_gamma) with array (N x T) if gamma
+            is True. With lattice_dir, log_gamma is memory-mapped and its
+            file belongs to the caller, files of forward and backward
+            variables are removed.
+
+        Reises:
+            ValueError if model parameters are not set, observations are
+            empty or observation is not a model symbol.
+
+        """
+        indices = self.encode(observations)
+        log_pi, log_a, _, _ = self._encoded_log_parameters_of([])
+        if processes > 1:
+            pool = multiprocessing.Pool(processes)
+            try:
+                log_alpha, log_beta, _ = \
+                    self._compute_time_parallel_lattices(indices, processes,
+                                                         pool)
+            finally:
+                pool.terminate()
+                pool.join()
+        else:
+            log_emission_matrix = self._log_emission_matrix
+            log_alpha = self._compute_logalpha(
+                log_pi, log_a, log_emission_matrix, indices=indices)
+            log_beta = self._compute_logbeta(log_a, log_emission_matrix,
+                                             indices=indices)
 
+        try:
+            states, log_posteriors = self._compute_posterior_states(
+                log_alpha, log_beta)
+            if not gamma:
+                return states, log_posteriors
+            return (states, log_posteriors,
+                    self._compute_loggamma(log_alpha, log_beta))
+        finally:
+            self._release_lattice(log_alpha)
+            self._release_lattice(log_beta)
+
+    def fit(self, observations, max_iter=100, tol=1e-6, checkpoint=False,
+            processes=1):
         """
-        initial_states = self.initial_states
-        emission_matrix = self.emission_matrix
-        transition_matrix = self.transition_matrix
-        log_alpha = np.empty_like(emission_matrix)
-        T = log_alpha.shape[0]
-        N = log_alpha.shape[1]
+        Estimate model parameters with Baum-Welch algorithm.
 
-        for j in xrange(0, N):
-            log_alpha[0, j] = self._elnproduct(
-                self._eln(initial_states[j]),
-                self._eln(emission_matrix[0, j]))
+        Current parameters are the starting point. Forward variable is
+        stored in a buffer allocated once and reused by every iteration,
+        emissions are read from the emission matrix for observed symbols.
 
-        for t in xrange(1, T):
-            for j in xrange(0, N):
-                logalpha = decimal.Decimal('NaN')
-                for i in xrange(0, N):
-                    logalpha = self._elnsum(
-                        logalpha,
-                        self._elnproduct(log_alpha[t-1, i],
-                                         self._eln(transition_matrix[i, j])))
-                log_alpha[t, j] = self._elnproduct(
-                    logalpha,
-                    self._eln(emission_matrix[t, j]))
+        Arguments:
+            observations (sequence): Observed symbols O_1, ..., O_T or their
+                indices (see encode).
+            max_iter (int): Maximum number of iterations.
+            tol (float): Stop when log-likelihood improves less than tol.
+            checkpoint (bool): Store forward variable only every sqrt(T)
+                time steps and recompute it during backward sweep, emissions
+                are read from the emission matrix block by block (O(sqrt(T)
+                N) memory besides T symbol indices instead of O(T N) for
+                about twice the forward work).
+            processes (int): Number of worker processes. If greater than 1,
+                E-step runs in parallel over time chunks (see score), log
+                space is used and checkpoint is ignored.
 
-        self._log_alpha = log_alpha
-        return log_alpha
+        Returns:
+            List with log-likelihood log P(O|lambda) of every iteration
+            (computed before parameters update).
+
+        Reises:
+            ValueError if model parameters are not set or observation is not
+            a model symbol.
 
-    def _compute_logbeta(self):
         """
-        Compute backward variable beta_t (i) in log space.
+        indices = self.encode(observations)
+        if processes > 1:
+            return self._fit_time_parallel(indices, max_iter, tol, processes)
 
-            beta_t (i) = P(O_{t+1}, O_{t+2}, ..., O_T, q_t = S_i|lambda)
+        log_pi, log_a, log_emission_matrix, indices = \
+            self._encoded_log_parameters_of(indices)
+        log_alpha = None
+        if not checkpoint and self.engine == 'log':
+            log_alpha = np.empty((len(log_pi), len(indices)),
+                                 dtype=self._dtype)
 
-            beta_T (i) = 1
-            beta_{t+1} (i) = sum_{j=1}^N a_{ij} b_j (O_{t+1}) beta_{t+1} (j)
+        log_likelihoods = []
+        for _ in xrange(0, max_iter):
+            expectations = self._compute_expectations(
+                log_pi, log_a, log_emission_matrix, indices, out=log_alpha,
+                checkpoint=checkpoint, gather=True)
+            log_likelihood = expectations.log_likelihood
+            log_likelihoods.append(log_likelihood)
+            self._maximize(expectations)
+
+            log_pi = self._log_initial_states
+            log_a = self._log_transition_matrix
+            log_emission_matrix = self._log_emission_matrix
+
+            if (len(log_likelihoods) > 1 and
+                    float(log_likelihood - log_likelihoods[-2]) < tol):
+                break
+
+        return log_likelihoods
+
+    def _fit_time_parallel(self, indices, max_iter, tol, processes):
+        """
+        Estimate model parameters with Baum-Welch algorithm, E-step
+        parallel over time chunks.
+
+        Arguments:
+            indices (array): Indices of observed symbols (T).
+            max_iter (int): Maximum number of iterations.
+            tol (float): Stop when log-likelihood improves less than tol.
+            processes (int): Number of worker processes and time chunks.
 
         Returns:
-            An array with logarithm beta_t (i) elements.
+            List with log-likelihood of every iteration.
 
         """
-        transition_matrix = self.transition_matrix
-        emission_matrix = self.emission_matrix
-        log_beta = np.empty_like(emission_matrix)
-        T = log_beta.shape[0]
-        N = log_beta.shape[1]
+        self._encoded_log_parameters_of([])
+        pool = multiprocessing.Pool(processes)
+        try:
+            log_likelihoods = []
+            for _ in xrange(0, max_iter):
+                expectations = self._compute_time_parallel_expectations(
+                    indices, processes, pool)
+                log_likelihood = expectations.log_likelihood
+                log_likelihoods.append(log_likelihood)
+                self._maximize(expectations)
 
-        for i in xrange(0, N):
-            log_beta[T-1, i] = decimal.Decimal(0)
+                if (len(log_likelihoods) > 1 and
+                        float(log_likelihood - log_likelihoods[-2]) < tol):
+                    break
+        finally:
+            pool.terminate()
+            pool.join()
 
-        for t in xrange(T - 2, -1, -1):
-            for i in xrange(0, N):
-                logbeta = decimal.Decimal('NaN')
-                for j in xrange(0, N):
-                    logbeta = self._elnsum(
-                        logbeta,
-                        self._elnproduct(
-                            self._eln(transition_matrix[i, j]),
-                            self._elnproduct(
-                                self._eln(emission_matrix[t+1, j]),
-                                log_beta[t+1, j])))
-                log_beta[t, i] = logbeta
+        return log_likelihoods
 
-        self._log_beta = log_beta
-        return log_beta
+    def fit_sequences(self, sequences, max_iter=100, tol=1e-6,
+                      processes=None, checkpoint=False):
+        """
+        Estimate model parameters with Baum-Welch algorithm on independent
+        observed sequences.
+
+        Sequences are split into shards of similar total length. Every
+        iteration each process of a pool runs E-step on its shard and
+        returns summed expected counts, which are summed again before
+        M-step. Sequences are sent to workers only once.
+
+        Arguments:
+            sequences (sequence): Observed sequences of symbols or their
+                indices (see encode).
+            max_iter (int): Maximum number of iterations.
+            tol (float): Stop when log-likelihood improves less than tol.
+            processes (int): Number of worker processes (number of CPUs if
+                None, no pool if 1).
+            checkpoint (bool): Use checkpointed E-step (see fit).
+
+        Returns:
+            List with joint log-likelihood of all sequences of every
+            iteration (computed before parameters update).
+
+        Reises:
+            ValueError if sequences are empty, model parameters are not set
+            or observation is not a model symbol.
 
-    def _compute_loggamma(self):
         """
-        Compute gamma_t (i) variable in log space.
+        # symbols are mapped once, workers get compact integer arrays
+        sequences = [self.encode(observations) for observations in sequences]
+        if not sequences:
+            raise ValueError('sequences cannot be empty')
+        self._encoded_log_parameters_of([])
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        shards = self._shards(sequences, processes)
 
-            gamma_t (i) = P(q_t = S_i|O, lambda)
+        pool = None
+        if len(shards) > 1:
+            pool = multiprocessing.Pool(len(shards), initializer=_init_worker,
+                                        initargs=(sequences,))
+        try:
+            log_likelihoods = []
+            for _ in xrange(0, max_iter):
+                self._invalidate_lattices()
+                if pool is None:
+                    expectations = self._sequences_expectations(
+                        sequences, checkpoint)
+                else:
+                    expectations = self._merge_expectations(pool.map(
+                        _shard_expectations,
+                        [(self, shard, checkpoint) for shard in shards]))
+                log_likelihood = expectations.log_likelihood
+                log_likelihoods.append(log_likelihood)
+                self._maximize(expectations)
 
-                                alpha_t (i) beta_t (i))
-            gamma_t (i) = ------------------------------------
-                           sum_{j=1}^N alpha_t (j) beta_t (j)
+                if (len(log_likelihoods) > 1 and
+                        float(log_likelihood - log_likelihoods[-2]) < tol):
+                    break
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
 
-            sum_{i=1}^N gamma_t (i) = 1
+        return log_likelihoods
+
+    def sample(self, n_sequences, length, seed=None):
+        """
+        Draw sequences of hidden states and observations from the model.
+
+        All sequences are drawn at once: every time step samples states of
+        all sequences with a single search in cumulative transition table
+        (inverse CDF), emissions are sampled for blocks of time steps.
+
+        Arguments:
+            n_sequences (int): Number of sequences.
+            length (int): Length T of every sequence.
+            seed (int): Seed of random number generator (numpy.random
+                RandomState).
 
         Returns:
-            An array with logarithm gamma_t (i) elements.
+            Tuple (states, observations) with arrays of states indices and
+            symbols indices (n_sequences x T), rows of observations are
+            EncodedObservations passed to decode, score, fit etc.
+
+        Reises:
+            ValueError if model parameters are not set, n_sequences or
+            length is not positive.
 
         """
-        log_alpha = self._log_alpha
-        log_beta = self._log_beta
-        log_gamma = np.empty_like(log_alpha)
-        T = log_gamma.shape[0]
-        N = log_gamma.shape[1]
+        self._encoded_log_parameters_of([])
+        if n_sequences < 1 or length < 1:
+            raise ValueError('number and length of sequences must be '
+                             'positive')
+        N = len(self.states)
+        M = len(self.symbols)
 
-        for t in xrange(0, T):
-            normalizer = decimal.Decimal('NaN')
-            for i in xrange(0, N):
-                log_gamma[t, i] = self._elnproduct(
-                    log_alpha[t, i],
-                    log_beta[t, i])
-                normalizer = self._elnsum(normalizer,
-                                          log_gamma[t, i])
-            for i in xrange(0, N):
-                log_gamma[t, i] = self._elnproduct(
-                    log_gamma[t, i],
-                    -normalizer)
+        a = self.transition_matrix
+        if not isinstance(a, SparseTransitions):
+            a = SparseTransitions.from_dense(a)
+        a_table = _inverse_cdf_table(a.rows, a.cols, a.values, N)
+        pi_table = _inverse_cdf_table(np.zeros(N), np.arange(N),
+                                      self.initial_states, 1)
+        b = np.asarray(self.emission_matrix, dtype=np.float64)
+        b_table = _inverse_cdf_table(np.repeat(np.arange(N), M),
+                                     np.tile(np.arange(M), N), b.ravel(), N)
 
-        self._log_gamma = log_gamma
-        return log_gamma
+        rng = np.random.RandomState(seed)
+        states = np.empty((n_sequences, length),
+                          dtype=np.min_scalar_type(N - 1))
+        observations = np.empty((n_sequences, length),
+                                dtype=np.min_scalar_type(M - 1)).view(
+                                    EncodedObservations)
+        states[:, 0] = _inverse_cdf_sample(
+            pi_table, np.zeros(n_sequences, dtype=np.intp),
+            rng.random_sample(n_sequences))
+        for t in xrange(1, length):
+            states[:, t] = _inverse_cdf_sample(
+                a_table, states[:, t-1], rng.random_sample(n_sequences))
+        for start, end in self._time_chunks(length, n_sequences):
+            observations[:, start:end] = _inverse_cdf_sample(
+                b_table, states[:, start:end],
+                rng.random_sample((n_sequences, end - start)))
 
-    def _compute_logdelta(self):
+        return states, observations
+
+
+class ForwardFilter(object):
+    """
+    Forward filter over an unbounded stream of observations.
+
+    Only the current forward variable is kept, normalized to the filtered
+    distribution P(q_t = S_i|O_1, ..., O_t), and its normalizers are
+    accumulated into the log-likelihood, so memory is O(N) regardless of
+    stream length and logarithms do not grow with time.
+
+    Arguments:
+        model (GenericHMM): Model with parameters set. Parameters are taken
+            when filter is created.
+
+    Reises:
+        ValueError if model parameters are not set.
+
+    """
+    def __init__(self, model):
+        log_pi, log_a, _, _ = model._encoded_log_parameters_of([])
+        self.model = model
+        self._log_pi = log_pi
+        self._log_a = log_a
+        self._log_emission_matrix = model._log_emission_matrix
+        self._symbol_index = dict(
+            (symbol, k) for k, symbol in enumerate(model.symbols))
+        if model.engine == 'scaled':
+            self._a = model._exp_transitions(log_a)
+            self._emission_matrix = np.exp(self._log_emission_matrix)
+        self.reset()
+
+    def reset(self):
         """
-        Compute Viterbi's variable delta_t (i) in log space.
+        Forget all observations.
 
-            delta_t (i) = max_{q_{i<t}} P(q_1, ..., q_{t-1}, q_t = i, O|lambda)
+        """
+        _, logone, _, _ = self.model._numeric_primitives()
+        self.time = 0
+        self._log_likelihood = logone
+        self._log_filtered = None
 
-            delta_1 (i) = pi_i b_i (O_1)
-            delta_t+1 (j) = max_i (delta_{t-1} (i) a_ij) b_j (O_t)
+    @property
+    def log_likelihood(self):
+        """
+        Logarithm of likelihood of observations so far log P(O_1, ..., O_t).
+
+        """
+        return self._log_likelihood
+
+    @property
+    def log_filtered_states(self):
+        """
+        Logarithms of filtered distribution P(q_t = S_i|O_1, ..., O_t)
+        (array with N elements or None before first observation).
+
+        """
+        return self._log_filtered
+
+    @property
+    def filtered_states(self):
+        """
+        Filtered distribution P(q_t = S_i|O_1, ..., O_t) (array with N
+        elements or None before first observation).
+
+        """
+        if self._log_filtered is None:
+            return None
+        if self.model.numeric == 'float64':
+            return np.exp(self._log_filtered)
+        else:
+            return np.frompyfunc(self.model._eexp, 1, 1)(self._log_filtered)
+
+    @property
+    def log_alpha(self):
+        """
+        Logarithms of forward variable alpha_t (i) (array with N elements or
+        None before first observation).
+
+        """
+        if self._log_filtered is None:
+            return None
+        return self._log_filtered + self._log_likelihood
+
+    def update(self, observation):
+        """
+        Advance filter by one observed symbol.
 
+            alpha_{t+1} (j) = b_j (O_{t+1}) sum_{i=1}^N alpha_t (i) a_{ij}
+
+        Arguments:
+            observation: Observed symbol O_{t+1}.
+
+        Reises:
+            ValueError if observation is not a model symbol.
+
+        """
+        try:
+            k = self._symbol_index[observation]
+        except KeyError:
+            raise ValueError('unknown symbol: {0!r}'.format(observation))
+        model = self.model
+
+        if model.engine == 'scaled':
+            b = self._emission_matrix[:, k]
+            if self._log_filtered is None:
+                alpha = np.exp(self._log_pi) * b
+            else:
+                alpha = model._dot_predecessors(
+                    np.exp(self._log_filtered), self._a) * b
+            scale = alpha.sum()
+            if scale > 0:
+                alpha /= scale
+            with np.errstate(divide='ignore'):
+                self._log_filtered = np.log(alpha)
+                self._log_likelihood += np.log(scale)
+        else:
+            semiring = model._semiring('sum')
+            if self._log_filtered is None:
+                log_alpha = model._compute_lattice(
+                    semiring, self._log_pi, self._log_a,
+                    self._log_emission_matrix, indices=[k], lattice=False)
+            else:
+                log_alpha = model._compute_lattice(
+                    semiring, self._log_filtered, self._log_a,
+                    self._log_emission_matrix, indices=[k], lattice=False,
+                    resume=True)
+            log_normalizer = semiring.reduce(log_alpha, 0)
+            self._log_filtered = model._elnquotient(log_alpha, log_normalizer)
+            self._log_likelihood = self._log_likelihood + log_normalizer
+
+        self.time += 1
+
+    def extend(self, observations):
+        """
+        Advance filter by a chunk of observed symbols.
+
+        Arguments:
+            observations (sequence): Observed symbols.
+
+        Reises:
+            ValueError if observation is not a model symbol.
+
+        """
+        for observation in observations:
+            self.update(observation)
+
+
+class FixedLagSmoother(ForwardFilter):
+    """
+    Fixed-lag smoother over an unbounded stream of observations.
+
+    With every new observation O_t the smoothed distribution of time t - L
+
+        gamma_{t-L|t} (i) = P(q_{t-L} = S_i|O_1, ..., O_t)
+
+    is emitted. Filtered distributions and symbols of the last L + 1 time
+    steps are kept in ring buffers and the backward variable is swept over
+    this window only, so cost of an observation is O(L N^2) and memory is
+    O(L N) regardless of stream length.
+
+    Arguments:
+        model (GenericHMM): Model with parameters set.
+        lag (int): Lag L >= 0 (0 is filtering).
+
+    Reises:
+        ValueError if model parameters are not set or lag is negative.
+
+    """
+    def __init__(self, model, lag):
+        if lag < 0:
+            raise ValueError('lag cannot be negative')
+        self.lag = lag
+        super(FixedLagSmoother, self).__init__(model)
+
+    def reset(self):
+        """
+        Forget all observations.
+
+        """
+        super(FixedLagSmoother, self).reset()
+        N = len(self._log_pi)
+        self._ring_log_filtered = np.empty((self.lag + 1, N),
+                                           dtype=self.model._dtype)
+        self._ring_indices = np.empty(self.lag + 1, dtype=np.intp)
+
+    def update(self, observation):
+        """
+        Advance smoother by one observed symbol.
+
+        Arguments:
+            observation: Observed symbol O_t.
 
         Returns:
-            An array with logarithm delta_t (i) elements.
+            Logarithms of smoothed distribution gamma_{t-L|t} (array with N
+            elements) or None if fewer than L + 1 symbols were observed.
+
+        Reises:
+            ValueError if observation is not a model symbol.
+
+        """
+        super(FixedLagSmoother, self).update(observation)
+        slot = (self.time - 1) % (self.lag + 1)
+        self._ring_log_filtered[slot] = self._log_filtered
+        self._ring_indices[slot] = self._symbol_index[observation]
+        if self.time <= self.lag:
+            return None
+        return self._smooth(self.time - 1 - self.lag)
 
+    def extend(self, observations):
         """
-        initial_states = self.initial_states
-        emission_matrix = self.emission_matrix
-        transition_matrix = self.transition_matrix
-        log_delta = np.empty_like(emission_matrix)
-        T = log_delta.shape[0]
-        N = log_delta.shape[1]
+        Advance smoother by a chunk of observed symbols.
 
-        for i in xrange(0, N):
-            log_delta[0, i] = self._elnproduct(
-                self._eln(initial_states[i]),
-                self._eln(emission_matrix[0, i]))
+        Arguments:
+            observations (sequence): Observed symbols.
 
-        for t in xrange(1, T):
-            for j in xrange(0, N):
-                max_sum = decimal.Decimal('-Inf')
-                for i in xrange(0, N):
-                    max_sum = max(
-                        max_sum,
-                        self._elnproduct(
-                            log_delta[t-1, i],
-                            self._eln(transition_matrix[i, j])))
-                log_delta[t, j] = self._elnproduct(
-                    max_sum,
-                    self._eln(emission_matrix[t, j]))
+        Returns:
+            List with logarithms of smoothed distributions emitted by the
+            chunk.
 
-        return log_delta
+        Reises:
+            ValueError if observation is not a model symbol.
 
-    def _compute_logeta(self):
         """
-        Compute eta_t (i, j) variable in log space.
+        results = [self.update(observation) for observation in observations]
+        return [x for x in results if x is not None]
 
-            eta_t (i, j) = P(q_t = S_i, q_{t+1} = S_j|O, lambda)
+    def flush(self):
+        """
+        Smooth time steps not emitted yet with observations so far (e.g. at
+        the end of stream).
 
-                        alpha_t (i) a_{ij} b_j (O_{t+1}) beta_{t+1} (j)
-              = ---------------------------------------------------------------
-                 sum_{i,j=1}^N alpha_t (i) a_{ij} b_j (O_{t+1}) beta_{t+1} (j)
+        Returns:
+            List with logarithms of smoothed distributions of the last
+            min(L, t) time steps.
 
-            gamma_t (i) = sum_{j=1}^N eta_t (i, j)
+        """
+        start = max(self.time - self.lag, 0)
+        return [self._smooth(s) for s in xrange(start, self.time)]
+
+    def _smooth(self, s):
+        """
+        Compute smoothed distribution of time s with observations so far.
+
+            beta_{t|t} (i) = 1
+            beta_{u|t} (i) = sum_{j=1}^N a_{ij} b_j (O_{u+1}) beta_{u+1|t} (j)
+            gamma_{s|t} (i) ~ alpha_s (i) beta_{s|t} (i)
+
+        Backward variable is normalized at every step, only its direction
+        matters.
+
+        Arguments:
+            s (int): Time index (0-based) within the last L + 1 steps.
 
         Returns:
-            An array with logarithm eta_t (i, j) elements.
+            Logarithms of smoothed distribution (N).
 
         """
-        transition_matrix = self.transition_matrix
-        emission_matrix = self.emission_matrix
-        log_alpha = self._log_alpha
-        log_beta = self._log_beta
-        T = log_alpha.shape[0]
-        N = log_alpha.shape[1]
-        log_eta = np.zeros((T, N, N), dtype=object)
+        model = self.model
+        size = self.lag + 1
+        _, logone, _, _ = model._numeric_primitives()
+        elnsum_reduce = model._elnsum_reducer()
+        N = len(self._log_pi)
 
-        for t in xrange(0, T-1):
-            normalizer = decimal.Decimal('NaN')
-            for i in xrange(0, N):
-                for j in xrange(0, N):
-                    log_eta[t, i, j] = self._elnproduct(
-                        log_alpha[t, i],
-                        self._elnproduct(
-                            self._eln(transition_matrix[i, j]),
-                            self._elnproduct(
-                                self._eln(emission_matrix[t+1, j]),
-                                log_beta[t+1, j])))
-                    normalizer = self._elnsum(normalizer,
-                                              log_eta[t, i, j])
-            for i in xrange(0, N):
-                for j in xrange(0, N):
-                    log_eta[t, i, j] = self._elnproduct(
-                        log_eta[t, i, j],
-                        -normalizer)
+        if model.engine == 'scaled':
+            beta = np.ones(N)
+            for u in xrange(self.time - 2, s - 1, -1):
+                k = self._ring_indices[(u + 1) % size]
+                beta = model._dot_successors(
+                    self._a, self._emission_matrix[:, k] * beta)
+                scale = beta.sum()
+                if scale > 0:
+                    beta /= scale
+            gamma = np.exp(self._ring_log_filtered[s % size]) * beta
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return np.log(gamma / gamma.sum())
 
-        self._log_eta = log_eta
-        return log_eta
+        log_beta = np.empty(N, dtype=model._dtype)
+        log_beta.fill(logone)
+        for u in xrange(self.time - 2, s - 1, -1):
+            k = self._ring_indices[(u + 1) % size]
+            log_beta = model._elnsum_successors(
+                self._log_a, self._log_emission_matrix[:, k] + log_beta)
+            log_beta = model._elnquotient(log_beta,
+                                          elnsum_reduce(log_beta, 0))
+        log_gamma = self._ring_log_filtered[s % size] + log_beta
+        return model._elnquotient(log_gamma, elnsum_reduce(log_gamma, 0))
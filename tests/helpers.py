@@ -13,9 +13,12 @@ from himamo import GenericHMM
 
 
 class BaseTestCase(unittest.TestCase):
+    seed = 0
+
     @classmethod
     def setUpClass(cls):
         cls.model = GenericHMM([1], ['a'])
+        cls.float_model = GenericHMM([1], ['a'], numeric='float64')
         cls.num_precision = getcontext().prec
 
     @classmethod
@@ -27,3 +30,27 @@ class BaseTestCase(unittest.TestCase):
         emission_matrix = np.array([[log_b_val]*T]*N, dtype=object)
 
         return initial_states, transition_matrix, emission_matrix
+
+    @classmethod
+    def _as_numeric(cls, arr, numeric):
+        if numeric == 'decimal':
+            return np.vectorize(lambda x: d(repr(x)), otypes=[object])(arr)
+        return arr
+
+    @classmethod
+    def _model_of(cls, pi, a, b, numeric='float64', **kwargs):
+        N, M = b.shape
+        model = GenericHMM(range(N), list('abcdefgh'[:M]), numeric=numeric,
+                           **kwargs)
+        model.initial_states = cls._as_numeric(pi / pi.sum(), numeric)
+        model.transition_matrix = cls._as_numeric(
+            a / a.sum(1)[:, np.newaxis], numeric)
+        model.emission_matrix = cls._as_numeric(
+            b / b.sum(1)[:, np.newaxis], numeric)
+        return model
+
+    @classmethod
+    def _random_model(cls, N, M, numeric='float64', **kwargs):
+        rng = np.random.RandomState(cls.seed)
+        return cls._model_of(rng.rand(N), rng.rand(N, N), rng.rand(N, M),
+                             numeric=numeric, **kwargs)
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for FixedLagSmoother class.
+
+"""
+
+from tests.unit.FixedLagSmoother.test_fixed_lag_smoother import FixedLagSmootherTestCase
+
+__all__ = ['FixedLagSmootherTestCase']
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for fixed-lag smoother.
+
+"""
+
+import numpy as np
+
+from himamo import FixedLagSmoother
+from tests.helpers import BaseTestCase
+
+
+class FixedLagSmootherTestCase(BaseTestCase):
+    seed = 8
+
+    @classmethod
+    def _loggamma(cls, model, observations):
+        log_pi, log_a, log_b = model._log_parameters_of(observations)
+        log_alpha = model._compute_logalpha(log_pi, log_a, log_b)
+        log_beta = model._compute_logbeta(log_a, log_b)
+        return model._compute_loggamma(log_alpha, log_beta)
+
+    def _assert_matches_loggamma(self, model, observations, lag):
+        smoother = FixedLagSmoother(model, lag)
+        for t, observation in enumerate(observations):
+            result = smoother.update(observation)
+            if t < lag:
+                self.assertIsNone(result)
+                continue
+            expected_result = self._loggamma(model, observations[:t+1])
+            np.testing.assert_allclose(
+                result.astype(np.float64),
+                expected_result[:, t-lag].astype(np.float64),
+                rtol=1e-9, atol=1e-12)
+
+    def test_negative_lag(self):
+        with self.assertRaises(ValueError):
+            FixedLagSmoother(self._random_model(2, 2), -1)
+
+    def test_zero_lag_is_filtering(self):
+        model = self._random_model(3, 2)
+        smoother = FixedLagSmoother(model, 0)
+        for observation in 'abba':
+            result = smoother.update(observation)
+            np.testing.assert_allclose(result, smoother.log_filtered_states)
+
+    def test_float64_matches_loggamma(self):
+        self._assert_matches_loggamma(
+            self._random_model(3, 3), 'abcbbacabca', 3)
+
+    def test_scaled_engine_matches_loggamma(self):
+        self._assert_matches_loggamma(
+            self._random_model(3, 3, engine='scaled'), 'abcbbacabca', 2)
+
+    def test_decimal_matches_loggamma(self):
+        self._assert_matches_loggamma(
+            self._random_model(2, 3, numeric='decimal'), 'abcbba', 2)
+
+    def test_extend_and_flush(self):
+        model = self._random_model(3, 2)
+        observations = 'abbabab'
+        smoother = FixedLagSmoother(model, 2)
+        results = smoother.extend(observations[:4])
+        results += smoother.extend(observations[4:])
+        self.assertEqual(len(results), 5)
+        np.testing.assert_allclose(
+            results[-1], self._loggamma(model, observations)[:, 4],
+            rtol=1e-9, atol=1e-12)
+        np.testing.assert_allclose(
+            np.array(smoother.flush()).T,
+            self._loggamma(model, observations)[:, 5:],
+            rtol=1e-9, atol=1e-12)
+
+    def test_flush_short_stream(self):
+        model = self._random_model(3, 2)
+        smoother = FixedLagSmoother(model, 5)
+        self.assertEqual(smoother.extend('ab'), [])
+        np.testing.assert_allclose(
+            np.array(smoother.flush()).T, self._loggamma(model, 'ab'),
+            rtol=1e-9, atol=1e-12)
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for ForwardFilter class.
+
+"""
+
+from tests.unit.ForwardFilter.test_forward_filter import ForwardFilterTestCase
+
+__all__ = ['ForwardFilterTestCase']
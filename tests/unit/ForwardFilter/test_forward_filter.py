@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for streaming forward filter.
+
+"""
+
+import numpy as np
+
+from himamo import ForwardFilter, GenericHMM
+from tests.helpers import BaseTestCase
+
+
+class ForwardFilterTestCase(BaseTestCase):
+    seed = 7
+
+    def _assert_matches_logalpha(self, model, observations):
+        forward_filter = ForwardFilter(model)
+        log_alpha = model._compute_logalpha(
+            *model._log_parameters_of(observations))
+        for t, observation in enumerate(observations):
+            forward_filter.update(observation)
+            np.testing.assert_allclose(
+                forward_filter.log_alpha.astype(np.float64),
+                log_alpha[:, t].astype(np.float64), rtol=1e-10)
+        np.testing.assert_allclose(
+            float(forward_filter.log_likelihood),
+            float(model._elnsum_reducer()(log_alpha[:, -1], 0)), rtol=1e-10)
+        np.testing.assert_almost_equal(
+            float(sum(forward_filter.filtered_states)), 1.)
+        self.assertEqual(forward_filter.time, len(observations))
+
+    def test_parameters_not_set(self):
+        with self.assertRaises(ValueError):
+            ForwardFilter(GenericHMM([1, 2], ['a']))
+
+    def test_unknown_symbol(self):
+        forward_filter = ForwardFilter(self._random_model(2, 2))
+        with self.assertRaises(ValueError):
+            forward_filter.update('z')
+
+    def test_before_first_observation(self):
+        forward_filter = ForwardFilter(self._random_model(2, 2))
+        self.assertEqual(forward_filter.log_likelihood, 0.)
+        self.assertIsNone(forward_filter.log_alpha)
+        self.assertIsNone(forward_filter.filtered_states)
+
+    def test_float64_matches_logalpha(self):
+        self._assert_matches_logalpha(self._random_model(3, 3), 'abcbbacab')
+
+    def test_scaled_engine_matches_logalpha(self):
+        self._assert_matches_logalpha(
+            self._random_model(3, 3, engine='scaled'), 'abcbbacab')
+
+    def test_decimal_matches_logalpha(self):
+        self._assert_matches_logalpha(
+            self._random_model(3, 3, numeric='decimal'), 'abcbbac')
+
+    def test_chunks_match_single_updates(self):
+        model = self._random_model(3, 2)
+        forward_filter = ForwardFilter(model)
+        forward_filter.extend('abb')
+        forward_filter.extend('ba')
+        expected_filter = ForwardFilter(model)
+        for observation in 'abbba':
+            expected_filter.update(observation)
+        np.testing.assert_array_equal(forward_filter.log_filtered_states,
+                                      expected_filter.log_filtered_states)
+        self.assertEqual(forward_filter.log_likelihood,
+                         expected_filter.log_likelihood)
+
+    def test_long_stream_stays_normalized(self):
+        forward_filter = ForwardFilter(self._random_model(3, 2))
+        forward_filter.extend('ab' * 5000)
+        self.assertTrue(np.all(np.isfinite(forward_filter.log_alpha)))
+        np.testing.assert_almost_equal(forward_filter.filtered_states.sum(),
+                                       1.)
+
+    def test_reset(self):
+        forward_filter = ForwardFilter(self._random_model(2, 2))
+        forward_filter.extend('abab')
+        forward_filter.reset()
+        self.assertEqual(forward_filter.time, 0)
+        self.assertIsNone(forward_filter.log_filtered_states)
@@ -8,6 +8,8 @@ from tests.unit.GenericHMM.test_eexp import ExtendedExpTestCase
 from tests.unit.GenericHMM.test_eln import ExtendedLogTestCase
 from tests.unit.GenericHMM.test_elnsum import ExtendedLogSumTestCase
 from tests.unit.GenericHMM.test_elnproduct import ExtendedLogProductTestCase
+from tests.unit.GenericHMM.test_numeric import NumericBackendTestCase
+from tests.unit.GenericHMM.test_encode import EncodeTestCase
 
 from tests.unit.GenericHMM.test_initial_states import InitialStatesPropertyTestCase
 from tests.unit.GenericHMM.test_transition_matrix import TransitionMatrixPropertyTestCase
@@ -18,6 +20,24 @@ from tests.unit.GenericHMM.test_compute_logbeta import ComputeLogBetaTestCase
 from tests.unit.GenericHMM.test_compute_loggamma import ComputeLogGammaTestCase
 from tests.unit.GenericHMM.test_compute_logdelta import ComputeLogDeltaTestCase
 from tests.unit.GenericHMM.test_compute_logeta import ComputeLogEtaTestCase
+from tests.unit.GenericHMM.test_semiring import SemiringTestCase
+from tests.unit.GenericHMM.test_compute_batch import ComputeBatchTestCase
+from tests.unit.GenericHMM.test_checkpoint import CheckpointTestCase
+from tests.unit.GenericHMM.test_lattice_storage import LatticeStorageTestCase
+from tests.unit.GenericHMM.test_time_parallel import TimeParallelTestCase
+from tests.unit.GenericHMM.test_compute_expectations import ComputeExpectationsTestCase
+from tests.unit.GenericHMM.test_score import ScoreTestCase
+from tests.unit.GenericHMM.test_score_many import ScoreManyTestCase
+from tests.unit.GenericHMM.test_decode import DecodeTestCase
+from tests.unit.GenericHMM.test_beam import BeamTestCase
+from tests.unit.GenericHMM.test_nbest_decode import NBestDecodeTestCase
+from tests.unit.GenericHMM.test_posterior_decode import PosteriorDecodeTestCase
+from tests.unit.GenericHMM.test_sample import SampleTestCase
+from tests.unit.GenericHMM.test_scaled_engine import ScaledEngineTestCase
+from tests.unit.GenericHMM.test_fit import FitTestCase
+from tests.unit.GenericHMM.test_fit_sequences import FitSequencesTestCase
+from tests.unit.GenericHMM.test_sparse_transitions import SparseTransitionsTestCase
+from tests.unit.GenericHMM.test_topology import TopologyTestCase
 
 from tests.unit.GenericHMM.test_recompute_log_initial_states import RecomputeLogInitialStatesTestCase
 from tests.unit.GenericHMM.test_recompute_log_transitions import RecomputeLogTransitionsTestCase
@@ -25,10 +45,21 @@ from tests.unit.GenericHMM.test_recompute_log_emissions import RecomputeLogEmiss
 
 __all__ = ['ExtendedExpTestCase', 'ExtendedLogTestCase',
            'ExtendedLogSumTestCase', 'ExtendedLogProductTestCase',
+           'NumericBackendTestCase', 'EncodeTestCase',
            'InitialStatesPropertyTestCase', 'TransitionMatrixPropertyTestCase',
            'EmissionMatrixPropertyTestCase', 'ComputeLogAlphaTestCase',
            'ComputeLogBetaTestCase', 'ComputeLogGammaTestCase',
            'ComputeLogDeltaTestCase', 'ComputeLogEtaTestCase',
+           'SemiringTestCase', 'ComputeBatchTestCase', 'CheckpointTestCase',
+           'LatticeStorageTestCase', 'TimeParallelTestCase',
+           'ComputeExpectationsTestCase',
+           'ScoreTestCase', 'ScoreManyTestCase', 'DecodeTestCase',
+           'BeamTestCase', 'NBestDecodeTestCase', 'PosteriorDecodeTestCase',
+           'SampleTestCase',
+           'ScaledEngineTestCase',
+           'FitTestCase',
+           'FitSequencesTestCase', 'SparseTransitionsTestCase',
+           'TopologyTestCase',
            'RecomputeLogInitialStatesTestCase',
            'RecomputeLogTransitionsTestCase',
            'RecomputeLogEmissionsTestCase']
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for beam-pruned recursions.
+
+"""
+import numpy as np
+
+from himamo import BandedTransitions, GenericHMM, SparseTransitions
+from tests.helpers import BaseTestCase
+
+
+class BeamTestCase(BaseTestCase):
+    seed = 13
+    observations = 'abcabbcacbab'
+
+    @classmethod
+    def _peaked_model(cls, N):
+        """
+        Create a model whose states emit their own symbol almost surely and
+        mostly stay in the same state.
+
+        """
+        model = GenericHMM(range(N), range(N), numeric='float64')
+        model.initial_states = np.ones(N) / N
+        model.transition_matrix = (np.eye(N) * .9 +
+                                   np.ones((N, N)) * .1 / N)
+        model.emission_matrix = np.eye(N) * .97 + np.ones((N, N)) * .03 / N
+        return model
+
+    def test_wide_beam_is_exact(self):
+        for engine in ('log', 'scaled'):
+            model = self._random_model(5, 3, engine=engine)
+            path, log_probability = model.decode(self.observations)
+            beam_path, beam_log_probability = model.decode(
+                self.observations, beam=1e3)
+            np.testing.assert_array_equal(beam_path, path)
+            self.assertAlmostEqual(beam_log_probability, log_probability)
+            self.assertAlmostEqual(
+                model.score(self.observations, beam=1e3),
+                model.score(self.observations))
+            np.testing.assert_array_equal(model.log_pruned, -np.inf)
+
+    def test_all_states_kept(self):
+        model = self._random_model(5, 3)
+        log_pi, log_a, log_b = model._log_parameters_of(self.observations)
+        np.testing.assert_allclose(
+            model._compute_logdelta(log_pi, log_a, log_b, max_states=5),
+            model._compute_logdelta(log_pi, log_a, log_b))
+        np.testing.assert_allclose(
+            model._compute_logalpha(log_pi, log_a, log_b, max_states=5),
+            model._compute_logalpha(log_pi, log_a, log_b))
+
+    def test_max_states(self):
+        model = self._peaked_model(20)
+        observations = np.repeat([3, 7, 1, 15, 15, 2], 4)
+        path, log_probability = model.decode(observations)
+        beam_path, beam_log_probability = model.decode(observations,
+                                                       max_states=3)
+        np.testing.assert_array_equal(beam_path, path)
+        self.assertAlmostEqual(beam_log_probability, log_probability)
+        self.assertEqual(model.log_pruned.shape, (len(observations),))
+        self.assertTrue(np.all(model.log_pruned < 0))
+
+        log_pi, log_a, log_b = model._log_parameters_of(observations)
+        log_delta = model._compute_logdelta(log_pi, log_a, log_b,
+                                            max_states=3)
+        self.assertTrue(np.all(np.isfinite(log_delta).sum(0) <= 3))
+
+    def test_pruned_mass(self):
+        model = self._peaked_model(10)
+        observations = np.array([1, 1, 4, 4, 4, 9])
+        exact = model.score(observations)
+        score = model.score(observations, beam=2.)
+        self.assertLessEqual(score, exact)
+        self.assertGreater(score, exact - 1.)
+        self.assertTrue(np.any(np.isfinite(model.log_pruned)))
+        self.assertTrue(np.all(model.log_pruned < 0))
+
+        log_pi, log_a, log_b = model._log_parameters_of(observations)
+        log_alpha = model._compute_logalpha(log_pi, log_a, log_b, beam=2.)
+        for t in xrange(len(observations)):
+            finite = log_alpha[np.isfinite(log_alpha[:, t]), t]
+            self.assertLessEqual(finite.max() - finite.min(), 2.)
+
+    def test_sparse_transitions(self):
+        model = self._peaked_model(8)
+        observations = np.array([0, 0, 3, 3, 5, 5, 5])
+        expected = model.decode(observations, max_states=2)
+        model.transition_matrix = SparseTransitions.from_dense(
+            model.transition_matrix)
+        path, log_probability = model.decode(observations, max_states=2)
+        np.testing.assert_array_equal(path, expected[0])
+        self.assertAlmostEqual(log_probability, expected[1])
+        self.assertAlmostEqual(model.score(observations, max_states=8),
+                               model.score(observations))
+
+    def test_banded_transitions(self):
+        model = self._peaked_model(8)
+        a = np.triu(np.tril(model.transition_matrix, 1), -1)
+        model.transition_matrix = a / a.sum(1)[:, np.newaxis]
+        observations = np.array([0, 1, 1, 2, 3, 3, 4])
+        expected = model.decode(observations, max_states=2)
+        model.transition_matrix = BandedTransitions.from_dense(
+            model.transition_matrix)
+        path, log_probability = model.decode(observations, max_states=2)
+        np.testing.assert_array_equal(path, expected[0])
+        self.assertAlmostEqual(log_probability, expected[1])
+
+    def test_of_sources(self):
+        matrix = np.array([[.5, .5, 0., 0.], [0., .5, .5, 0.],
+                           [0., 0., .5, .5], [.5, 0., 0., .5]])
+        for transitions in (SparseTransitions.from_dense(matrix),
+                            BandedTransitions.from_dense(matrix)):
+            selected = transitions.of_sources(np.array([1, 3]))
+            self.assertEqual(selected.nnz, 4)
+            expected = matrix.copy()
+            expected[[0, 2]] = 0.
+            np.testing.assert_array_equal(selected.todense(), expected)
+
+    def test_decimal_numeric(self):
+        model = self._random_model(3, 3, numeric='decimal')
+        with self.assertRaises(ValueError):
+            model.decode(self.observations, beam=10.)
+        with self.assertRaises(ValueError):
+            model.score(self.observations, max_states=2)
+
+    def test_invalid_max_states(self):
+        model = self._random_model(3, 3)
+        with self.assertRaises(ValueError):
+            model.decode(self.observations, max_states=0)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for checkpointed forward-backward.
+
+"""
+import mock
+import numpy as np
+
+from tests.helpers import BaseTestCase
+
+
+class CheckpointTestCase(BaseTestCase):
+    seed = 9
+
+    def test_checkpoints(self):
+        model = self._random_model(3, 3)
+        log_pi, log_a, log_b = model._log_parameters_of('abcabcabcab')
+        checkpoints, step, log_likelihood = \
+            model._compute_logalpha_checkpoints(log_pi, log_a, log_b)
+        log_alpha = model._compute_logalpha(log_pi, log_a, log_b)
+        self.assertEqual(step, 4)
+        np.testing.assert_allclose(checkpoints, log_alpha[:, ::4])
+        self.assertAlmostEqual(log_likelihood,
+                               np.logaddexp.reduce(log_alpha[:, -1]))
+
+    def test_reversed_logalpha(self):
+        model = self._random_model(3, 3)
+        log_pi, log_a, log_b = model._log_parameters_of('abcabcabcab')
+        checkpoints, step, _ = model._compute_logalpha_checkpoints(
+            log_pi, log_a, log_b)
+        log_alpha = model._compute_logalpha(log_pi, log_a, log_b)
+        times = []
+        for t, result in model._iter_reversed_logalpha(
+                checkpoints, step, log_a, log_b):
+            times.append(t)
+            np.testing.assert_allclose(result, log_alpha[:, t])
+        self.assertEqual(times, range(10, -1, -1))
+
+    def test_loggamma_matches_full_lattices(self):
+        for T in (1, 2, 9, 17):
+            model = self._random_model(3, 3)
+            observations = ('abcbca' * 3)[:T]
+            log_pi, log_a, log_b = model._log_parameters_of(observations)
+            result = model._compute_checkpointed_loggamma(
+                log_pi, log_a, log_b)
+            expected_result = model._compute_loggamma(
+                model._compute_logalpha(log_pi, log_a, log_b),
+                model._compute_logbeta(log_a, log_b))
+            np.testing.assert_allclose(result, expected_result, atol=1e-12)
+
+    def test_expectations_match_full_lattices(self):
+        for numeric in ('float64', 'decimal'):
+            model = self._random_model(2, 3, numeric=numeric)
+            observations = 'abccbabca'
+            log_parameters = model._log_parameters_of(observations)
+            result = model._compute_expectations(
+                *(log_parameters + (observations,)), checkpoint=True)
+            expected_result = model._compute_expectations(
+                *(log_parameters + (observations,)))
+            for name in expected_result._fields:
+                np.testing.assert_allclose(
+                    np.asarray(getattr(result, name), dtype=np.float64),
+                    np.asarray(getattr(expected_result, name),
+                               dtype=np.float64), rtol=1e-10)
+
+    def test_gathered_emissions(self):
+        for numeric in ('float64', 'decimal'):
+            model = self._random_model(3, 3, numeric=numeric)
+            observations = 'abccbabcaab'
+            log_pi, log_a, log_b = model._log_parameters_of(observations)
+            _, _, log_emission_matrix, indices = \
+                model._encoded_log_parameters_of(observations)
+            np.testing.assert_array_equal(
+                model._compute_checkpointed_loggamma(
+                    log_pi, log_a, log_emission_matrix, indices=indices),
+                model._compute_checkpointed_loggamma(log_pi, log_a, log_b))
+            result = model._compute_expectations(
+                log_pi, log_a, log_emission_matrix, observations,
+                checkpoint=True, gather=True)
+            expected_result = model._compute_expectations(
+                log_pi, log_a, log_b, observations, checkpoint=True)
+            for name in expected_result._fields:
+                np.testing.assert_array_equal(getattr(result, name),
+                                              getattr(expected_result, name))
+
+    def test_fit_gathers_emissions(self):
+        model = self._random_model(3, 3)
+        with mock.patch.object(model, '_log_parameters_of',
+                               side_effect=AssertionError):
+            model.fit('abcabbbacccaabca', max_iter=2, checkpoint=True)
+
+    def test_fit(self):
+        results = []
+        for checkpoint in (False, True):
+            model = self._random_model(3, 3, engine='scaled')
+            results.append(model.fit('abcabbbacccaabca', max_iter=5, tol=0,
+                                     checkpoint=checkpoint))
+            results.append(model.emission_matrix)
+        np.testing.assert_allclose(results[2], results[0])
+        np.testing.assert_allclose(results[3], results[1])
+
+        model = self._random_model(3, 3)
+        result = model.fit_sequences(['abca', 'cab'], max_iter=2,
+                                     processes=1, checkpoint=True)
+        self.assertEqual(len(result), 2)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for batched forward and backward variables.
+
+"""
+import numpy as np
+
+from tests.helpers import BaseTestCase
+
+
+class ComputeBatchTestCase(BaseTestCase):
+    seed = 6
+    sequences = ['abcab', 'c', 'bbacabca', 'ab', 'cab']
+
+    def _assert_matches_sequences(self, model, rtol=1e-10):
+        log_pi, log_a, log_b, lengths = model._batch_log_parameters_of(
+            self.sequences)
+        log_alpha, log_likelihoods = model._compute_batch_logalpha(
+            log_pi, log_a, log_b, lengths)
+        log_beta = model._compute_batch_logbeta(log_a, log_b, lengths)
+
+        self.assertEqual(log_alpha.shape, (5, 8, 3))
+        for k, observations in enumerate(self.sequences):
+            T = len(observations)
+            log_b_k = model._log_parameters_of(observations)[2]
+            expected_alpha = model._compute_logalpha(log_pi, log_a, log_b_k)
+            expected_beta = model._compute_logbeta(log_a, log_b_k)
+            np.testing.assert_allclose(
+                log_alpha[k, :T].astype(np.float64),
+                expected_alpha.T.astype(np.float64), rtol=rtol)
+            np.testing.assert_allclose(
+                log_beta[k, :T].astype(np.float64),
+                expected_beta.T.astype(np.float64), rtol=rtol, atol=1e-12)
+            np.testing.assert_allclose(
+                float(log_likelihoods[k]),
+                float(model._elnsum_reducer()(expected_alpha[:, -1], 0)),
+                rtol=rtol)
+        return log_alpha, log_beta
+
+    def test_empty_sequences(self):
+        model = self._random_model(3, 3)
+        with self.assertRaises(ValueError):
+            model._batch_log_parameters_of([])
+        with self.assertRaises(ValueError):
+            model._batch_log_parameters_of(['ab', ''])
+
+    def test_none_lengths(self):
+        model = self._random_model(3, 3)
+        log_pi, log_a, log_b, _ = model._batch_log_parameters_of(['ab'])
+        with self.assertRaises(TypeError):
+            model._compute_batch_logalpha(log_pi, log_a, log_b, None)
+
+    def test_invalid_lengths(self):
+        model = self._random_model(3, 3)
+        log_pi, log_a, log_b, _ = model._batch_log_parameters_of(['ab', 'a'])
+        with self.assertRaises(ValueError):
+            model._compute_batch_logalpha(log_pi, log_a, log_b, [2])
+        with self.assertRaises(ValueError):
+            model._compute_batch_logbeta(log_a, log_b, [3, 1])
+
+    def test_mismatch_size_model_parameters(self):
+        model = self._random_model(3, 3)
+        log_pi, log_a, log_b, lengths = model._batch_log_parameters_of(['ab'])
+        with self.assertRaises(ValueError):
+            model._compute_batch_logalpha(log_pi[:2], log_a, log_b, lengths)
+        with self.assertRaises(ValueError):
+            model._compute_batch_logbeta(log_a[:2, :2], log_b, lengths)
+
+    def test_float64_matches_sequences(self):
+        log_alpha, log_beta = self._assert_matches_sequences(
+            self._random_model(3, 3))
+        self.assertTrue(np.all(np.isneginf(log_alpha[1, 1:])))
+        self.assertTrue(np.all(np.isneginf(log_beta[3, 2:])))
+
+    def test_scaled_engine_matches_sequences(self):
+        self._assert_matches_sequences(
+            self._random_model(3, 3, engine='scaled'))
+
+    def test_decimal_matches_sequences(self):
+        log_alpha, _ = self._assert_matches_sequences(
+            self._random_model(3, 3, numeric='decimal'))
+        self.assertTrue(all(x.is_nan() for x in log_alpha[1, 1:].flat))
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for compute expectations.
+
+"""
+from decimal import Decimal as d
+
+import numpy as np
+
+from himamo import GenericHMM
+from tests.helpers import BaseTestCase
+
+
+class ComputeExpectationsTestCase(BaseTestCase):
+    @classmethod
+    def _random_log_parameters(cls, N, T):
+        rng = np.random.RandomState(1)
+        pi = rng.rand(N)
+        a = rng.rand(N, N)
+        b = rng.rand(N, T)
+        return np.log(pi / pi.sum()), np.log(a / a.sum(1)[:, None]), np.log(b)
+
+    @classmethod
+    def _expected_counts(cls, model, log_pi, log_a, log_b, observations):
+        log_alpha = model._compute_logalpha(log_pi, log_a, log_b)
+        log_beta = model._compute_logbeta(log_a, log_b)
+        gamma = np.exp(model._compute_loggamma(log_alpha, log_beta))
+        eta = np.exp(model._compute_logeta(log_a, log_b, log_alpha, log_beta))
+        emissions = np.zeros((gamma.shape[0], len(model.symbols)))
+        for t, o in enumerate(observations):
+            emissions[:, model.symbols.index(o)] += gamma[:, t]
+        return gamma[:, 0], eta[:, :, :-1].sum(2), emissions
+
+    def test_none_observations(self):
+        log_pi, log_a, log_b = self._testing_parameters_generator(2, 3)
+        with self.assertRaises(TypeError):
+            self.model._compute_expectations(log_pi, log_a, log_b, None)
+
+    def test_unknown_symbol(self):
+        log_pi, log_a, log_b = self._testing_parameters_generator(2, 3)
+        with self.assertRaises(ValueError):
+            self.model._compute_expectations(log_pi, log_a, log_b, 'aab')
+
+    def test_mismatch_size_emission_matrix_and_observations(self):
+        log_pi, log_a, log_b = self._testing_parameters_generator(2, 3)
+        with self.assertRaises(ValueError):
+            self.model._compute_expectations(log_pi, log_a, log_b, 'aaaa')
+
+    def test_small_model_ones(self):
+        log_pi, log_a, log_b = self._testing_parameters_generator(2, 3)
+        result = self.model._compute_expectations(log_pi, log_a, log_b, 'aaa')
+        self.assertEqual(result.log_likelihood, d(8).ln())
+        np.testing.assert_almost_equal(
+            result.log_transitions.astype(np.float64),
+            np.log([[0.5, 0.5], [0.5, 0.5]]))
+        np.testing.assert_almost_equal(
+            result.log_emissions.astype(np.float64), np.log([[1.5], [1.5]]))
+        np.testing.assert_almost_equal(
+            result.log_gamma_sum.astype(np.float64), np.log([1.5, 1.5]))
+
+    def test_float64_matches_full_lattices(self):
+        model = GenericHMM([1, 2, 3], ['a', 'b'], numeric='float64')
+        observations = 'abbab'
+        log_pi, log_a, log_b = self._random_log_parameters(3, 5)
+
+        result = model._compute_expectations(
+            log_pi, log_a, log_b, observations)
+
+        initial, transitions, emissions = self._expected_counts(
+            model, log_pi, log_a, log_b, observations)
+        np.testing.assert_allclose(np.exp(result.log_initial_states), initial)
+        np.testing.assert_allclose(np.exp(result.log_transitions), transitions)
+        np.testing.assert_allclose(np.exp(result.log_emissions), emissions)
+        np.testing.assert_allclose(np.exp(result.log_gamma_sum),
+                                   emissions.sum(1))
+        np.testing.assert_allclose(result.log_likelihood,
+                                   np.logaddexp.reduce(model._log_alpha[:, -1]))
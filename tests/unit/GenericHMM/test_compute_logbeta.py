@@ -93,6 +93,22 @@ class ComputeLogBetaTestCase(BaseTestCase):
         expected_result = self._expected_beta(3, 1, d(1))
         np.testing.assert_array_equal(result, expected_result)
 
+    def test_small_model_large_time_ones(self):
+        log_pi, log_a, log_b = self._testing_parameters_generator(
+            3, 1000, 0., 0., 0.)
+        result = self.float_model._compute_logbeta(log_a, log_b)
+        expected_result = self._expected_beta(3, 1000, d(1))
+        np.testing.assert_allclose(
+            result, expected_result.astype(np.float64), rtol=1e-12)
+
+    def test_large_model_ones(self):
+        log_pi, log_a, log_b = self._testing_parameters_generator(
+            50, 3, 0., 0., 0.)
+        result = self.float_model._compute_logbeta(log_a, log_b)
+        expected_result = self._expected_beta(50, 3, d(1))
+        np.testing.assert_allclose(
+            result, expected_result.astype(np.float64), rtol=1e-12)
+
     @unittest.skip('long duration')
     def test_numerical_stability_if_increased_time(self):
         for i in xrange(0, 5):
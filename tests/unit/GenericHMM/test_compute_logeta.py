@@ -239,3 +239,16 @@ class ComputeLogEtaTestCase(BaseTestCase):
             expected_result = self._expected_logeta(8**i, 2)
             np.testing.assert_almost_equal(
                 result, expected_result, decimal=self.num_precision-(i+1))
+
+    def test_sums_to_gamma(self):
+        for numeric in ('float64', 'decimal'):
+            model = self._random_model(3, 3, numeric=numeric)
+            log_pi, log_a, log_b = model._log_parameters_of('abcabbca')
+            log_alpha = model._compute_logalpha(log_pi, log_a, log_b)
+            log_beta = model._compute_logbeta(log_a, log_b)
+            log_gamma = model._compute_loggamma(log_alpha, log_beta)
+            log_eta = model._compute_logeta(log_a, log_b, log_alpha,
+                                            log_beta)
+            np.testing.assert_allclose(
+                np.exp(np.array(log_eta[:, :, :-1], dtype=np.float64)).sum(1),
+                np.exp(np.array(log_gamma[:, :-1], dtype=np.float64)))
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for Viterbi decoding.
+
+"""
+from decimal import Decimal as d
+import itertools
+
+import mock
+import numpy as np
+
+from himamo import GenericHMM
+from tests.helpers import BaseTestCase
+
+
+class DecodeTestCase(BaseTestCase):
+    seed = 2
+
+    @classmethod
+    def _brute_force(cls, model, observations):
+        log_pi = model._log_initial_states
+        log_a = model._log_transition_matrix
+        log_b = model._log_parameters_of(observations)[2]
+        N, T = log_b.shape
+        best = None
+        for path in itertools.product(range(N), repeat=T):
+            score = log_pi[path[0]] + log_b[path[0], 0]
+            for t in xrange(1, T):
+                score += log_a[path[t-1], path[t]] + log_b[path[t], t]
+            if best is None or score > best[1]:
+                best = (path, score)
+        return best
+
+    def test_parameters_not_set(self):
+        model = GenericHMM([1, 2], ['a'])
+        with self.assertRaises(ValueError):
+            model.decode('aa')
+
+    def test_unknown_symbol(self):
+        model = self._random_model(2, 2)
+        with self.assertRaises(ValueError):
+            model.decode('abz')
+
+    def test_one_time(self):
+        model = self._random_model(3, 2)
+        path, log_probability = model.decode('b')
+        expected_state = np.argmax(model.initial_states *
+                                   model.emission_matrix[:, 1])
+        np.testing.assert_array_equal(path, [expected_state])
+
+    def test_compact_backpointers(self):
+        model = self._random_model(3, 2)
+        path, _ = model.decode('abba')
+        self.assertEqual(path.dtype, np.uint8)
+
+        model = self._random_model(300, 2)
+        path, _ = model.decode('abba')
+        self.assertEqual(path.dtype, np.uint16)
+
+    def test_matches_brute_force(self):
+        model = self._random_model(3, 3)
+        observations = 'abcca'
+        path, log_probability = model.decode(observations)
+        expected_path, expected_log_probability = self._brute_force(
+            model, observations)
+        np.testing.assert_array_equal(path, expected_path)
+        self.assertAlmostEqual(log_probability, expected_log_probability)
+
+    def test_matches_logdelta(self):
+        model = self._random_model(4, 2)
+        log_pi, log_a, log_b = model._log_parameters_of('abbbaab')
+        log_delta = model._compute_logdelta(log_pi, log_a, log_b)
+        _, log_probability = model._compute_viterbi(log_pi, log_a, log_b)
+        self.assertAlmostEqual(log_probability, np.max(log_delta[:, -1]))
+
+    def test_decimal_matches_float64(self):
+        float_model = self._random_model(3, 2)
+        decimal_model = GenericHMM(range(3), ['a', 'b'])
+        decimal_model.initial_states = np.array(
+            [d(0)] + [d(x) for x in float_model.initial_states[1:]])
+        decimal_model.transition_matrix = np.array(
+            [[d(x) for x in row] for row in float_model.transition_matrix])
+        decimal_model.emission_matrix = np.array(
+            [[d(x) for x in row] for row in float_model.emission_matrix])
+        float_model.initial_states = np.array(
+            [0.] + list(float_model.initial_states[1:]))
+
+        path, log_probability = decimal_model.decode('abbab')
+        expected_path, expected_log_probability = float_model.decode('abbab')
+        np.testing.assert_array_equal(path, expected_path)
+        self.assertAlmostEqual(float(log_probability),
+                               expected_log_probability)
+
+    def test_emissions_are_not_expanded(self):
+        model = self._random_model(3, 2)
+        path, log_probability = model.decode('abbab')
+        paths, _ = model.nbest_decode('abbab', 2)
+        with mock.patch.object(model, '_log_parameters_of',
+                               side_effect=AssertionError):
+            np.testing.assert_array_equal(model.decode('abbab')[0], path)
+            np.testing.assert_array_equal(
+                model.nbest_decode('abbab', 2)[0], paths)
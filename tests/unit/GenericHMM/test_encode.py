@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for integer-coded observations.
+
+"""
+import numpy as np
+
+from himamo import EncodedObservations
+from tests.helpers import BaseTestCase
+
+
+class EncodeTestCase(BaseTestCase):
+    seed = 10
+    observations = 'abcabbcacbab'
+
+    def test_encode(self):
+        model = self._random_model(2, 3)
+        indices = model.encode('cab')
+        self.assertIsInstance(indices, EncodedObservations)
+        np.testing.assert_array_equal(indices, [2, 0, 1])
+        self.assertEqual(model.encode([]).shape, (0,))
+
+    def test_encoded_observations_are_returned(self):
+        model = self._random_model(2, 3)
+        indices = model.encode('cab')
+        self.assertIs(model.encode(indices), indices)
+        indices = np.array([1, 2], dtype=np.int8).view(EncodedObservations)
+        self.assertIs(model.encode(indices), indices)
+
+    def test_integer_symbols(self):
+        model = self._random_model(2, 2)
+        model.symbols = [1, 0]
+        np.testing.assert_array_equal(model.encode(np.array([1, 1, 0])),
+                                      [0, 0, 1])
+        self.assertEqual(model.score(np.array([1, 1, 0])),
+                         model.score([1, 1, 0]))
+        path, _ = model.decode(np.array([1, 1, 0]))
+        np.testing.assert_array_equal(path, model.decode([1, 1, 0])[0])
+
+    def test_unknown_symbol(self):
+        model = self._random_model(2, 3)
+        with self.assertRaises(ValueError):
+            model.encode('abd')
+        with self.assertRaises(ValueError):
+            model.encode(np.array([0, 1]))
+        for indices in ([0, 3], [-1, 0], [[0, 1]]):
+            with self.assertRaises(ValueError):
+                model.encode(np.array(indices).view(EncodedObservations))
+
+    def test_symbols_reassigned(self):
+        model = self._random_model(2, 3)
+        model.symbols = list('cba')
+        np.testing.assert_array_equal(model.encode('cab'), [0, 2, 1])
+
+    def test_decode(self):
+        model = self._random_model(3, 3)
+        path, log_probability = model.decode(self.observations)
+        encoded_path, encoded_log_probability = model.decode(
+            model.encode(self.observations))
+        np.testing.assert_array_equal(encoded_path, path)
+        self.assertEqual(encoded_log_probability, log_probability)
+
+    def test_fit(self):
+        expected = self._random_model(3, 3)
+        actual = self._random_model(3, 3)
+        np.testing.assert_array_equal(
+            actual.fit(actual.encode(self.observations), max_iter=5),
+            expected.fit(self.observations, max_iter=5))
+        np.testing.assert_array_equal(actual.emission_matrix,
+                                      expected.emission_matrix)
+
+    def test_fit_sequences(self):
+        sequences = ['abcab', 'c', 'bbacabca']
+        expected = self._random_model(3, 3)
+        actual = self._random_model(3, 3)
+        np.testing.assert_array_equal(
+            actual.fit_sequences([actual.encode(o) for o in sequences],
+                                 max_iter=5, processes=1),
+            expected.fit_sequences(sequences, max_iter=5, processes=1))
+        np.testing.assert_array_equal(actual.transition_matrix,
+                                      expected.transition_matrix)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for Baum-Welch fit.
+
+"""
+from decimal import Decimal as d
+
+import mock
+import numpy as np
+
+from himamo import GenericHMM
+from tests.helpers import BaseTestCase
+
+
+class FitTestCase(BaseTestCase):
+    seed = 4
+
+    def test_parameters_not_set(self):
+        model = GenericHMM([1, 2], ['a'])
+        with self.assertRaises(ValueError):
+            model.fit('aa')
+
+    def test_log_likelihood_does_not_decrease(self):
+        model = self._random_model(3, 3)
+        log_likelihoods = model.fit('abcabbbacccaabca', max_iter=20, tol=0)
+        self.assertEqual(len(log_likelihoods), 20)
+        self.assertTrue(np.all(np.diff(log_likelihoods) > -1e-10))
+
+    def test_parameters_are_stochastic(self):
+        model = self._random_model(3, 3)
+        model.fit('abcabbbacccaabca', max_iter=5)
+        np.testing.assert_almost_equal(model.initial_states.sum(), 1)
+        np.testing.assert_almost_equal(model.transition_matrix.sum(1),
+                                       np.ones(3))
+        np.testing.assert_almost_equal(model.emission_matrix.sum(1),
+                                       np.ones(3))
+        self.assertFalse(model.transition_matrix.flags.writeable)
+
+    def test_matches_recompute_of_full_lattices(self):
+        model = self._random_model(2, 2)
+        observations = 'abbaabab'
+        log_pi, log_a, log_b = model._log_parameters_of(observations)
+        log_alpha = model._compute_logalpha(log_pi, log_a, log_b)
+        log_beta = model._compute_logbeta(log_a, log_b)
+        log_gamma = model._compute_loggamma(log_alpha, log_beta)
+        log_eta = model._compute_logeta(log_a, log_b, log_alpha, log_beta)
+
+        model.fit(observations, max_iter=1)
+        np.testing.assert_allclose(
+            model._log_initial_states,
+            model._recompute_log_initial_states(log_gamma))
+        np.testing.assert_allclose(
+            model._log_transition_matrix,
+            model._recompute_log_transitions(log_gamma, log_eta))
+        np.testing.assert_allclose(
+            model._log_emission_matrix,
+            model._recompute_log_emissions(
+                log_gamma, list(observations), model.symbols))
+
+    def test_converges(self):
+        model = self._random_model(2, 2)
+        log_likelihoods = model.fit('ab' * 20, max_iter=500, tol=1e-9)
+        self.assertLess(len(log_likelihoods), 500)
+
+    def test_scaled_engine_matches_log_engine(self):
+        observations = 'abcabbbacccaabca'
+        results = []
+        for engine in ('log', 'scaled'):
+            model = self._random_model(3, 3, engine=engine)
+            results.append(model.fit(observations, max_iter=5, tol=0))
+            results.append(model.transition_matrix)
+        np.testing.assert_allclose(results[2], results[0])
+        np.testing.assert_allclose(results[3], results[1])
+
+    def test_decimal(self):
+        model = GenericHMM([1, 2], ['a', 'b'])
+        model.initial_states = np.array([d('0.5'), d('0.5')])
+        model.transition_matrix = np.array([[d('0.9'), d('0.1')],
+                                            [d('0.2'), d('0.8')]])
+        model.emission_matrix = np.array([[d('0.7'), d('0.3')],
+                                          [d('0.4'), d('0.6')]])
+        log_likelihoods = model.fit('aabab', max_iter=3)
+        self.assertTrue(isinstance(log_likelihoods[-1], d))
+        self.assertGreaterEqual(log_likelihoods[-1], log_likelihoods[0])
+        self.assertAlmostEqual(float(sum(model.emission_matrix[0])), 1.)
+
+    def test_emissions_are_not_expanded(self):
+        expected = self._random_model(3, 3).fit('abcabbca', max_iter=3)
+        model = self._random_model(3, 3)
+        with mock.patch.object(model, '_log_parameters_of',
+                               side_effect=AssertionError):
+            np.testing.assert_allclose(
+                model.fit('abcabbca', max_iter=3), expected)
+            model.fit_sequences(['abca', 'bbca'], max_iter=2, processes=1)
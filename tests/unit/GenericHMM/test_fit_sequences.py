@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for Baum-Welch fit on multiple sequences.
+
+"""
+import numpy as np
+
+from himamo import GenericHMM
+from tests.helpers import BaseTestCase
+
+
+class FitSequencesTestCase(BaseTestCase):
+    seed = 5
+
+    def test_empty_sequences(self):
+        model = self._random_model(2, 2)
+        with self.assertRaises(ValueError):
+            model.fit_sequences([])
+
+    def test_unknown_symbol(self):
+        model = self._random_model(2, 2)
+        with self.assertRaises(ValueError):
+            model.fit_sequences(['ab', 'abz'], processes=1)
+
+    def test_one_sequence_matches_fit(self):
+        observations = 'abbabaabbbab'
+        model = self._random_model(2, 2)
+        expected_result = model.fit(observations, max_iter=5, tol=0)
+        expected_transitions = model.transition_matrix
+
+        model = self._random_model(2, 2)
+        result = model.fit_sequences([observations], max_iter=5, tol=0,
+                                     processes=1)
+        np.testing.assert_allclose(result, expected_result)
+        np.testing.assert_allclose(model.transition_matrix,
+                                   expected_transitions)
+
+    def test_expectations_are_summed(self):
+        sequences = ['abca', 'cc', 'bacab']
+        model = self._random_model(3, 3)
+        result = model._sequences_expectations(sequences)
+        expected_result = [
+            model._compute_expectations(
+                *(model._log_parameters_of(o) + (o,))) for o in sequences]
+        self.assertAlmostEqual(
+            result.log_likelihood,
+            sum(x.log_likelihood for x in expected_result))
+        np.testing.assert_allclose(
+            np.exp(result.log_emissions),
+            sum(np.exp(x.log_emissions) for x in expected_result))
+        np.testing.assert_allclose(
+            np.exp(result.log_initial_states).sum(), len(sequences))
+
+    def test_pool_matches_one_process(self):
+        sequences = ['abca', 'cc', 'bacab', 'a', 'bbbcca', 'cab']
+        results = []
+        for processes in (1, 3):
+            model = self._random_model(3, 3)
+            results.append(model.fit_sequences(
+                sequences, max_iter=4, tol=0, processes=processes))
+            results.append(model.emission_matrix)
+        np.testing.assert_allclose(results[2], results[0])
+        np.testing.assert_allclose(results[3], results[1])
+
+    def test_shards_are_balanced(self):
+        sequences = ['a' * n for n in (9, 1, 5, 4, 3, 2)]
+        shards = GenericHMM._shards(sequences, 3)
+        self.assertEqual(sorted(sum(shards, [])), range(6))
+        self.assertEqual(sorted(sum(len(sequences[k]) for k in shard)
+                                for shard in shards), [7, 8, 9])
+        self.assertEqual(len(GenericHMM._shards(sequences[:2], 4)), 2)
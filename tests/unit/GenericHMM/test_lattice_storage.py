@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for memory-mapped lattice storage.
+
+"""
+import os
+import shutil
+import tempfile
+
+import mock
+import numpy as np
+
+from himamo import GenericHMM
+from tests.helpers import BaseTestCase
+
+
+class LatticeStorageTestCase(BaseTestCase):
+    seed = 10
+
+    def setUp(self):
+        self.lattice_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.lattice_dir)
+
+    def test_invalid_backend(self):
+        with self.assertRaises(ValueError):
+            GenericHMM([1], ['a'], lattice_dir=self.lattice_dir)
+        with self.assertRaises(ValueError):
+            GenericHMM([1], ['a'], numeric='float64', engine='scaled',
+                       lattice_dir=self.lattice_dir)
+
+    def test_in_memory_without_lattice_dir(self):
+        model = self._random_model(3, 2)
+        log_pi, log_a, log_b = model._log_parameters_of('abba')
+        result = model._compute_logalpha(log_pi, log_a, log_b)
+        self.assertNotIsInstance(result, np.memmap)
+
+    @mock.patch('himamo.himamo.LATTICE_CHUNK_ELEMENTS', 7)
+    def test_memmap_lattices_match_in_memory(self):
+        observations = 'abcabbacbcab'
+        results = []
+        for lattice_dir in (None, self.lattice_dir):
+            model = self._random_model(3, 3, lattice_dir=lattice_dir)
+            log_pi, log_a, log_b = model._log_parameters_of(observations)
+            log_alpha = model._compute_logalpha(log_pi, log_a, log_b)
+            log_beta = model._compute_logbeta(log_a, log_b)
+            log_gamma = model._compute_loggamma(log_alpha, log_beta)
+            checkpointed_gamma = model._compute_checkpointed_loggamma(
+                log_pi, log_a, log_b)
+            results.append((log_alpha, log_beta, log_gamma,
+                            checkpointed_gamma))
+
+        for expected_result, result in zip(*results):
+            self.assertIsInstance(result, np.memmap)
+            self.assertTrue(result.flags.f_contiguous)
+            np.testing.assert_allclose(result, expected_result)
+            stored = np.load(result.filename, mmap_mode='r')
+            np.testing.assert_array_equal(stored, expected_result)
+        self.assertEqual(len(os.listdir(self.lattice_dir)), 4)
+
+    def test_time_chunks(self):
+        with mock.patch('himamo.himamo.LATTICE_CHUNK_ELEMENTS', 6):
+            self.assertEqual(GenericHMM._time_chunks(5, 3),
+                             [(0, 2), (2, 4), (4, 5)])
+            self.assertEqual(GenericHMM._time_chunks(2, 10),
+                             [(0, 1), (1, 2)])
+
+    @mock.patch('himamo.himamo.LATTICE_CHUNK_ELEMENTS', 7)
+    def test_emissions_gathered_by_chunks(self):
+        observations = 'abcabbacbcab'
+        model = self._random_model(3, 3, lattice_dir=self.lattice_dir)
+        log_pi, log_a, log_b = model._log_parameters_of(observations)
+        indices = model.encode(observations)
+        log_emission_matrix = model._log_emission_matrix
+        np.testing.assert_array_equal(
+            model._compute_logalpha(log_pi, log_a, log_emission_matrix,
+                                    indices=indices),
+            model._compute_logalpha(log_pi, log_a, log_b))
+        np.testing.assert_array_equal(
+            model._compute_logbeta(log_a, log_emission_matrix,
+                                   indices=indices),
+            model._compute_logbeta(log_a, log_b))
+        with self.assertRaises(ValueError):
+            model._compute_logalpha(log_pi, log_a, log_emission_matrix,
+                                    indices=model.encode(''))
+
+    @mock.patch('himamo.himamo.LATTICE_CHUNK_ELEMENTS', 7)
+    def test_posterior_decode_removes_intermediate_files(self):
+        observations = 'abcabbacbcab'
+        expected = self._random_model(3, 3).posterior_decode(observations)
+        model = self._random_model(3, 3, lattice_dir=self.lattice_dir)
+        states, log_posteriors = model.posterior_decode(observations)
+        np.testing.assert_array_equal(states, expected[0])
+        np.testing.assert_allclose(log_posteriors, expected[1])
+        self.assertEqual(os.listdir(self.lattice_dir), [])
+
+        _, _, log_gamma = model.posterior_decode(observations, gamma=True)
+        self.assertEqual(os.listdir(self.lattice_dir),
+                         [os.path.basename(log_gamma.filename)])
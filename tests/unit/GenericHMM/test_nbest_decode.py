@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for n-best Viterbi decoding.
+
+"""
+import itertools
+
+import numpy as np
+
+from himamo import BandedTransitions, GenericHMM, SparseTransitions
+from tests.helpers import BaseTestCase
+
+
+class NBestDecodeTestCase(BaseTestCase):
+    seed = 14
+    observations = 'abcab'
+
+    def _all_paths(self, model, observations):
+        """
+        Score all states paths by enumeration, best first.
+
+        """
+        log_pi, log_a, log_b = model._log_parameters_of(observations)
+        N, T = log_b.shape
+        scored = []
+        for path in itertools.product(xrange(N), repeat=T):
+            log_probability = log_pi[path[0]] + log_b[path[0], 0]
+            for t in xrange(1, T):
+                log_probability += (log_a[path[t-1], path[t]] +
+                                    log_b[path[t], t])
+            scored.append((log_probability, path))
+        scored.sort(key=lambda x: -x[0])
+        return scored
+
+    def test_matches_enumeration(self):
+        model = self._random_model(3, 3)
+        expected = self._all_paths(model, self.observations)[:10]
+        paths, log_probabilities = model.nbest_decode(self.observations, 10)
+        self.assertEqual([tuple(path) for path in paths],
+                         [path for _, path in expected])
+        np.testing.assert_allclose(log_probabilities,
+                                   [x for x, _ in expected])
+
+    def test_best_path_matches_decode(self):
+        model = self._random_model(4, 3)
+        path, log_probability = model.decode(self.observations * 3)
+        paths, log_probabilities = model.nbest_decode(self.observations * 3,
+                                                      1)
+        np.testing.assert_array_equal(paths, [path])
+        self.assertAlmostEqual(log_probabilities[0], log_probability)
+
+    def test_less_paths_than_k(self):
+        model = self._random_model(2, 3)
+        paths, log_probabilities = model.nbest_decode('ab', 10)
+        self.assertEqual(paths.shape, (4, 2))
+        self.assertEqual(len(set(tuple(path) for path in paths)), 4)
+        self.assertTrue(np.all(np.diff(log_probabilities) <= 0))
+
+        paths, log_probabilities = model.nbest_decode('c', 3)
+        self.assertEqual(paths.shape, (2, 1))
+
+    def test_impossible_paths(self):
+        model = self._random_model(3, 2)
+        model.transition_matrix = np.array(
+            [[.5, .5, 0.], [0., .5, .5], [0., 0., 1.]])
+        model.initial_states = np.array([1., 0., 0.])
+        expected = [x for x in self._all_paths(model, 'abab')
+                    if np.isfinite(x[0])]
+        paths, log_probabilities = model.nbest_decode('abab', 20)
+        self.assertEqual(len(paths), len(expected))
+        np.testing.assert_allclose(log_probabilities,
+                                   [x for x, _ in expected])
+
+        model.emission_matrix = np.array([[1., 0.], [1., 0.], [1., 0.]])
+        paths, log_probabilities = model.nbest_decode('ab', 5)
+        self.assertEqual(paths.shape, (1, 2))
+        self.assertEqual(log_probabilities[0], -np.inf)
+
+    def test_sparse_transitions(self):
+        model = self._random_model(4, 3)
+        expected = model.nbest_decode(self.observations, 5)
+        model.transition_matrix = SparseTransitions.from_dense(
+            model.transition_matrix)
+        paths, log_probabilities = model.nbest_decode(self.observations, 5)
+        np.testing.assert_array_equal(paths, expected[0])
+        np.testing.assert_allclose(log_probabilities, expected[1])
+
+    def test_banded_transitions(self):
+        model = self._random_model(4, 3)
+        model.initial_states = np.array([.7, .3, 0., 0.])
+        model.transition_matrix = np.array(
+            [[.5, .5, 0., 0.], [0., .5, .5, 0.], [0., 0., .5, .5],
+             [0., 0., 0., 1.]])
+        expected = model.nbest_decode(self.observations, 8)
+        model.transition_matrix = BandedTransitions.from_dense(
+            model.transition_matrix)
+        paths, log_probabilities = model.nbest_decode(self.observations, 8)
+        np.testing.assert_array_equal(paths, expected[0])
+        np.testing.assert_allclose(log_probabilities, expected[1])
+
+    def test_invalid_arguments(self):
+        model = self._random_model(3, 3)
+        with self.assertRaises(ValueError):
+            model.nbest_decode(self.observations, 0)
+        model = GenericHMM(range(2), list('ab'))
+        with self.assertRaises(ValueError):
+            model.nbest_decode('ab', 2)
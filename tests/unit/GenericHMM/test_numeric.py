@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for numeric backends.
+
+"""
+from decimal import Decimal as d
+
+import numpy as np
+
+from himamo import GenericHMM
+from tests.helpers import BaseTestCase
+
+
+class NumericBackendTestCase(BaseTestCase):
+    @classmethod
+    def _models(cls, N, T, zero_pi=True):
+        rng = np.random.RandomState(0)
+        pi = rng.rand(N)
+        if zero_pi:
+            pi[0] = 0.
+        a = rng.rand(N, N)
+        b = rng.rand(N, T)
+
+        decimal_model = GenericHMM(range(N), ['a'])
+        decimal_model.initial_states = np.array(
+            [d(x) for x in pi], dtype=object)
+        decimal_model.transition_matrix = np.array(
+            [[d(x) for x in row] for row in a], dtype=object)
+        decimal_model.emission_matrix = np.array(
+            [[d(x) for x in row] for row in b], dtype=object)
+
+        float_model = GenericHMM(range(N), ['a'], numeric='float64')
+        float_model.initial_states = pi
+        float_model.transition_matrix = a
+        float_model.emission_matrix = b
+
+        return decimal_model, float_model
+
+    @classmethod
+    def _log_parameters(cls, model):
+        return (model._log_initial_states, model._log_transition_matrix,
+                model._log_emission_matrix)
+
+    @classmethod
+    def _as_float(cls, arr):
+        return np.vectorize(
+            lambda x: -np.inf if x.is_nan() else float(x),
+            otypes=[np.float64])(arr)
+
+    def test_invalid_numeric(self):
+        with self.assertRaises(ValueError):
+            GenericHMM([1], ['a'], numeric='float32')
+
+    def test_float64_parameters(self):
+        model = GenericHMM([1, 2], ['a', 'b'], numeric='float64')
+        model.initial_states = np.array([d(0), d(1)])
+        self.assertEqual(model.initial_states.dtype, np.float64)
+        self.assertEqual(model._log_initial_states.dtype, np.float64)
+        np.testing.assert_array_equal(model._log_initial_states,
+                                      [-np.inf, 0.])
+
+        with self.assertRaises(ValueError):
+            model.transition_matrix = np.array([[-1.]])
+
+    def test_float64_logalpha_and_logbeta(self):
+        decimal_model, float_model = self._models(3, 4)
+        log_pi, log_a, log_b = self._log_parameters(float_model)
+        log_pi_d, log_a_d, log_b_d = self._log_parameters(decimal_model)
+
+        result = float_model._compute_logalpha(log_pi, log_a, log_b)
+        expected_result = decimal_model._compute_logalpha(
+            log_pi_d, log_a_d, log_b_d)
+        self.assertEqual(result.dtype, np.float64)
+        self.assertTrue(np.isneginf(result[0, 0]))
+        np.testing.assert_almost_equal(
+            result, self._as_float(expected_result))
+
+        result = float_model._compute_logbeta(log_a, log_b)
+        expected_result = decimal_model._compute_logbeta(log_a_d, log_b_d)
+        np.testing.assert_almost_equal(
+            result, self._as_float(expected_result))
+
+    def test_float64_loggamma_and_logeta(self):
+        decimal_model, float_model = self._models(3, 4)
+        results = []
+        for model in (decimal_model, float_model):
+            log_pi, log_a, log_b = self._log_parameters(model)
+            log_alpha = model._compute_logalpha(log_pi, log_a, log_b)
+            log_beta = model._compute_logbeta(log_a, log_b)
+            results.append((
+                model._compute_loggamma(log_alpha, log_beta),
+                model._compute_logeta(log_a, log_b, log_alpha, log_beta)))
+        (expected_gamma, expected_eta), (gamma, eta) = results
+
+        np.testing.assert_almost_equal(gamma, self._as_float(expected_gamma))
+        np.testing.assert_almost_equal(
+            eta[:, :, :-1], self._as_float(expected_eta[:, :, :-1]))
+
+    def test_float64_logdelta(self):
+        decimal_model, float_model = self._models(3, 4, zero_pi=False)
+
+        result = float_model._compute_logdelta(
+            *self._log_parameters(float_model))
+        expected_result = decimal_model._compute_logdelta(
+            *self._log_parameters(decimal_model))
+        self.assertEqual(result.dtype, np.float64)
+        np.testing.assert_almost_equal(
+            result, self._as_float(expected_result))
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for posterior decoding.
+
+"""
+import numpy as np
+
+from tests.helpers import BaseTestCase
+
+
+class PosteriorDecodeTestCase(BaseTestCase):
+    seed = 15
+    observations = 'abcabbcacbab'
+
+    def _expected(self, model, observations):
+        log_pi, log_a, log_b = model._log_parameters_of(observations)
+        log_gamma = model._compute_loggamma(
+            model._compute_logalpha(log_pi, log_a, log_b),
+            model._compute_logbeta(log_a, log_b))
+        gamma = np.exp(np.array(log_gamma, dtype=np.float64))
+        return gamma.argmax(0), gamma.max(0), log_gamma
+
+    def test_matches_gamma(self):
+        for numeric, engine in [('float64', 'log'), ('float64', 'scaled'),
+                                ('decimal', 'log')]:
+            model = self._random_model(4, 3, numeric=numeric, engine=engine)
+            expected_states, posteriors, _ = self._expected(
+                model, self.observations)
+            states, log_posteriors = model.posterior_decode(
+                self.observations)
+            np.testing.assert_array_equal(states, expected_states)
+            np.testing.assert_allclose(
+                np.exp(np.array(log_posteriors, dtype=np.float64)),
+                posteriors)
+
+    def test_gamma(self):
+        for numeric in ('float64', 'decimal'):
+            model = self._random_model(3, 3, numeric=numeric)
+            expected_states, posteriors, expected_gamma = self._expected(
+                model, self.observations)
+            states, log_posteriors, log_gamma = model.posterior_decode(
+                self.observations, gamma=True)
+            np.testing.assert_array_equal(states, expected_states)
+            np.testing.assert_allclose(
+                np.exp(np.array(log_posteriors, dtype=np.float64)),
+                posteriors)
+            np.testing.assert_array_equal(log_gamma.astype(str),
+                                          expected_gamma.astype(str))
+
+    def test_time_parallel(self):
+        model = self._random_model(3, 3)
+        expected_states, expected_log_posteriors = model.posterior_decode(
+            self.observations * 20)
+        states, log_posteriors = model.posterior_decode(
+            self.observations * 20, processes=2)
+        np.testing.assert_array_equal(states, expected_states)
+        np.testing.assert_allclose(log_posteriors, expected_log_posteriors)
+
+    def test_impossible_observations(self):
+        model = self._random_model(2, 2)
+        model.emission_matrix = np.array([[1., 0.], [1., 0.]])
+        states, log_posteriors = model.posterior_decode('aab')
+        self.assertEqual(states.shape, (3,))
+        np.testing.assert_array_equal(log_posteriors, -np.inf)
+
+    def test_empty_observations(self):
+        model = self._random_model(2, 2)
+        with self.assertRaises(ValueError):
+            model.posterior_decode('')
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for sampling sequences from model.
+
+"""
+import numpy as np
+
+from himamo import BandedTransitions, GenericHMM, SparseTransitions
+from tests.helpers import BaseTestCase
+
+
+class SampleTestCase(BaseTestCase):
+    initial_states = np.array([.2, 0., .8])
+    transition_matrix = np.array([[.5, .5, 0.], [.1, 0., .9], [0., .3, .7]])
+    emission_matrix = np.array([[.25, .25, .25, .25], [1., 0., 0., 0.],
+                                [0., .5, 0., .5]])
+
+    @classmethod
+    def _model(cls, numeric='float64'):
+        return cls._model_of(cls.initial_states, cls.transition_matrix,
+                             cls.emission_matrix, numeric=numeric)
+
+    def _frequencies(self, rows, columns, shape):
+        counts = np.zeros(shape)
+        np.add.at(counts, (rows.ravel(), columns.ravel()), 1)
+        return counts / counts.sum(1)[:, np.newaxis]
+
+    def test_shapes(self):
+        states, observations = self._model().sample(5, 7, seed=0)
+        self.assertEqual(states.shape, (5, 7))
+        self.assertEqual(observations.shape, (5, 7))
+        self.assertEqual(states.dtype, np.uint8)
+        self.assertEqual(observations.dtype, np.uint8)
+
+    def test_seed(self):
+        model = self._model()
+        first = model.sample(10, 20, seed=3)
+        second = model.sample(10, 20, seed=3)
+        np.testing.assert_array_equal(first[0], second[0])
+        np.testing.assert_array_equal(first[1], second[1])
+
+    def test_frequencies(self):
+        states, observations = self._model().sample(4000, 50, seed=1)
+        np.testing.assert_allclose(
+            np.bincount(states[:, 0], minlength=3) / 4000.,
+            self.initial_states, atol=.02)
+        transitions = self._frequencies(states[:, :-1], states[:, 1:],
+                                        (3, 3))
+        np.testing.assert_allclose(transitions, self.transition_matrix,
+                                   atol=.02)
+        np.testing.assert_array_equal(transitions[self.transition_matrix == 0],
+                                      0)
+        emissions = self._frequencies(states, observations, (3, 4))
+        np.testing.assert_allclose(emissions, self.emission_matrix,
+                                   atol=.02)
+        np.testing.assert_array_equal(emissions[self.emission_matrix == 0], 0)
+
+    def test_observations_are_encoded(self):
+        model = self._model()
+        _, observations = model.sample(3, 30, seed=2)
+        for sequence in observations:
+            self.assertGreater(model.score(sequence), -np.inf)
+            self.assertGreater(model.decode(sequence)[1], -np.inf)
+
+    def test_sparse_transitions(self):
+        model = self._model()
+        expected = model.sample(10, 20, seed=4)
+        model.transition_matrix = SparseTransitions.from_dense(
+            self.transition_matrix)
+        actual = model.sample(10, 20, seed=4)
+        np.testing.assert_array_equal(actual[0], expected[0])
+        np.testing.assert_array_equal(actual[1], expected[1])
+
+    def test_banded_transitions(self):
+        transition_matrix = np.array([[.6, .4, 0., 0.], [.2, .3, .5, 0.],
+                                      [0., .1, .2, .7], [0., 0., .5, .5]])
+        model = GenericHMM(range(4), list('ab'), numeric='float64',
+                           topology=[-1, 0, 1])
+        model.initial_states = np.array([.4, .3, .2, .1])
+        model.transition_matrix = transition_matrix
+        model.emission_matrix = np.array([[.5, .5]] * 4)
+        self.assertIsInstance(model.transition_matrix, BandedTransitions)
+
+        states, _ = model.sample(2000, 50, seed=6)
+        transitions = self._frequencies(states[:, :-1], states[:, 1:],
+                                        (4, 4))
+        np.testing.assert_array_equal(transitions[transition_matrix == 0], 0)
+        np.testing.assert_allclose(transitions, transition_matrix, atol=.02)
+
+    def test_decimal_numeric(self):
+        expected = self._model().sample(10, 20, seed=5)
+        actual = self._model('decimal').sample(10, 20, seed=5)
+        np.testing.assert_array_equal(actual[0], expected[0])
+        np.testing.assert_array_equal(actual[1], expected[1])
+
+    def test_invalid_arguments(self):
+        model = self._model()
+        with self.assertRaises(ValueError):
+            model.sample(0, 10)
+        with self.assertRaises(ValueError):
+            model.sample(10, 0)
+        with self.assertRaises(ValueError):
+            GenericHMM(range(2), list('ab')).sample(1, 1)
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for scaled forward-backward engine.
+
+"""
+import mock
+import numpy as np
+
+from himamo import GenericHMM
+from tests.helpers import BaseTestCase
+
+
+class ScaledEngineTestCase(BaseTestCase):
+    @classmethod
+    def _models(cls, N, M, seed=3):
+        rng = np.random.RandomState(seed)
+        pi = rng.rand(N)
+        a = rng.rand(N, N)
+        b = rng.rand(N, M)
+        models = []
+        for engine in ('log', 'scaled'):
+            model = GenericHMM(range(N), list('abcd'[:M]), numeric='float64',
+                               engine=engine)
+            model.initial_states = pi / pi.sum()
+            model.transition_matrix = a / a.sum(1)[:, np.newaxis]
+            model.emission_matrix = b / b.sum(1)[:, np.newaxis]
+            models.append(model)
+        return models
+
+    def test_invalid_engine(self):
+        with self.assertRaises(ValueError):
+            GenericHMM([1], ['a'], numeric='float64', engine='linear')
+
+    def test_scaled_requires_float64(self):
+        with self.assertRaises(ValueError):
+            GenericHMM([1], ['a'], engine='scaled')
+
+    def test_lattices_match_log_engine(self):
+        observations = 'abcabbbacca' * 3
+        results = []
+        for model in self._models(4, 3):
+            log_pi, log_a, log_b = model._log_parameters_of(observations)
+            log_alpha = model._compute_logalpha(log_pi, log_a, log_b)
+            log_beta = model._compute_logbeta(log_a, log_b)
+            log_gamma = model._compute_loggamma(log_alpha, log_beta)
+            results.append((log_alpha, log_beta, log_gamma))
+
+        for expected, result in zip(*results):
+            np.testing.assert_allclose(result, expected, rtol=1e-10)
+
+    def test_zero_probabilities(self):
+        observations = 'abba'
+        log_model, scaled_model = self._models(3, 2)
+        for model in (log_model, scaled_model):
+            model.initial_states = np.array([0., 0.5, 0.5])
+        results = []
+        for model in (log_model, scaled_model):
+            log_pi, log_a, log_b = model._log_parameters_of(observations)
+            results.append(model._compute_logalpha(log_pi, log_a, log_b))
+        self.assertTrue(np.isneginf(results[1][0, 0]))
+        np.testing.assert_allclose(results[1], results[0], rtol=1e-10)
+
+    def test_long_sequence_does_not_underflow(self):
+        _, model = self._models(3, 2)
+        observations = 'ab' * 2000
+        log_pi, log_a, log_b = model._log_parameters_of(observations)
+        log_alpha = model._compute_logalpha(log_pi, log_a, log_b)
+        self.assertTrue(np.all(np.isfinite(log_alpha)))
+        self.assertAlmostEqual(np.logaddexp.reduce(log_alpha[:, -1]),
+                               np.sum(model._log_scales))
+
+    def test_expectations_match_log_engine(self):
+        observations = 'abccbaabc'
+        results = []
+        for model in self._models(3, 3):
+            results.append(model._compute_expectations(
+                *(model._log_parameters_of(observations) + (observations,))))
+        expected, result = results
+        for name in expected._fields:
+            np.testing.assert_allclose(getattr(result, name),
+                                       getattr(expected, name), rtol=1e-10)
+
+    def test_beta_of_other_observations(self):
+        results = []
+        for model in self._models(3, 2):
+            log_pi, log_a, log_b = model._log_parameters_of('a' * 400)
+            model._compute_logalpha(log_pi, log_a, log_b)
+            _, log_a, log_b = model._log_parameters_of('b' * 400)
+            results.append(model._compute_logbeta(log_a, log_b))
+        self.assertTrue(np.all(np.isfinite(results[1])))
+        np.testing.assert_allclose(results[1], results[0], rtol=1e-10)
+
+    def test_beta_with_forward_scales(self):
+        _, model = self._models(3, 2)
+        log_pi, log_a, log_b = model._log_parameters_of('ab' * 200)
+        model._compute_logalpha(log_pi, log_a, log_b)
+        np.testing.assert_allclose(
+            model._compute_logbeta(log_a, log_b, model._log_scales),
+            model._compute_logbeta(log_a, log_b), rtol=1e-10)
+        with self.assertRaises(ValueError):
+            model._compute_logbeta(log_a, log_b[:, 1:], model._log_scales)
+
+    def test_expectations_skip_log_forward_pass(self):
+        _, model = self._models(3, 3)
+        observations = 'abccbaabc'
+        with mock.patch.object(model, '_compute_logalpha') as logalpha:
+            model._compute_expectations(
+                *(model._log_parameters_of(observations) + (observations,)))
+        self.assertFalse(logalpha.called)
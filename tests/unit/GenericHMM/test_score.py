@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for log-likelihood scoring.
+
+"""
+import numpy as np
+
+from himamo import GenericHMM, SparseTransitions
+from tests.helpers import BaseTestCase
+
+
+class ScoreTestCase(BaseTestCase):
+    seed = 11
+    observations = 'abcabbcacbab'
+
+    def _expected_score(self, model, observations):
+        log_alpha = model._compute_logalpha(
+            *model._log_parameters_of(observations))
+        return model._elnsum_reducer()(log_alpha[:, -1], 0)
+
+    def test_matches_logalpha(self):
+        for numeric, engine in [('float64', 'log'), ('float64', 'scaled'),
+                                ('decimal', 'log')]:
+            model = self._random_model(4, 3, numeric=numeric, engine=engine)
+            for observations in (self.observations, 'c'):
+                expected = self._expected_score(model, observations)
+                model._invalidate_lattices()
+                self.assertAlmostEqual(float(model.score(observations)),
+                                       float(expected))
+
+    def test_decimal_is_exact(self):
+        model = self._random_model(3, 3, numeric='decimal')
+        self.assertEqual(model.score(self.observations),
+                         self._expected_score(model, self.observations))
+
+    def test_keeps_no_lattice(self):
+        model = self._random_model(3, 3)
+        model.score(self.observations)
+        self.assertIsNone(model._log_alpha)
+        self.assertIsNone(model._log_scales)
+
+    def test_encoded_observations(self):
+        model = self._random_model(3, 3)
+        self.assertEqual(model.score(model.encode(self.observations)),
+                         model.score(self.observations))
+
+    def test_sparse_transitions(self):
+        model = self._random_model(4, 3)
+        expected = model.score(self.observations)
+        model.transition_matrix = SparseTransitions.from_dense(
+            model.transition_matrix)
+        self.assertAlmostEqual(model.score(self.observations), expected)
+
+    def test_impossible_observations(self):
+        for engine in ('log', 'scaled'):
+            model = self._random_model(2, 2, engine=engine)
+            model.emission_matrix = np.array([[1., 0.], [1., 0.]])
+            self.assertEqual(model.score('aab'), -np.inf)
+
+    def test_long_sequence(self):
+        model = self._random_model(3, 3, engine='scaled')
+        score = model.score(self.observations * 1000)
+        self.assertTrue(np.isfinite(score))
+        self.assertAlmostEqual(
+            score, self._random_model(3, 3).score(self.observations * 1000))
+
+    def test_empty_observations(self):
+        model = self._random_model(2, 2)
+        with self.assertRaises(ValueError):
+            model.score('')
+
+    def test_parameters_not_set(self):
+        model = GenericHMM(range(2), list('ab'))
+        with self.assertRaises(ValueError):
+            model.score('ab')
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for batch scoring.
+
+"""
+import itertools
+
+from himamo import GenericHMM
+from tests.helpers import BaseTestCase
+
+
+class ScoreManyTestCase(BaseTestCase):
+    seed = 12
+    sequences = ['abcab', 'c', 'bbacabca', 'ab', 'cab', 'bcbcbc', 'a']
+
+    def test_one_worker(self):
+        model = self._random_model(3, 3)
+        self.assertEqual(list(model.score_many(self.sequences, workers=1)),
+                         [model.score(o) for o in self.sequences])
+
+    def test_pool_keeps_input_order(self):
+        model = self._random_model(3, 3)
+        scores = model.score_many(iter(self.sequences), workers=2,
+                                  chunksize=2)
+        self.assertEqual(list(scores),
+                         [model.score(o) for o in self.sequences])
+
+    def test_generator_is_consumed_lazily(self):
+        model = self._random_model(3, 3)
+        consumed = []
+
+        def sequences():
+            for observations in itertools.cycle(self.sequences):
+                consumed.append(observations)
+                yield observations
+
+        scores = model.score_many(sequences(), workers=2, chunksize=3)
+        first = list(itertools.islice(scores, 10))
+        scores.close()
+        self.assertEqual(first, [model.score(o) for o in consumed[:10]])
+        self.assertLessEqual(len(consumed), 10 + 2 * 2 * 3)
+
+    def test_empty_sequences(self):
+        model = self._random_model(3, 3)
+        self.assertEqual(list(model.score_many([], workers=2)), [])
+
+    def test_unknown_symbol(self):
+        model = self._random_model(3, 3)
+        with self.assertRaises(ValueError):
+            list(model.score_many(['ab', 'ad'], workers=2, chunksize=1))
+
+    def test_invalid_arguments(self):
+        model = self._random_model(3, 3)
+        with self.assertRaises(ValueError):
+            model.score_many(self.sequences, workers=0)
+        with self.assertRaises(ValueError):
+            model.score_many(self.sequences, chunksize=0)
+        with self.assertRaises(ValueError):
+            GenericHMM(range(2), list('ab')).score_many(self.sequences)
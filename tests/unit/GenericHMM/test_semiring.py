@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for semiring lattice engine.
+
+"""
+import itertools
+import pickle
+
+import numpy as np
+
+from himamo import GenericHMM, SparseTransitions
+from tests.helpers import BaseTestCase
+
+
+class SemiringTestCase(BaseTestCase):
+    seed = 14
+    observations = 'abcabbca'
+
+    @classmethod
+    def _random_model(cls, N, M, numeric='float64'):
+        rng = np.random.RandomState(cls.seed)
+        pi = rng.rand(N)
+        a = rng.rand(N, N)
+        a[rng.rand(N, N) < .4] = 0.
+        a[:, 0] = .1
+        b = rng.rand(N, M)
+        b[rng.rand(N, M) < .2] = 0.
+        b[0] = .1
+        return cls._model_of(pi, a, b, numeric=numeric)
+
+    def _count_paths(self, model, observations):
+        pi = np.asarray(model.initial_states, dtype=np.float64)
+        a = np.asarray(model.transition_matrix, dtype=np.float64)
+        b = np.asarray(model.emission_matrix, dtype=np.float64)
+        indices = model.encode(observations)
+        counts = np.zeros(len(pi), dtype=int)
+        for path in itertools.product(range(len(pi)), repeat=len(indices)):
+            p = pi[path[0]] * b[path[0], indices[0]]
+            for t in xrange(1, len(indices)):
+                p *= a[path[t-1], path[t]] * b[path[t], indices[t]]
+            counts[path[-1]] += p > 0
+        return counts
+
+    def test_unknown_semiring(self):
+        model = self._random_model(2, 2)
+        with self.assertRaises(ValueError):
+            model._semiring('min')
+
+    def test_semirings_are_cached(self):
+        model = self._random_model(2, 2, numeric='decimal')
+        self.assertIs(model._semiring('sum'), model._semiring('sum'))
+        copied = pickle.loads(pickle.dumps(model))
+        self.assertEqual(copied._semirings, {})
+        self.assertEqual(copied.score('ab'), model.score('ab'))
+
+    def test_resume(self):
+        model = self._random_model(3, 3)
+        log_pi, log_a, log_b = model._log_parameters_of(self.observations)
+        semiring = model._semiring('sum')
+        expected = model._compute_lattice(semiring, log_pi, log_a, log_b)
+        log_x = model._compute_lattice(semiring, expected[:, 3], log_a,
+                                       log_b[:, 4:], lattice=False,
+                                       resume=True)
+        np.testing.assert_allclose(log_x, expected[:, -1])
+
+    def test_sum_and_max(self):
+        for numeric in ('float64', 'decimal'):
+            model = self._random_model(3, 3, numeric=numeric)
+            log_pi, log_a, log_b = model._log_parameters_of(self.observations)
+            # Decimal('NaN') is not equal to itself
+            log_alpha = model._compute_lattice(
+                model._semiring('sum'), log_pi, log_a, log_b)
+            np.testing.assert_array_equal(
+                log_alpha.astype(str),
+                model._compute_logalpha(log_pi, log_a, log_b).astype(str))
+            log_delta = model._compute_lattice(
+                model._semiring('max'), log_pi, log_a, log_b)
+            np.testing.assert_array_equal(
+                log_delta.astype(str),
+                model._compute_logdelta(log_pi, log_a, log_b).astype(str))
+
+    def test_gathered_emissions(self):
+        model = self._random_model(3, 3)
+        log_pi, log_a, log_b = model._log_parameters_of(self.observations)
+        np.testing.assert_array_equal(
+            model._compute_lattice(model._semiring('sum'), log_pi, log_a,
+                                   model._log_emission_matrix,
+                                   indices=model.encode(self.observations)),
+            model._compute_lattice(model._semiring('sum'), log_pi, log_a,
+                                   log_b))
+
+    def test_count(self):
+        for numeric in ('float64', 'decimal'):
+            model = self._random_model(3, 3, numeric=numeric)
+            semiring = model._semiring('count')
+            expected = self._count_paths(model, self.observations)
+            for log_a in (model._log_transition_matrix,
+                          SparseTransitions.from_dense(
+                              model.transition_matrix).with_values(
+                                  model._log_transition_matrix[
+                                      np.nonzero(model.transition_matrix)])):
+                counts = model._compute_lattice(
+                    semiring, model._log_initial_states, log_a,
+                    *model._log_parameters_of(self.observations)[2:])
+                self.assertEqual(counts.dtype, object)
+                np.testing.assert_array_equal(counts[:, -1], expected)
+
+    def test_count_is_exact(self):
+        model = GenericHMM(range(4), list('a'), numeric='float64')
+        model.initial_states = np.ones(4) / 4
+        model.transition_matrix = np.ones((4, 4)) / 4
+        model.emission_matrix = np.ones((4, 1))
+        counts = model._compute_lattice(
+            model._semiring('count'),
+            *model._log_parameters_of('a' * 40), lattice=False)
+        self.assertEqual(sum(counts), 4 ** 40)
+
+    def test_backpointers(self):
+        model = self._random_model(3, 3)
+        log_pi, log_a, log_b = model._log_parameters_of(self.observations)
+        backpointers = np.zeros((len(self.observations), 3), dtype=int)
+        log_delta = model._compute_lattice(
+            model._semiring('max'), log_pi, log_a, log_b, lattice=False,
+            backpointers=backpointers)
+        expected = model._compute_logdelta(log_pi, log_a, log_b)
+        np.testing.assert_array_equal(log_delta, expected[:, -1])
+        for t in xrange(1, len(self.observations)):
+            np.testing.assert_array_equal(
+                backpointers[t],
+                np.argmax(expected[:, t-1, np.newaxis] + log_a, axis=0))
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for sparse transition matrices.
+
+"""
+import numpy as np
+
+from himamo import FixedLagSmoother, ForwardFilter, GenericHMM
+from himamo import SparseTransitions
+from tests.helpers import BaseTestCase
+
+
+class SparseTransitionsTestCase(BaseTestCase):
+    seed = 8
+    observations = 'abcabbcacbab'
+    sequences = ['abcab', 'c', 'bbacabca', 'ab']
+
+    @classmethod
+    def _random_models(cls, N, M, numeric='float64', engine='log'):
+        """
+        Create the same model with dense and sparse transition matrices.
+
+        Every state has transitions to itself and the next two states only.
+
+        """
+        rng = np.random.RandomState(cls.seed)
+        pi = rng.rand(N)
+        a = rng.rand(N, N)
+        offsets = (np.arange(N)[np.newaxis, :] - np.arange(N)[:, np.newaxis])
+        a[offsets % N > 2] = 0.
+        b = rng.rand(N, M)
+
+        models = [cls._model_of(pi, a, b, numeric=numeric, engine=engine)
+                  for _ in xrange(2)]
+        models[1].transition_matrix = SparseTransitions.from_dense(
+            models[0].transition_matrix)
+        return models
+
+    def _assert_close(self, actual, expected, rtol=1e-10):
+        if isinstance(actual, SparseTransitions):
+            actual = actual.todense(-np.inf)
+        if isinstance(expected, SparseTransitions):
+            expected = expected.todense(-np.inf)
+        # decimal backend represents logarithm of zero with NaN
+        actual = np.array(actual, dtype=np.float64)
+        actual[np.isnan(actual)] = -np.inf
+        expected = np.array(expected, dtype=np.float64)
+        expected[np.isnan(expected)] = -np.inf
+        np.testing.assert_array_equal(np.isneginf(actual),
+                                      np.isneginf(expected))
+        finite = np.isfinite(expected)
+        np.testing.assert_allclose(actual[finite], expected[finite],
+                                   rtol=rtol, atol=1e-12)
+
+    def test_from_dense(self):
+        matrix = np.array([[0.5, 0.5, 0.], [0., 0., 1.], [0.25, 0., 0.75]])
+        transitions = SparseTransitions.from_dense(matrix)
+        self.assertEqual(transitions.shape, (3, 3))
+        self.assertEqual(transitions.nnz, 5)
+        np.testing.assert_array_equal(transitions.todense(), matrix)
+
+    def test_reduce(self):
+        transitions = SparseTransitions([2, 0, 0], [0, 2, 1],
+                                        [1., 2., 3.], 4)
+        np.testing.assert_array_equal(
+            transitions.reduce_sources(np.add, transitions.values, 0.),
+            [5., 0., 1., 0.])
+        np.testing.assert_array_equal(
+            transitions.reduce_targets(np.add, transitions.values, 0.),
+            [1., 3., 2., 0.])
+
+    def test_invalid_transitions(self):
+        with self.assertRaises(ValueError):
+            SparseTransitions([0, 1], [1], [1., 1.], 2)
+        with self.assertRaises(ValueError):
+            SparseTransitions([], [], [], 2)
+        with self.assertRaises(ValueError):
+            SparseTransitions([0, 2], [1, 0], [1., 1.], 2)
+        with self.assertRaises(ValueError):
+            SparseTransitions([0, 0], [1, 1], [.5, .5], 2)
+
+    def test_negative_probabilities(self):
+        model = GenericHMM(range(2), list('ab'), numeric='float64')
+        with self.assertRaises(ValueError):
+            model.transition_matrix = SparseTransitions(
+                [0, 1], [1, 0], [1., -1.], 2)
+
+    def test_lattices_match_dense(self):
+        for numeric in ('float64', 'decimal'):
+            dense, sparse = self._random_models(5, 3, numeric=numeric)
+            log_pi, log_a, log_b = dense._log_parameters_of(self.observations)
+            _, sparse_log_a, _ = sparse._log_parameters_of(self.observations)
+            self.assertIsInstance(sparse_log_a, SparseTransitions)
+
+            log_alpha = dense._compute_logalpha(log_pi, log_a, log_b)
+            log_beta = dense._compute_logbeta(log_a, log_b)
+            self._assert_close(
+                sparse._compute_logalpha(log_pi, sparse_log_a, log_b),
+                log_alpha)
+            self._assert_close(sparse._compute_logbeta(sparse_log_a, log_b),
+                               log_beta)
+            self._assert_close(
+                sparse._compute_logdelta(log_pi, sparse_log_a, log_b),
+                dense._compute_logdelta(log_pi, log_a, log_b))
+            self._assert_close(
+                sparse._compute_logeta(sparse_log_a, log_b, log_alpha,
+                                       log_beta),
+                dense._compute_logeta(log_a, log_b, log_alpha, log_beta))
+
+    def test_decode_matches_dense(self):
+        for numeric in ('float64', 'decimal'):
+            dense, sparse = self._random_models(5, 3, numeric=numeric)
+            path, log_probability = dense.decode(self.observations)
+            sparse_path, sparse_log_probability = sparse.decode(
+                self.observations)
+            np.testing.assert_array_equal(sparse_path, path)
+            self._assert_close(sparse_log_probability, log_probability)
+
+    def test_batch_matches_dense(self):
+        dense, sparse = self._random_models(5, 3)
+        log_pi, log_a, log_b, lengths = dense._batch_log_parameters_of(
+            self.sequences)
+        sparse_log_a = sparse._log_transition_matrix
+        log_alpha, log_likelihoods = dense._compute_batch_logalpha(
+            log_pi, log_a, log_b, lengths)
+        sparse_log_alpha, sparse_log_likelihoods = \
+            sparse._compute_batch_logalpha(log_pi, sparse_log_a, log_b,
+                                           lengths)
+        self._assert_close(sparse_log_alpha, log_alpha)
+        self._assert_close(sparse_log_likelihoods, log_likelihoods)
+        self._assert_close(
+            sparse._compute_batch_logbeta(sparse_log_a, log_b, lengths),
+            dense._compute_batch_logbeta(log_a, log_b, lengths))
+
+    def test_expectations_match_dense(self):
+        for engine in ('log', 'scaled'):
+            for checkpoint in (False, True):
+                if engine == 'scaled' and checkpoint:
+                    continue
+                dense, sparse = self._random_models(5, 3, engine=engine)
+                expected = dense._compute_expectations(
+                    *dense._log_parameters_of(self.observations),
+                    observations=self.observations, checkpoint=checkpoint)
+                actual = sparse._compute_expectations(
+                    *sparse._log_parameters_of(self.observations),
+                    observations=self.observations, checkpoint=checkpoint)
+                self.assertIsInstance(actual.log_transitions,
+                                      SparseTransitions)
+                for name in expected._fields:
+                    self._assert_close(getattr(actual, name),
+                                       getattr(expected, name))
+
+    def test_fit_matches_dense(self):
+        for numeric in ('float64', 'decimal'):
+            dense, sparse = self._random_models(4, 3, numeric=numeric)
+            expected = dense.fit(self.observations, max_iter=5)
+            actual = sparse.fit(self.observations, max_iter=5)
+            self._assert_close(actual, expected, rtol=1e-8)
+            self.assertIsInstance(sparse.transition_matrix, SparseTransitions)
+            self._assert_close(sparse._log_transition_matrix,
+                               dense._log_transition_matrix, rtol=1e-8)
+
+    def test_fit_sequences_matches_dense(self):
+        dense, sparse = self._random_models(4, 3)
+        expected = dense.fit_sequences(self.sequences, max_iter=5)
+        actual = sparse.fit_sequences(self.sequences, max_iter=5)
+        self._assert_close(actual, expected, rtol=1e-8)
+        self._assert_close(sparse._log_transition_matrix,
+                           dense._log_transition_matrix, rtol=1e-8)
+
+    def test_streaming_matches_dense(self):
+        for engine in ('log', 'scaled'):
+            dense, sparse = self._random_models(5, 3, engine=engine)
+            expected = ForwardFilter(dense)
+            actual = ForwardFilter(sparse)
+            for observation in self.observations:
+                actual.update(observation)
+                expected.update(observation)
+                self._assert_close(actual.log_filtered_states,
+                                   expected.log_filtered_states)
+
+            expected = FixedLagSmoother(dense, 3)
+            actual = FixedLagSmoother(sparse, 3)
+            for x, y in zip(actual.extend(self.observations) + actual.flush(),
+                            expected.extend(self.observations) +
+                            expected.flush()):
+                self._assert_close(x, y)
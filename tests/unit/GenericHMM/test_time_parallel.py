@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for forward-backward parallel over time chunks.
+
+"""
+import numpy as np
+
+from himamo import SparseTransitions
+from tests.helpers import BaseTestCase
+
+
+class TimeParallelTestCase(BaseTestCase):
+    seed = 13
+    observations = 'abcabbcacbabcca'
+
+    def _assert_close(self, actual, expected):
+        if isinstance(actual, SparseTransitions):
+            actual = actual.todense(-np.inf)
+            expected = expected.todense(-np.inf)
+        np.testing.assert_allclose(np.asarray(actual, dtype=np.float64),
+                                   np.asarray(expected, dtype=np.float64),
+                                   rtol=1e-10)
+
+    def test_lattices_match_sequential(self):
+        for numeric in ('float64', 'decimal'):
+            model = self._random_model(3, 3, numeric=numeric)
+            indices = model.encode(self.observations)
+            log_pi, log_a, log_b = model._log_parameters_of(indices)
+            expected_alpha = model._compute_logalpha(log_pi, log_a, log_b)
+            expected_beta = model._compute_logbeta(log_a, log_b)
+            for chunks in (1, 2, 4, 15, 20):
+                log_alpha, log_beta, log_likelihood = \
+                    model._compute_time_parallel_lattices(indices, chunks)
+                self._assert_close(log_alpha, expected_alpha)
+                self._assert_close(log_beta, expected_beta)
+                self._assert_close(
+                    log_likelihood,
+                    model._elnsum_reducer()(expected_alpha[:, -1], 0))
+
+    def test_expectations_match_sequential(self):
+        model = self._random_model(4, 3)
+        model.transition_matrix = SparseTransitions.from_dense(
+            np.triu(model.transition_matrix) /
+            np.triu(model.transition_matrix).sum(1)[:, np.newaxis])
+        indices = model.encode(self.observations)
+        expected = model._compute_expectations(
+            *model._log_parameters_of(indices), observations=indices)
+        for chunks in (1, 3, 15):
+            actual = model._compute_time_parallel_expectations(indices,
+                                                               chunks)
+            for name in expected._fields:
+                self._assert_close(getattr(actual, name),
+                                   getattr(expected, name))
+
+    def test_one_time(self):
+        model = self._random_model(3, 3)
+        log_alpha, log_beta, _ = model._compute_time_parallel_lattices(
+            model.encode('b'), 4)
+        self.assertEqual(log_alpha.shape, (3, 1))
+        self._assert_close(log_beta, np.zeros((3, 1)))
+
+    def test_empty_observations(self):
+        model = self._random_model(3, 3)
+        with self.assertRaises(ValueError):
+            model._compute_time_parallel_lattices(model.encode(''), 2)
+
+    def test_score(self):
+        model = self._random_model(3, 3)
+        self.assertAlmostEqual(model.score(self.observations, processes=2),
+                               model.score(self.observations))
+        self.assertIsNone(model._log_alpha)
+
+    def test_fit(self):
+        expected = self._random_model(3, 3)
+        actual = self._random_model(3, 3)
+        np.testing.assert_allclose(
+            actual.fit(self.observations, max_iter=5, processes=2),
+            expected.fit(self.observations, max_iter=5), rtol=1e-10)
+        np.testing.assert_allclose(actual.transition_matrix,
+                                   expected.transition_matrix, rtol=1e-8)
+        np.testing.assert_allclose(actual.emission_matrix,
+                                   expected.emission_matrix, rtol=1e-8)
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for banded transition topology.
+
+"""
+import numpy as np
+
+from himamo import BandedTransitions, GenericHMM, SparseTransitions
+from tests.helpers import BaseTestCase
+
+
+class TopologyTestCase(BaseTestCase):
+    seed = 9
+    observations = 'abcabbcacbab'
+
+    @classmethod
+    def _random_models(cls, N, M, topology, numeric='float64'):
+        """
+        Create the same left-to-right model with dense and banded transition
+        matrices.
+
+        """
+        rng = np.random.RandomState(cls.seed)
+        pi = rng.rand(N)
+        a = rng.rand(N, N)
+        offsets = (np.arange(N)[np.newaxis, :] - np.arange(N)[:, np.newaxis])
+        a[~np.in1d(offsets, topology).reshape(N, N)] = 0.
+        b = rng.rand(N, M)
+        return [cls._model_of(pi, a, b, numeric=numeric,
+                              topology=model_topology)
+                for model_topology in (None, topology)]
+
+    def _as_float(self, arr):
+        if isinstance(arr, SparseTransitions):
+            arr = arr.todense(-np.inf)
+        # decimal backend represents logarithm of zero with NaN
+        arr = np.array(arr, dtype=np.float64)
+        arr[np.isnan(arr)] = -np.inf
+        return arr
+
+    def test_band_width(self):
+        model = GenericHMM(range(4), list('ab'), topology=3)
+        self.assertEqual(model.topology, (0, 1, 2))
+        model = GenericHMM(range(4), list('ab'), topology=[1, -1, 0, 1])
+        self.assertEqual(model.topology, (-1, 0, 1))
+
+    def test_invalid_topology(self):
+        with self.assertRaises(ValueError):
+            GenericHMM(range(4), list('ab'), topology=0)
+        with self.assertRaises(ValueError):
+            GenericHMM(range(4), list('ab'), topology=[])
+
+    def test_transitions_outside_band(self):
+        model = GenericHMM(range(3), list('ab'), numeric='float64',
+                           topology=2)
+        with self.assertRaises(ValueError):
+            model.transition_matrix = np.array(
+                [[.5, .5, 0.], [0., .5, .5], [.5, 0., .5]])
+
+    def test_from_dense(self):
+        matrix = np.array([[.5, .5, 0.], [0., .5, .5], [0., 0., 1.]])
+        transitions = BandedTransitions.from_dense(matrix)
+        np.testing.assert_array_equal(transitions.offsets, [0, 1])
+        self.assertEqual(transitions.nnz, 5)
+        np.testing.assert_array_equal(transitions.todense(), matrix)
+
+        transitions = BandedTransitions.from_dense(matrix, [-1, 0, 1])
+        self.assertEqual(transitions.nnz, 7)
+        np.testing.assert_array_equal(transitions.todense(), matrix)
+
+    def test_reduce(self):
+        matrix = np.array([[1., 2., 0.], [3., 4., 5.], [0., 6., 7.]])
+        transitions = BandedTransitions.from_dense(matrix)
+        np.testing.assert_array_equal(
+            transitions.reduce_sources(np.add, transitions.values, 0.),
+            matrix.sum(1))
+        np.testing.assert_array_equal(
+            transitions.reduce_targets(np.add, transitions.values, 0.),
+            matrix.sum(0))
+        maxima = transitions.reduce_targets(np.maximum, transitions.values,
+                                            -np.inf)
+        np.testing.assert_array_equal(
+            transitions.argmax_targets(transitions.values, maxima),
+            matrix.argmax(0))
+
+    def test_invalid_banded_transitions(self):
+        with self.assertRaises(ValueError):
+            BandedTransitions([], [], 3)
+        with self.assertRaises(ValueError):
+            BandedTransitions([0, 3], np.ones(3), 3)
+        with self.assertRaises(ValueError):
+            BandedTransitions([0, 0], np.ones(6), 3)
+        with self.assertRaises(ValueError):
+            BandedTransitions([0, 1], np.ones(6), 3)
+
+    def test_recursions_match_dense(self):
+        for numeric in ('float64', 'decimal'):
+            dense, banded = self._random_models(6, 3, (0, 1, 2),
+                                                numeric=numeric)
+            self.assertIsInstance(banded.transition_matrix, BandedTransitions)
+            log_pi, log_a, log_b = dense._log_parameters_of(self.observations)
+            banded_log_a = banded._log_transition_matrix
+
+            for name, args, banded_args in [
+                    ('_compute_logalpha', (log_pi, log_a, log_b),
+                     (log_pi, banded_log_a, log_b)),
+                    ('_compute_logbeta', (log_a, log_b),
+                     (banded_log_a, log_b)),
+                    ('_compute_logdelta', (log_pi, log_a, log_b),
+                     (log_pi, banded_log_a, log_b))]:
+                np.testing.assert_allclose(
+                    self._as_float(getattr(banded, name)(*banded_args)),
+                    self._as_float(getattr(dense, name)(*args)), rtol=1e-10)
+
+            path, log_probability = dense.decode(self.observations)
+            banded_path, banded_log_probability = banded.decode(
+                self.observations)
+            np.testing.assert_array_equal(banded_path, path)
+            self.assertAlmostEqual(float(banded_log_probability),
+                                   float(log_probability))
+
+    def test_fit_keeps_topology(self):
+        dense, banded = self._random_models(5, 3, (-1, 0, 1))
+        expected = dense.fit(self.observations, max_iter=5)
+        actual = banded.fit(self.observations, max_iter=5)
+        np.testing.assert_allclose(actual, expected, rtol=1e-8)
+        self.assertIsInstance(banded.transition_matrix, BandedTransitions)
+        np.testing.assert_allclose(
+            self._as_float(banded._log_transition_matrix),
+            self._as_float(dense._log_transition_matrix), rtol=1e-8)
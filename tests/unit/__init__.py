@@ -3,4 +3,6 @@
 Unit tests for himamo.
 
 """
+from tests.unit.FixedLagSmoother import *
+from tests.unit.ForwardFilter import *
 from tests.unit.GenericHMM import *